@@ -4,9 +4,12 @@ config management
 
 from __future__ import annotations
 
+import array
 import collections
 import copy
-from typing import Any, Iterator
+import functools
+import weakref
+from typing import Any, Callable, Iterator, NoReturn
 
 import confu.schema
 
@@ -21,19 +24,49 @@ class Config(collections.abc.Mapping):
         schema: confu.schema.Schema,
         data: dict | None = None,
         meta: dict | None = None,
+        frozen: bool = False,
+        index: bool = False,
+        fused_defaults: bool = False,
     ) -> None:
         """
         **Arguments**
 
-        - schema (`confu.schema`): schema object
+        - schema (`confu.schema`): schema object, a schema frozen
+          through `Schema.freeze` can be shared between configs
 
         **Keyword Arguments**
 
         - data (`dict`): dict to set initial data
         - meta (`dict`): any additional metadata to pass along with config
+        - frozen (`bool=False`): hold the validated data as an immutable
+          tree of `FrozenDict` and `tuple`, which is shared instead of
+          copied by `copy` and `derive`. `List` values stored as
+          `array.array` are held as tuples, NumPy arrays as read only
+          arrays
+        - index (`bool=False`): keep a flat index of the validated data
+          by path, so `get_nested` and `get_path` are a single lookup
+        - fused_defaults (`bool=False`): apply defaults while validating
+          in a single pass over the data, see `validate_with_defaults`,
+          instead of calling `apply_defaults` before validating. The
+          results differ for `Dict` attributes holding schemas, whose
+          defaults are applied to the values of the dict, and errors
+          evaluating defaults, which are reported along with the other
+          validation errors.
         """
         self._base_data = None
         self._data = None
+        self.frozen = frozen
+        self.fused_defaults = fused_defaults
+
+        # (data, objects) last returned by `as_object`
+        self._object = None
+
+        # (data, {path tuple: value}) if `index` is enabled
+        self.index = index
+        self._index = None
+
+        # paths changed through `set` since the data was last validated
+        self._dirty = []
         self._schema = schema
         self.meta = meta if meta else {}
 
@@ -45,52 +78,276 @@ class Config(collections.abc.Mapping):
         self.data = data if data else {}
 
     def __eq__(self, other):
-        return self.data == other.data
+        return _equal(self.data, other.data)
 
     def __ne__(self, other):
-        return not self.data == other.data
+        return not _equal(self.data, other.data)
 
     def copy(self) -> dict:
         """return a read only copy of data"""
+        if self.frozen:
+            # frozen data cannot be changed, so it is not copied
+            return self.data
         return copy.deepcopy(self.data)
 
+    def derive(self, path: list[str], value: Any) -> Config:
+        """
+        Return a new config with a value changed
+
+        The new config shares the schema and all unchanged data with this
+        config, only the dicts along the path are copied and only the
+        changed value is validated, as with `set`.
+
+        **Arguments**
+
+        - path (`list`): keys of the value to set
+        - value (`mixed`)
+        """
+        # validate first, so the validated data can be shared
+        self.data
+        derived = copy.copy(self)
+        derived.meta = dict(self.meta)
+        derived._dirty = []
+        if self._index is not None:
+            # both configs keep their changes on top of the shared index,
+            # which is not changed anymore
+            data, index = self._index
+            if getattr(index, "depth", 0) < _MAX_INDEX_DEPTH:
+                self._index = (data, _IndexOverlay(index))
+                derived._index = (data, _IndexOverlay(index))
+            else:
+                # built again on the next lookup
+                derived._index = None
+        derived.set(path, value)
+        return derived
+
+    def _swap(self, other: Config) -> None:
+        """
+        Take over the data and validation results of `other` at once,
+        as done by `confu.reload.ConfigReloader`
+        """
+        # a single dict update, so other threads see either the old
+        # or the new state
+        self.__dict__.update({name: other.__dict__[name] for name in _DATA_STATE})
+
     @property
     def data(self) -> dict:
         """config data, should be used for read only"""
         if self._data:
-            return self._data
+            if self._dirty:
+                self._revalidate()
+            if self._data:
+                return self._data
 
+        self._dirty = []
         data = copy.deepcopy(self._base_data)
 
-        try:
-            confu.schema.apply_defaults(self._schema, data)
-        except confu.exceptions.ApplyDefaultError as exc:
-            self.apply_default_error = exc
+        if self.fused_defaults:
+            (
+                self.valid,
+                self.errors,
+                self.warnings,
+            ) = confu.schema.validate_with_defaults(self._schema, data)
+        else:
+            apply_default_error = None
+            try:
+                confu.schema.apply_defaults(self._schema, data)
+            except confu.exceptions.ApplyDefaultError as exc:
+                apply_default_error = exc
 
-        self.valid, self.errors, self.warnings = confu.schema.validate(
-            self.schema, data
-        )
+            self.valid, self.errors, self.warnings = confu.schema.validate(
+                self._schema, data
+            )
 
-        if hasattr(self, "apply_default_error"):
-            self.errors.exceptions.insert(0, self.apply_default_error)
+            if apply_default_error is not None:
+                self.errors.exceptions.insert(0, apply_default_error)
 
-        self._data = data
+        self._data = _freeze(data) if self.frozen else data
         return self._data
 
     @data.setter
     def data(self, value: dict) -> None:
         self._base_data = value
         self._data = None
+        self._dirty = []
+
+    def set(self, path: list[str], value: Any) -> None:
+        """
+        Set a value in the config data
+
+        Unlike replacing `data`, only the changed value is revalidated
+        (and has defaults applied) the next time the data is accessed,
+        the rest of the validated data is reused.
+
+        Containers along the path are copied, so data previously returned
+        by `data` is not changed.
+
+        **Arguments**
+
+        - path (`list`): keys of the value to set
+        - value (`mixed`)
+        """
+        path = list(path)
+        if not path:
+            raise ValueError("path cannot be empty")
+        self._base_data = _set_path(self._base_data, path, value)
+        self._dirty.append(path)
+
+    def _revalidate(self) -> None:
+        """
+        Revalidate the paths changed through `set`, falls back to
+        validating all data if a path cannot be revalidated on its own
+        """
+        dirty, self._dirty = self._dirty, []
+        for path in dirty:
+            try:
+                self._revalidate_path(path)
+            except _Revalidate:
+                self._data = None
+                return
+
+    def _revalidate_path(self, path: list[str]) -> None:
+        *parent_path, key = path
+
+        # find the schema holding the changed value, revalidating values
+        # within lists, proxy schemas or schemas with their own `validate`
+        # (including the root schema) is not supported
+        schema = self._schema
+        if not _plain_schema(schema):
+            raise _Revalidate()
+        base = self._base_data
+        data = self._data
+        for name in parent_path:
+            attribute = schema._attr.get(name, schema.item)
+            if not _plain_schema(attribute):
+                raise _Revalidate()
+            if not isinstance(data.get(name), dict):
+                raise _Revalidate()
+            schema = attribute
+            base = base[name]
+            data = data[name]
+
+        attribute = schema._attr.get(key, schema.item)
+        errors = confu.schema.CollectValidationExceptions()
+        warnings = confu.schema.CollectValidationExceptions()
+        defaults = self.fused_defaults
+        run = confu.schema.ValidationRun(errors, warnings, defaults=defaults)
+
+        value = {}
+        if key in base:
+            value[key] = copy.deepcopy(base[key])
+
+        if attribute is None:
+            if key in value:
+                warnings.warning(
+                    confu.exceptions.ValidationWarning(
+                        key, parent_path, value[key], f"unknown attribute '{key}'"
+                    )
+                )
+        else:
+            self._apply_default(value, key, attribute)
+
+            if key in value and isinstance(attribute, confu.schema.Schema):
+                # schemas validate through their cached plan, applying
+                # defaults along the way with `fused_defaults`
+                value[key] = attribute.validate(
+                    value[key],
+                    path=path,
+                    errors=errors,
+                    warnings=warnings,
+                    defaults=defaults,
+                )
+            elif key in value:
+                result = _attribute_check(schema, key, attribute)(
+                    value[key], confu.schema.ConfigPath.from_list(path), run
+                )
+                if isinstance(result, confu.schema.ValidationFailure):
+                    run.report(result)
+                else:
+                    value[key] = result
+            elif not attribute.has_default:
+                errors.error(
+                    confu.exceptions.ValidationError(attribute, path, None, "missing")
+                )
+
+        self._store_path(path, value)
+
+        def unaffected(exception: Exception) -> bool:
+            details = exception.details
+            if details["path"][: len(path)] == path:
+                return False
+            return not (details["path"] == parent_path and details["attribute"] == key)
+
+        self.errors = _replace(self.errors, unaffected, errors)
+        self.warnings = _replace(self.warnings, unaffected, warnings)
+        self.valid = len(self.errors) == 0
+
+    def _apply_default(
+        self, value: dict, key: str, attribute: confu.schema.Attribute
+    ) -> None:
+        """
+        Apply the default of `attribute` to the changed value held by
+        `value` under `key`, as validating all data would
+        """
+        try:
+            if not self.fused_defaults:
+                confu.schema.apply_default(value, attribute, [key])
+            elif value.get(key) is None and (
+                isinstance(attribute, confu.schema.Schema) or attribute.has_default
+            ):
+                value[key] = confu.schema.core._default_value(attribute)
+        except Exception:
+            # let validating all data report the error
+            raise _Revalidate()
+
+    def _store_path(self, path: list[str], value: dict) -> None:
+        """
+        Replace the validated value at `path` with the value held by
+        `value` under the last key of the path, or remove it if there
+        is none, copying only the dicts along the path
+        """
+        *parent_path, key = path
+        data = _set_path(self._data, path, value.get(key))
+        if key not in value:
+            del _get_path(data, parent_path)[key]
+        if self.frozen:
+            # only the dicts along the path are not frozen yet
+            data = _freeze(data)
+
+        if self._index is not None and self._index[0] is self._data:
+            self._index = (data, self._index[1])
+            _update_index(self._index[1], data, path)
+        self._data = data
+
+    def as_object(self) -> Any:
+        """
+        Return the config data as read only objects with attribute
+        access to values, see `confu.objects`
+
+        The objects are built again only after the data changed.
+        """
+        from confu.objects import materialize
+
+        data = self.data
+        cached = self._object
+        if cached is None or cached[0] is not data:
+            cached = self._object = (data, materialize(self._schema, data))
+        return cached[1]
 
     @property
     def schema(self) -> confu.schema.Schema:
-        """return a read only copy of schema"""
+        """
+        return a read only copy of schema, frozen schemas are returned
+        as they are
+        """
         return copy.deepcopy(self._schema)
 
     def get_nested(self, *args: str) -> dict | None:
         """
         get a nested value, returns None if path does not exist
         """
+        if self.index:
+            return self._get_index().get(args)
         data = self.data
         for key in args:
             if key not in data:
@@ -98,6 +355,61 @@ class Config(collections.abc.Mapping):
             data = data[key]
         return data
 
+    def get_path(self, path: str, default: Any = None) -> Any:
+        """
+        Return the value at a dotted path, e.g. `"server.port"`, or
+        `default` if the path does not exist
+
+        **Arguments**
+
+        - path (`str`): keys of the value separated by `.`
+
+        **Keyword Arguments**
+
+        - default (`mixed`): returned if the path does not exist
+        """
+        keys = _split_path(path)
+        if self.index:
+            return self._get_index().get(keys, default)
+        data = self.data
+        for key in keys:
+            if not isinstance(data, dict) or key not in data:
+                return default
+            data = data[key]
+        return data
+
+    def get_prefix(self, *args: str) -> dict:
+        """
+        Return all values within the dict at a path, by their path as
+        a tuple of keys
+
+        Values of nested dicts are included, as well as the nested
+        dicts themselves. Returns an empty dict if the path does not
+        exist or does not hold a dict.
+        """
+        if self.index:
+            node = self._get_index().get(args)
+        else:
+            node = self.get_nested(*args)
+        if not isinstance(node, dict):
+            return {}
+        values = _build_index(node, args)
+        del values[args]
+        return values
+
+    def _get_index(self) -> dict | _IndexOverlay:
+        """
+        Return the flat index of the validated data, built after the
+        data was validated and updated by `set`
+        """
+        cached = self._index
+        if cached is not None and not self._dirty and cached[0] is self._data:
+            return cached[1]
+        data = self.data
+        if cached is None or cached[0] is not data:
+            cached = self._index = (data, _build_index(data))
+        return cached[1]
+
     def __getitem__(self, key: str) -> Any:
         return self.data[key]
 
@@ -106,3 +418,259 @@ class Config(collections.abc.Mapping):
 
     def __len__(self) -> int:
         return len(self.data)
+
+
+# attributes of `Config` replaced by `Config._swap`
+_DATA_STATE = (
+    "_base_data",
+    "_data",
+    "_dirty",
+    "errors",
+    "warnings",
+    "valid",
+    "_index",
+    "_object",
+)
+
+
+class FrozenDict(dict):
+    """
+    Read only dict holding the validated data of a frozen `Config`
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args: Any, **kwargs: Any) -> NoReturn:
+        raise TypeError("frozen config data cannot be changed")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self) -> FrozenDict:
+        return self
+
+    def __deepcopy__(self, memo: dict) -> FrozenDict:
+        return self
+
+    def __reduce__(self) -> tuple:
+        return (FrozenDict, (dict(self),))
+
+
+def _freeze(value: Any) -> Any:
+    """
+    Return config data as `FrozenDict` and `tuple` containers, frozen
+    containers are shared as they are
+
+    Lists stored as `array.array` become tuples as well, NumPy arrays
+    become read only copies.
+    """
+    vtype = type(value)
+    if vtype is dict:
+        return FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if vtype is list:
+        return tuple(_freeze(item) for item in value)
+    if vtype is array.array:
+        return tuple(value)
+    numpy = confu.schema.core.numpy
+    if numpy is not None and vtype is numpy.ndarray:
+        if not value.flags.writeable and value.base is None:
+            return value
+        value = value.copy()
+        value.flags.writeable = False
+        return value
+    return value
+
+
+class _Revalidate(Exception):
+    """
+    Raised when a changed path can only be revalidated with all data
+    """
+
+
+def _plain_schema(attribute: confu.schema.Attribute | None) -> bool:
+    """
+    Return whether an attribute is a schema validating its values with
+    `Schema.validate`, so its values can be revalidated one at a time
+    """
+    return (
+        isinstance(attribute, confu.schema.Schema)
+        and not isinstance(attribute, confu.schema.ProxySchema)
+        and type(attribute).validate is confu.schema.Schema.validate
+    )
+
+
+# (`_plan_generation`, compiled check) of attributes of schemas with
+# a generated validator
+_checks = weakref.WeakKeyDictionary()
+
+
+def _attribute_check(
+    schema: confu.schema.Schema, key: str, attribute: confu.schema.Attribute
+) -> Callable:
+    """
+    Return the compiled check for the attribute of `schema` at `key`,
+    taken from the cached plan of the schema
+    """
+    plan = schema._current_plan()
+    if isinstance(plan, confu.schema.ValidationPlan):
+        return plan.checks.get(key, plan.item)
+
+    # generated validators do not hold checks per attribute, the
+    # check is compiled again once attributes were changed
+    generation = confu.schema.core._plan_generation
+    cached = _checks.get(attribute)
+    if cached is None or cached[0] != generation:
+        cached = _checks[attribute] = (generation, attribute.compile())
+    return cached[1]
+
+
+# sequences in config data that compare equal by their items, frozen
+# configs hold `array.array` lists as tuples
+_SEQUENCES = (list, tuple, array.array)
+
+
+def _equal(a: Any, b: Any) -> bool:
+    """
+    Compare config data, NumPy arrays (`List` with `storage="numpy"`)
+    are compared by their values
+    """
+    numpy = confu.schema.core.numpy
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_equal(a[key], b[key]) for key in a)
+    if isinstance(a, _SEQUENCES) and isinstance(b, _SEQUENCES):
+        return len(a) == len(b) and all(map(_equal, a, b))
+    if numpy is not None and (
+        isinstance(a, numpy.ndarray) or isinstance(b, numpy.ndarray)
+    ):
+        return bool(numpy.array_equal(a, b))
+    return a == b
+
+
+def _get_path(data: dict, path: list[str]) -> Any:
+    for key in path:
+        data = data[key]
+    return data
+
+
+def _set_path(data: dict | None, path: list[str], value: Any) -> dict:
+    """
+    Return a copy of `data` with `value` set at `path`, only the dicts
+    along the path are copied
+    """
+    data = dict(data or {})
+    node = data
+    for key in path[:-1]:
+        child = node.get(key)
+        if child is None:
+            child = {}
+        elif not isinstance(child, dict):
+            raise TypeError(f"cannot set {path}, '{key}' does not hold a dict")
+        node[key] = node = dict(child)
+    node[path[-1]] = value
+    return data
+
+
+@functools.lru_cache(maxsize=4096)
+def _split_path(path: str) -> tuple:
+    return tuple(path.split("."))
+
+
+# number of overlays an index of a derived config can be built of,
+# the index is built again once there would be more
+_MAX_INDEX_DEPTH = 16
+
+# marks paths removed in an `_IndexOverlay`
+_REMOVED = object()
+
+
+class _IndexOverlay:
+    """
+    Flat index of a config derived from another config
+
+    Paths changed in the derived config are kept on top of the index
+    they were derived from, which is shared and not changed anymore, so
+    deriving a config does not copy the whole index.
+    """
+
+    __slots__ = ("base", "changes", "depth")
+
+    def __init__(self, base: dict | _IndexOverlay) -> None:
+        self.base = base
+        self.changes = {}
+        self.depth = getattr(base, "depth", 0) + 1
+
+    def get(self, path: tuple, default: Any = None) -> Any:
+        value = self.changes.get(path, _REMOVED)
+        if value is _REMOVED:
+            if path in self.changes:
+                return default
+            return self.base.get(path, default)
+        return value
+
+    def __setitem__(self, path: tuple, value: Any) -> None:
+        self.changes[path] = value
+
+    def pop(self, path: tuple, default: Any = None) -> Any:
+        value = self.get(path, _REMOVED)
+        self.changes[path] = _REMOVED
+        return default if value is _REMOVED else value
+
+    def update(self, values: dict) -> None:
+        self.changes.update(values)
+
+
+def _build_index(data: dict, prefix: tuple = ()) -> dict:
+    """
+    Return all values within `data` and its nested dicts by their path
+    as a tuple of keys, including `data` itself at `prefix`
+    """
+    index = {prefix: data}
+    stack = [(prefix, data)]
+    while stack:
+        path, node = stack.pop()
+        for key, value in node.items():
+            child = path + (key,)
+            index[child] = value
+            if isinstance(value, dict):
+                stack.append((child, value))
+    return index
+
+
+def _update_index(index: dict | _IndexOverlay, data: dict, path: list[str]) -> None:
+    """
+    Update a flat index after the value at `path` was replaced in
+    `data`, which has new copies of the dicts along the path
+    """
+    path = tuple(path)
+    old = index.get(path)
+    if isinstance(old, dict):
+        for child in _build_index(old, path):
+            index.pop(child, None)
+    else:
+        index.pop(path, None)
+
+    node = index[()] = data
+    for depth, key in enumerate(path[:-1], 1):
+        node = index[path[:depth]] = node[key]
+
+    if path[-1] in node:
+        value = node[path[-1]]
+        if isinstance(value, dict):
+            index.update(_build_index(value, path))
+        else:
+            index[path] = value
+
+
+def _replace(
+    collected: confu.schema.CollectValidationExceptions,
+    keep: Callable,
+    new: confu.schema.CollectValidationExceptions,
+) -> confu.schema.CollectValidationExceptions:
+    """
+    Return a new collection with the exceptions passing `keep` followed
+    by the exceptions in `new`
+    """
+    result = confu.schema.CollectValidationExceptions()
+    result.exceptions.extend(e for e in collected if keep(e))
+    result.exceptions.extend(new)
+    return result
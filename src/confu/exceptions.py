@@ -35,6 +35,10 @@ class ValidationErrorBase(ValueError):
         - reason (`str`): human readable reason message for validation error
         """
 
+        # paths collected during validation are `ConfigPath` instances
+        if isinstance(path, confu.schema.ConfigPath):
+            path = path.as_list()
+
         msg = f"{path}: {reason}"
         self.details = {
             "path": path,
@@ -80,6 +84,15 @@ class ValidationError(ValidationErrorBase):
     pass
 
 
+class StopValidation(Exception):
+    """
+    Raised by a validation error processor to stop validation early,
+    e.g., once its `max_errors` limit has been reached
+    """
+
+    pass
+
+
 class ApplyDefaultError(ValidationErrorBase):
     """
     Raised when an exception occured during apply_defaults
@@ -87,3 +100,12 @@ class ApplyDefaultError(ValidationErrorBase):
 
     def __str__(self) -> str:
         return self.pretty
+
+
+class SchemaFingerprintError(ValueError):
+    """
+    Raised when a schema holds values that cannot be fingerprinted,
+    e.g., objects only described by their memory address
+    """
+
+    pass
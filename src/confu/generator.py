@@ -3,7 +3,10 @@ Schema to data generators
 """
 from __future__ import annotations
 
-from confu.schema import Attribute, Schema
+import copy
+
+from confu.schema import Attribute, ConfigPath, List, Schema, ValidationFailure
+from confu.schema.core import _ARRAY_TYPES
 
 
 class ConfigGenerator:
@@ -33,10 +36,21 @@ class ConfigGenerator:
             for name, attribute in schema.attributes():
                 config[name] = self.generate(attribute)
             return config
+        elif isinstance(schema, List):
+            config = self.generate(schema.default)
+            store = schema._check_storage()
+            if store is not None and isinstance(config, list):
+                # defaults of lists with array storage are arrays as well
+                stored = store(config, ConfigPath(), None)
+                if type(stored) is not ValidationFailure:
+                    config = stored
+            return config
         elif isinstance(schema, Attribute):
             return self.generate(schema.default)
         elif isinstance(schema, list):
             return [self.generate(item) for item in schema]
+        elif isinstance(schema, _ARRAY_TYPES):
+            return copy.copy(schema)
         return schema
 
 
@@ -0,0 +1,156 @@
+"""
+Attribute access to validated config data
+
+`materialize` turns validated config data into a tree of read only
+objects. The class of the objects is generated once per schema class,
+with a slot for each of the schema's attributes, so reading a value is
+an attribute lookup instead of a chain of dict lookups:
+
+```
+config = materialize(MySchema(), data)
+config.server.port
+```
+
+- schemas with an `item` attribute (e.g. `Dict`) become `FrozenDict`s
+- lists become tuples
+- attributes missing from the data are `None`, keys that are not
+  attributes of the schema are left out
+
+`Config.as_object` returns the data of a `Config` this way.
+"""
+from __future__ import annotations
+
+import weakref
+from typing import Any, NoReturn
+
+from confu.config import FrozenDict, _freeze
+from confu.schema import Attribute, List, ProxySchema, Schema
+
+# generated classes by schema class and attribute names
+_classes = weakref.WeakKeyDictionary()
+
+
+class ConfigObject:
+    """
+    Base class of the classes generated by `object_class`, holds the
+    values of a schema's attributes in slots
+    """
+
+    __slots__ = ()
+
+    # weak reference to the schema class, set by `object_class`
+    _schema_class = None
+
+    def __init__(self, *values: Any) -> None:
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> NoReturn:
+        raise AttributeError(f"cannot set '{name}', config objects are read only")
+
+    def __delattr__(self, name: str) -> NoReturn:
+        raise AttributeError(f"cannot delete '{name}', config objects are read only")
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __reduce__(self) -> tuple:
+        # generated classes cannot be looked up by name, they are
+        # generated again from the schema class when unpickled
+        return (
+            _restore,
+            (
+                self._schema_class(),
+                self.__slots__,
+                tuple(getattr(self, name) for name in self.__slots__),
+            ),
+        )
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+    def _asdict(self) -> dict:
+        """
+        Return the values as a dict
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def object_class(schema: Schema) -> type:
+    """
+    Return the `ConfigObject` class for a schema, with a slot for each
+    of the schema's attributes
+
+    The class is generated on the first call and reused for schemas of
+    the same class with the same attributes after that.
+    """
+    fields = tuple(name for name, attribute in schema.attributes())
+    return _object_class(type(schema), fields)
+
+
+def _object_class(schema_class: type, fields: tuple) -> type:
+    classes = _classes.get(schema_class)
+    if classes is None:
+        classes = _classes[schema_class] = {}
+    cls = classes.get(fields)
+    if cls is None:
+        cls = classes[fields] = type(
+            schema_class.__name__,
+            (ConfigObject,),
+            {
+                "__slots__": fields,
+                "__module__": __name__,
+                "__qualname__": schema_class.__qualname__,
+                "_schema_class": weakref.ref(schema_class),
+            },
+        )
+    return cls
+
+
+def _restore(schema_class: type, fields: tuple, values: tuple) -> ConfigObject:
+    return _object_class(schema_class, fields)(*values)
+
+
+def materialize(schema: Schema, data: dict) -> ConfigObject | FrozenDict:
+    """
+    Return validated config data as read only objects
+
+    **Arguments**
+
+    - schema (`Schema`): schema the data was validated with
+    - data (`dict`): validated config data
+    """
+    return _materialize(schema, data)
+
+
+def _materialize(attribute: Attribute, value: Any) -> Any:
+    if isinstance(attribute, ProxySchema):
+        attribute = attribute.schema(value)
+
+    if isinstance(attribute, Schema) and isinstance(value, dict):
+        item = attribute.item
+        if item is not None:
+            return FrozenDict(
+                (key, _materialize(item, entry)) for key, entry in value.items()
+            )
+        return object_class(attribute)(
+            *(
+                _materialize(child, value.get(name))
+                for name, child in attribute.attributes()
+            )
+        )
+
+    if isinstance(attribute, List) and isinstance(value, (list, tuple)):
+        return tuple(_materialize(attribute.item, entry) for entry in value)
+
+    return _freeze(value)
@@ -0,0 +1,375 @@
+"""
+Reload config data when its source files change
+
+`ConfigReloader` watches the files a `Config` was loaded from and
+reloads and validates them in a background thread. The new data is
+swapped into the `Config` at once, but only if it is valid, otherwise
+the `Config` keeps the data it has.
+
+```
+config = Config(MySchema(), munge.load_datafile("config.yaml"))
+reloader = ConfigReloader(config, ["config.yaml"]).start()
+...
+reloader.stop()
+```
+
+Files are watched through inotify on Linux, elsewhere their
+modification times are polled.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Any, Callable
+
+from confu.config import Config
+from confu.util import load_datafiles
+
+# inotify event masks, see inotify(7)
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0x00000800
+_IN_CLOEXEC = 0x00080000
+
+_IN_EVENTS = (
+    _IN_MODIFY
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+
+_EVENT = struct.Struct("iIII")
+
+
+class ConfigReloader:
+    """
+    Watches the source files of a `Config` and swaps reloaded and
+    validated data into it
+
+    Changes made to the config with `Config.set` are discarded when
+    the config is reloaded.
+
+    **Arguments**
+
+    - config (`Config`): config to reload
+    - paths (`list`): files to watch
+
+    **Keyword Arguments**
+
+    - loader (`function`): returns the config data, by default the files
+      are loaded with munge and their top level keys merged in order
+    - debounce (`float=0.1`): seconds to wait for more changes before
+      reloading, so a burst of writes only causes one reload
+    - interval (`float=1.0`): seconds between checking modification
+      times if files are polled
+    - watcher (`str`): `"inotify"` or `"poll"`, by default inotify is
+      used if it is available
+
+    **Attributes**
+
+    - reloads (`int`): number of times valid data was swapped in
+    - failures (`int`): number of reloads that failed to load or validate
+    - last_error (`Exception|CollectValidationExceptions`): why the last
+      reload failed
+    - last_latency (`float`): seconds the last reload took to load and
+      validate the data, not counting the debounce delay
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        paths: list[str],
+        loader: Callable[[], dict] | None = None,
+        debounce: float = 0.1,
+        interval: float = 1.0,
+        watcher: str | None = None,
+    ) -> None:
+        self.config = config
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.loader = loader or self.load
+        self.debounce = debounce
+        self.interval = interval
+
+        if watcher is None:
+            watcher = "inotify" if _libc() is not None else "poll"
+        if watcher not in ("inotify", "poll"):
+            raise ValueError("watcher needs to be either 'inotify' or 'poll'")
+        self.watcher = watcher
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_latency = None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self) -> ConfigReloader:
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def start(self) -> ConfigReloader:
+        """
+        Start watching the files in a background thread
+        """
+        if self._thread is not None:
+            raise RuntimeError("reloader is already running")
+        if self.watcher == "inotify":
+            watcher = _InotifyWatcher(self.paths)
+        else:
+            watcher = _PollingWatcher(self.paths, self.interval, self._stop)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(watcher,), name="confu-reloader", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop watching the files
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def load(self) -> dict:
+        """
+        Load the watched files with munge, merging their top level keys
+        """
+        return load_datafiles(self.paths)
+
+    def reload(self) -> bool:
+        """
+        Load and validate the config data and swap it into the config
+        if it is valid
+
+        Returns whether the data was swapped in.
+        """
+        started = time.monotonic()
+        config = self.config
+        try:
+            candidate = Config(
+                config._schema,
+                self.loader(),
+                meta=config.meta,
+                frozen=config.frozen,
+                index=config.index,
+                fused_defaults=config.fused_defaults,
+            )
+            candidate.data
+            if config.index:
+                candidate._get_index()
+        except Exception as exc:
+            self.last_error = exc
+            self.failures += 1
+            return False
+        finally:
+            self.last_latency = time.monotonic() - started
+
+        if not candidate.valid:
+            self.last_error = candidate.errors
+            self.failures += 1
+            return False
+
+        config._swap(candidate)
+        self.reloads += 1
+        return True
+
+    def _run(self, watcher: _InotifyWatcher | _PollingWatcher) -> None:
+        try:
+            while not self._stop.is_set():
+                if not watcher.wait(self.interval):
+                    continue
+                # wait for a burst of writes to end
+                while not self._stop.is_set() and watcher.wait(self.debounce):
+                    pass
+                if not self._stop.is_set():
+                    self.reload()
+        finally:
+            watcher.close()
+
+
+class _PollingWatcher:
+    """
+    Detects changes to files by polling their modification time, size
+    and inode
+    """
+
+    def __init__(
+        self, paths: list[str], interval: float, stop: threading.Event
+    ) -> None:
+        self.paths = paths
+        self.interval = interval
+        self.stop = stop
+        self.state = self.snapshot()
+
+    def snapshot(self) -> list:
+        state = []
+        for path in self.paths:
+            try:
+                info = os.stat(path)
+            except OSError:
+                state.append(None)
+            else:
+                state.append((info.st_mtime_ns, info.st_size, info.st_ino))
+        return state
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Return whether a file changed within `timeout` seconds
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self.snapshot()
+            if state != self.state:
+                self.state = state
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.stop.wait(min(self.interval, remaining)):
+                return False
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyWatcher:
+    """
+    Detects changes to files through inotify
+
+    The directories of the files are watched, so files replaced
+    by renaming another file are detected as well. For files that are
+    symlinks the directory of the file they resolve to is watched too,
+    and the links are resolved again after every event, so files
+    swapped by replacing a symlink to their directory (like Kubernetes
+    does for mounted ConfigMaps) are detected.
+    """
+
+    def __init__(self, paths: list[str]) -> None:
+        self.libc = _libc()
+        self.fd = self.libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.paths = paths
+
+        # watched file names by watch descriptor
+        self.names = {}
+        for path in paths:
+            if not self.add_watch(path):
+                os.close(self.fd)
+                raise OSError(
+                    ctypes.get_errno(), f"cannot watch {os.path.dirname(path)}"
+                )
+        self.targets = self.resolve()
+        self.watch_targets()
+
+    def add_watch(self, path: str) -> bool:
+        """
+        Watch the directory of `path` for changes to it, returns
+        whether the directory can be watched
+        """
+        directory, name = os.path.split(path)
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), _IN_EVENTS)
+        if wd < 0:
+            return False
+        self.names.setdefault(wd, set()).add(os.fsencode(name))
+        return True
+
+    def resolve(self) -> list[str]:
+        """
+        Return the paths the watched paths resolve to
+        """
+        return [os.path.realpath(path) for path in self.paths]
+
+    def watch_targets(self) -> None:
+        """
+        Watch the directories of the files the watched paths resolve to
+        """
+        for path, target in zip(self.paths, self.targets):
+            # the target may already be gone again, it is resolved
+            # again with the next event
+            if target != path:
+                self.add_watch(target)
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Return whether a file changed within `timeout` seconds
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if readable and self.read():
+                return True
+
+    def read(self) -> bool:
+        """
+        Read pending events, returns whether any of them is about
+        a watched file or a symlink to one changed
+        """
+        try:
+            buffer = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return False
+        changed = False
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, length = _EVENT.unpack_from(buffer, offset)
+            offset += _EVENT.size
+            end = offset + length
+            name = buffer[offset:end].rstrip(b"\0")
+            offset = end
+            if mask & _IN_Q_OVERFLOW:
+                # events were dropped, any file may have changed
+                changed = True
+            elif name in self.names.get(wd, ()):
+                changed = True
+
+        targets = self.resolve()
+        if targets != self.targets:
+            self.targets = targets
+            self.watch_targets()
+            changed = True
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+_LIBC = []
+
+
+def _libc() -> Any:
+    """
+    Return libc if it provides inotify, otherwise None
+    """
+    if not _LIBC:
+        libc = None
+        if sys.platform.startswith("linux"):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+                libc.inotify_init1
+                libc.inotify_add_watch
+            except (OSError, AttributeError):
+                libc = None
+        _LIBC.append(libc)
+    return _LIBC[0]
@@ -0,0 +1,316 @@
+"""
+Validate config data from asyncio code
+
+`Schema.avalidate` and `confu.schema.avalidate` validate config data
+the same way `Schema.validate` and `confu.schema.validate` do, but
+without blocking the event loop for long:
+
+- control is handed back to the event loop periodically while
+  traversing schemas and lists
+- attributes with an `async` `validate` method are awaited
+- `File` and `Directory` checks run in the default executor
+- with a `ValidationPool` collections are validated in its worker
+  processes, the event loop waits for them in the default executor
+  (collections holding attributes with an `async` `validate` method
+  are always validated here)
+
+```
+success, errors, warnings = await confu.schema.avalidate(MySchema(), config)
+```
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+from typing import Any
+
+from confu.exceptions import ValidationError, ValidationWarning
+from confu.schema.core import (
+    _ARRAY_TYPES,
+    Attribute,
+    ConfigPath,
+    Directory,
+    File,
+    List,
+    ProxySchema,
+    Schema,
+    ValidationFailure,
+    ValidationRun,
+    _config_dict,
+    _defaults_applier,
+    _defined_by,
+)
+
+
+class AsyncValidator:
+    """
+    Validates config data against schema attributes as a coroutine
+
+    Schemas and lists are traversed here, any other attribute is
+    validated through its `Attribute.compile` check.
+
+    **Keyword Arguments**
+
+    - yield_every (`int=1000`): hand control back to the event loop
+      after this many values have been validated
+    """
+
+    def __init__(self, yield_every: int = 1000) -> None:
+        self.yield_every = yield_every
+        self.count = 0
+        self.checks = {}
+
+    async def tick(self) -> None:
+        self.count += 1
+        if self.count >= self.yield_every:
+            self.count = 0
+            await asyncio.sleep(0)
+
+    def check(self, attribute: Attribute) -> Any:
+        """
+        Return the compiled check for an attribute
+        """
+        check = self.checks.get(id(attribute))
+        if check is None:
+            check = self.checks[id(attribute)] = attribute.compile()
+        return check
+
+    async def validate(
+        self, attribute: Attribute, value: Any, path: ConfigPath, run: ValidationRun
+    ) -> Any:
+        """
+        Validate a value against an attribute
+
+        As with compiled checks the validated value or a
+        `ValidationFailure` is returned.
+        """
+        owner = _defined_by(attribute, "validate")
+
+        if owner is ProxySchema:
+            attribute = attribute.schema(value)
+            owner = _defined_by(attribute, "validate")
+
+        if owner is Schema:
+            if run.memo is not None and type(value) is dict:
+                return await self.memo_schema(attribute, value, path, run)
+            return await self.schema(attribute, value, path, run)
+
+        if owner is List and _defined_by(attribute, "_check") is List:
+            return await self.list(attribute, value, path, run)
+
+        if inspect.iscoroutinefunction(attribute.validate):
+            return await attribute.validate(
+                value, path.as_list(), errors=run.errors, warnings=run.warnings
+            )
+
+        check = self.check(attribute)
+        if isinstance(attribute, (File, Directory)):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, check, value, path, run)
+        return check(value, path, run)
+
+    async def memo_schema(
+        self, schema: Schema, config: dict, path: ConfigPath, run: ValidationRun
+    ) -> Any:
+        """
+        Validate config data against a schema, reusing a result cached
+        by the `ValidationMemo` of the run, see `ValidationMemo.validate`
+        """
+        memo = run.memo
+        if memo._keys is None:
+            memo._keys = {}
+            try:
+                return await self.memo_schema(schema, config, path, run)
+            finally:
+                memo._keys = None
+
+        key = memo._key(schema._current_plan(), config, run)
+        if key is None:
+            return await self.schema(schema, config, path, run)
+        if memo._lookup(key, config):
+            return config
+
+        collected, memo_run = memo._collecting_run(run)
+        config = await self.schema(schema, config, path, memo_run)
+        memo._store(key, config, collected, run)
+        return config
+
+    async def pooled(self, method: Any, item: Attribute, *args: Any) -> Any:
+        """
+        Call `method` of the run's `ValidationPool` in the default
+        executor, returns `None` if `item` (or any attribute within it)
+        has an `async` `validate` method, which the pool cannot await
+        """
+        key = ("async", id(item))
+        has_async = self.checks.get(key)
+        if has_async is None:
+            has_async = self.checks[key] = _has_async(item)
+        if has_async:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, method, item, *args)
+
+    async def schema(
+        self, schema: Schema, config: Any, path: ConfigPath, run: ValidationRun
+    ) -> Any:
+        errors = run.errors
+
+        if type(config) is not dict:
+            config = _config_dict(config)
+            if not isinstance(config, dict):
+                return errors.failure(
+                    ValidationFailure(
+                        ValidationError,
+                        path.key,
+                        path,
+                        config,
+                        "dictionary expected",
+                    )
+                )
+
+        if run.defaults:
+            key = ("defaults", id(schema))
+            apply_defaults = self.checks.get(key)
+            if apply_defaults is None:
+                apply_defaults = self.checks[key] = _defaults_applier(schema)
+            apply_defaults(config, path, run)
+
+        attributes = dict(schema.attributes())
+        item = schema.item
+
+        pool = run.pool
+        if (
+            item is not None
+            and pool is not None
+            and len(config) >= pool.min_items
+            and await self.pooled(pool.validate_dict, item, config, path, run)
+        ):
+            # all keys are validated by the item attribute
+            entries = ()
+        else:
+            entries = list(config.items())
+
+        for key, value in entries:
+            attribute = attributes.get(key, item)
+            if attribute is None:
+                run.warnings.failure(
+                    ValidationFailure(
+                        ValidationWarning,
+                        key,
+                        path,
+                        value,
+                        f"unknown attribute '{key}'",
+                    )
+                )
+                continue
+            try:
+                result = await self.validate(
+                    attribute, value, ConfigPath(path, key), run
+                )
+            except ValidationError as error:
+                errors.error(error)
+                continue
+            except ValidationWarning as warning:
+                run.warnings.warning(warning)
+                continue
+            finally:
+                await self.tick()
+            if type(result) is ValidationFailure:
+                run.report(result)
+            else:
+                config[key] = result
+
+        for name, attribute in attributes.items():
+            if not attribute.has_default and name not in config:
+                errors.failure(
+                    ValidationFailure(
+                        ValidationError,
+                        attribute,
+                        ConfigPath(path, name),
+                        None,
+                        "missing",
+                    )
+                )
+
+        return config
+
+    async def list(
+        self, attribute: List, value: Any, path: ConfigPath, run: ValidationRun
+    ) -> Any:
+        if isinstance(value, str):
+            value = value.split(",")
+        elif isinstance(value, _ARRAY_TYPES):
+            value = value.tolist()
+
+        if not isinstance(value, list):
+            return ValidationFailure(
+                ValidationError, attribute, path, value, "list expected"
+            )
+
+        item = attribute.item
+        item_run = run if isinstance(item, Schema) else run.raising()
+
+        validated = None
+        pool = run.pool
+        if pool is not None and len(value) >= pool.min_items:
+            validated = await self.pooled(pool.validate_list, item, value, path, run)
+        if validated is None:
+            validated = await self.items(item, value, path, run, item_run)
+
+        # checks `Attribute.validate` performs on the list itself and
+        # the conversion to its storage type
+        key = ("base", id(attribute))
+        base = self.checks.get(key)
+        if base is None:
+            base = self.checks[key] = attribute._check_base()
+        return base(validated, path, run)
+
+    async def items(
+        self,
+        item: Attribute,
+        value: list,
+        path: ConfigPath,
+        run: ValidationRun,
+        item_run: ValidationRun,
+    ) -> list:
+        validated = []
+        for idx, entry in enumerate(value):
+            try:
+                result = await self.validate(
+                    item, entry, ConfigPath(path, idx), item_run
+                )
+            except ValidationError as error:
+                run.errors.error(error)
+                continue
+            except ValidationWarning as warning:
+                run.warnings.warning(warning)
+                continue
+            finally:
+                await self.tick()
+            if type(result) is ValidationFailure:
+                run.report(result)
+                continue
+            validated.append(result)
+        return validated
+
+
+def _has_async(attribute: Attribute) -> bool:
+    """
+    Return whether an attribute or any attribute it holds has an
+    `async` `validate` method
+    """
+    pending = [attribute]
+    seen = set()
+    while pending:
+        attribute = pending.pop()
+        if id(attribute) in seen:
+            continue
+        seen.add(id(attribute))
+        if inspect.iscoroutinefunction(attribute.validate):
+            return True
+        if isinstance(attribute, Schema):
+            pending.extend(child for name, child in attribute.attributes())
+        item = getattr(attribute, "item", None)
+        if isinstance(item, Attribute):
+            pending.append(item)
+    return False
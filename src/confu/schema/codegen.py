@@ -0,0 +1,507 @@
+"""
+Generate specialized validator functions for schemas
+
+Instead of interpreting a `ValidationPlan` the schema tree is turned into
+python source, with one function per nested `Schema`, `Dict` and `List`
+and the checks of `Int`, `Float`, `Bool` and `Str` attributes written
+out inline. The source is compiled once and the resulting validator is
+cached on the schema class.
+
+Any other attribute (including custom attributes and attributes
+overriding `validate`) is called through its `Attribute.compile` check,
+so the generated validator reports the same errors and warnings as
+`Schema.validate`.
+
+Enable it per schema by instantiating the schema with `codegen=True`
+
+```
+class MySchema(Schema):
+    port = Int()
+
+schema = MySchema(codegen=True)
+```
+"""
+from __future__ import annotations
+
+import linecache
+from typing import Any, Callable
+
+from confu.exceptions import ValidationError, ValidationWarning
+from confu.schema import core
+from confu.schema.core import (
+    _ARRAY_TYPES,
+    Attribute,
+    Bool,
+    ConfigPath,
+    Float,
+    Int,
+    List,
+    Schema,
+    Str,
+    ValidationFailure,
+    _batch_check,
+    _ChoicesIndex,
+    _config_dict,
+    _defaults_applier,
+    _defined_by,
+)
+
+
+class Generator:
+    """
+    Generates the validator source for a schema
+
+    Attribute instances and other values referenced by the generated code
+    are collected in `namespace`, which the source needs to be executed in.
+    """
+
+    def __init__(self) -> None:
+        self.lines = []
+        self.namespace = {
+            "ValidationError": ValidationError,
+            "ValidationWarning": ValidationWarning,
+            "ValidationFailure": ValidationFailure,
+            "Path": ConfigPath,
+            "config_dict": _config_dict,
+            "ARRAY_TYPES": _ARRAY_TYPES,
+        }
+        self.functions = {}
+        self.count = 0
+
+        # whether code is currently emitted for a loop body
+        self.in_loop = False
+
+    def constant(self, value: Any, prefix: str) -> str:
+        """
+        Make a value available to the generated code and return
+        the name it can be referenced by
+        """
+        name = f"{prefix}{self.count}"
+        self.count += 1
+        self.namespace[name] = value
+        return name
+
+    def generate(self, schema: Schema) -> str:
+        """
+        Generate the source for `schema`, returns the name of the
+        validator function for it
+        """
+        return self.schema_function(schema)
+
+    @property
+    def source(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+    def function(self, attribute: Attribute) -> str:
+        """
+        Return the name of the function that validates a container
+        attribute, generating it if needed
+        """
+        key = id(attribute)
+        if key in self.functions:
+            return self.functions[key]
+
+        owner = _defined_by(attribute, "validate")
+        in_loop = self.in_loop
+        try:
+            if owner is Schema:
+                return self.schema_function(attribute)
+            if owner is List and _defined_by(attribute, "_check") is List:
+                return self.list_function(attribute)
+        finally:
+            self.in_loop = in_loop
+
+        name = self.constant(attribute.compile(), "check_")
+        self.functions[key] = name
+        return name
+
+    def schema_function(self, schema: Schema) -> str:
+        name = f"validate_schema_{self.count}"
+        self.count += 1
+        self.functions[id(schema)] = name
+
+        body = []
+        attributes = list(schema.attributes())
+        self.in_loop = True
+        entries = ["    entries = list(config.items())"]
+
+        if schema.item is not None:
+            item_ref = self.constant(schema.item, "attribute_")
+            entries = [
+                "    pool = run.pool",
+                "    if pool is not None and len(config) >= pool.min_items and "
+                f"pool.validate_dict({item_ref}, config, path, run):",
+                "        entries = ()",
+                "    else:",
+                "        entries = list(config.items())",
+            ]
+            self.emit_value(body, schema.item, "Path(path, key)", "run", 3)
+        else:
+            # keys are dispatched to a function per attribute through a
+            # dict, instead of comparing them to every attribute name
+            checks = ", ".join(
+                f"{key!r}: {self.value_function(attribute, key)}"
+                for key, attribute in attributes
+            )
+            self.lines += [f"{name}_dispatch = {{{checks}}}", ""]
+            entries.insert(0, f"    dispatch = {name}_dispatch")
+            body += [
+                "            check = dispatch.get(key)",
+                "            if check is None:",
+                "                warnings.failure(ValidationFailure(ValidationWarning, "
+                "key, path, v, f\"unknown attribute '{key}'\"))",
+                "                continue",
+                "            v = check(v, path, run)",
+                "            if type(v) is ValidationFailure:",
+                "                run.report(v)",
+                "                continue",
+            ]
+
+        # the validator consults the memo of the run, if there is one, and
+        # is otherwise a plain call of the actual validation function
+        lines = [
+            f"def {name}(config, path, run):",
+            "    if run.memo is not None and type(config) is dict:",
+            f"        return run.memo.validate({name}, config, path, run)",
+            f"    return {name}_plain(config, path, run)",
+            "",
+            f"def {name}_plain(config, path, run):",
+            "    errors = run.errors",
+            "    warnings = run.warnings",
+            "    if type(config) is not dict:",
+            "        config = config_dict(config)",
+            "        if not isinstance(config, dict):",
+            "            return errors.failure(ValidationFailure(ValidationError, "
+            'path.key, path, config, "dictionary expected"))',
+            "    if run.defaults:",
+            f"        {self.constant(_defaults_applier(schema), 'apply_defaults_')}"
+            "(config, path, run)",
+            *entries,
+            "    for key, v in entries:",
+            "        try:",
+            *body,
+            "            config[key] = v",
+            "        except ValidationError as error:",
+            "            errors.error(error)",
+            "        except ValidationWarning as warning:",
+            "            warnings.warning(warning)",
+        ]
+
+        for key, attribute in attributes:
+            if attribute.has_default:
+                continue
+            ref = self.constant(attribute, "attribute_")
+            lines += [
+                f"    if {key!r} not in config:",
+                "        errors.failure(ValidationFailure(ValidationError, "
+                f'{ref}, Path(path, {key!r}), None, "missing"))',
+            ]
+
+        lines += ["    return config", "", f"{name}.validate = {name}_plain", ""]
+        self.lines += lines
+        return name
+
+    def value_function(self, attribute: Attribute, key: str) -> str:
+        """
+        Generate a function that validates the value of a schema
+        attribute, returns its name
+
+        The function is called with the path of the schema and returns
+        the validated value or a `ValidationFailure`.
+        """
+        name = f"validate_value_{self.count}"
+        self.count += 1
+
+        body = []
+        in_loop = self.in_loop
+        self.in_loop = False
+        try:
+            self.emit_value(body, attribute, f"Path(path, {key!r})", "run", 1)
+        finally:
+            self.in_loop = in_loop
+
+        self.lines += [f"def {name}(v, path, run):", *body, "    return v", ""]
+        return name
+
+    def list_function(self, attribute: List) -> str:
+        name = f"validate_list_{self.count}"
+        self.count += 1
+        self.functions[id(attribute)] = name
+
+        ref = self.constant(attribute, "attribute_")
+        item_ref = self.constant(attribute.item, "attribute_")
+        item_run = "run" if isinstance(attribute.item, Schema) else "run.raising()"
+
+        item_many = []
+        check_many = _batch_check(attribute.item)
+        if check_many is not None:
+            item_many = [
+                "    if validated is None:",
+                f"        validated = {self.constant(check_many, 'check_many_')}(value)",
+            ]
+
+        body = []
+        self.in_loop = True
+        self.emit_value(body, attribute.item, "Path(path, idx)", "item_run", 4)
+
+        tail = []
+        self.in_loop = False
+        self.emit_base(tail, attribute, "path", 1)
+        store = attribute._check_storage()
+        if store is not None:
+            tail.append(f"    v = {self.constant(store, 'store_')}(v, path, run)")
+
+        self.lines += [
+            f"def {name}(value, path, run):",
+            "    if isinstance(value, str):",
+            '        value = value.split(",")',
+            "    elif isinstance(value, ARRAY_TYPES):",
+            "        value = value.tolist()",
+            "    if not isinstance(value, list):",
+            "        return ValidationFailure(ValidationError, "
+            f'{ref}, path, value, "list expected")',
+            "    validated = None",
+            "    pool = run.pool",
+            "    if pool is not None and len(value) >= pool.min_items:",
+            f"        validated = pool.validate_list({item_ref}, value, path, run)",
+            *item_many,
+            "    if validated is None:",
+            "        errors = run.errors",
+            "        warnings = run.warnings",
+            f"        item_run = {item_run}",
+            "        validated = []",
+            "        append = validated.append",
+            "        for idx, v in enumerate(value):",
+            "            try:",
+            *body,
+            "                append(v)",
+            "            except ValidationError as error:",
+            "                errors.error(error)",
+            "            except ValidationWarning as warning:",
+            "                warnings.warning(warning)",
+            "    v = validated",
+            *tail,
+            "    return v",
+            "",
+        ]
+        return name
+
+    def emit_value(
+        self, out: list, attribute: Attribute, path: str, run: str, depth: int
+    ) -> None:
+        """
+        Emit code that validates `v` against `attribute`, replacing `v`
+        with the validated value
+
+        `path` is the expression for the path of the value, it is only
+        evaluated for inlined checks once a check fails. Outside of loops
+        a failure is left in `v` (or returned) for the caller to report.
+        """
+        indent = "    " * depth
+        owner = _defined_by(attribute, "validate")
+        inline = _INLINE.get(owner)
+        if inline is not None and _defined_by(attribute, "_check") is owner:
+            size = len(out)
+            inline(self, out, attribute, path, depth)
+            if len(out) == size:
+                out.append(f"{indent}pass")
+            return
+        out.append(f"{indent}v = {self.function(attribute)}(v, {path}, {run})")
+        if self.in_loop:
+            out += [
+                f"{indent}if type(v) is ValidationFailure:",
+                f"{indent}    run.report(v)",
+                f"{indent}    continue",
+            ]
+
+    def fail(self, indent: str, ref: str, path: str, reason: str) -> list:
+        """
+        Emit code that reports a failure for `v`
+
+        Within the loops of the generated functions the failure is reported
+        and validation continues with the next value, otherwise it
+        is returned.
+        """
+        failure = f"ValidationFailure(ValidationError, {ref}, {path}, v, {reason!r})"
+        if self.in_loop:
+            return [f"{indent}errors.failure({failure})", f"{indent}continue"]
+        return [f"{indent}return {failure}"]
+
+    def emit_base(self, out: list, attribute: Attribute, path: str, depth: int) -> None:
+        """
+        Emit the checks `Attribute.validate` performs
+        """
+        indent = "    " * depth
+        ref = self.constant(attribute, "attribute_")
+
+        if not attribute.container and not attribute.name:
+            out += self.fail(
+                indent, ref, path, "attribute at top level defined without a name"
+            )
+            return
+
+        if not attribute.choices_handler:
+            return
+
+        if callable(attribute.choices_handler):
+            choices = f"{ref}._run_choices_index(run)"
+        else:
+            choices = self.constant(_ChoicesIndex(attribute.choices), "choices_")
+
+        out += [
+            f"{indent}if v not in {choices}:",
+            *self.fail(indent + "    ", ref, path, "invalid choice"),
+        ]
+
+    def emit_number(
+        self,
+        out: list,
+        attribute: Attribute,
+        path: str,
+        depth: int,
+        convert: str,
+        reason: str,
+    ) -> None:
+        indent = "    " * depth
+        ref = self.constant(attribute, "attribute_")
+        if callable(getattr(attribute, "default_handler", None)):
+            # default functions are evaluated for every None value
+            out.append(
+                f"{indent}if v is not None or {ref}._run_default(run) is not None:"
+            )
+            depth += 1
+            indent = "    " * depth
+        elif attribute.default_is_none:
+            out.append(f"{indent}if v is not None:")
+            depth += 1
+            indent = "    " * depth
+        out += [
+            f"{indent}try:",
+            f"{indent}    v = {convert}(v)",
+            f"{indent}except (TypeError, ValueError):",
+            *self.fail(indent + "    ", ref, path, reason),
+        ]
+        self.emit_base(out, attribute, path, depth)
+
+    def emit_int(self, out: list, attribute: Int, path: str, depth: int) -> None:
+        self.emit_number(out, attribute, path, depth, "int", "integer expected")
+
+    def emit_float(self, out: list, attribute: Float, path: str, depth: int) -> None:
+        self.emit_number(out, attribute, path, depth, "float", "float expected")
+
+    def emit_str(self, out: list, attribute: Str, path: str, depth: int) -> None:
+        indent = "    " * depth
+        ref = self.constant(attribute, "attribute_")
+        if callable(getattr(attribute, "default_handler", None)):
+            out += [
+                f"{indent}if not isinstance(v, str) and "
+                f"{ref}._run_default(run) is not None:",
+                *self.fail(indent + "    ", ref, path, "string expected"),
+            ]
+        elif not attribute.default_is_none:
+            out += [
+                f"{indent}if not isinstance(v, str):",
+                *self.fail(indent + "    ", ref, path, "string expected"),
+            ]
+        if not attribute.blank:
+            out += [
+                f'{indent}if v == "":',
+                *self.fail(indent + "    ", ref, path, "cannot be blank"),
+            ]
+        self.emit_base(out, attribute, path, depth)
+
+    def emit_bool(self, out: list, attribute: Bool, path: str, depth: int) -> None:
+        indent = "    " * depth
+        ref = self.constant(attribute, "attribute_")
+        true_values = self.constant(attribute.true_values, "values_")
+        false_values = self.constant(attribute.false_values, "values_")
+        out += [
+            f"{indent}if isinstance(v, str):",
+            f"{indent}    lowered = v.lower()",
+            f"{indent}    if lowered in {true_values}:",
+            f"{indent}        v = True",
+            f"{indent}    elif lowered in {false_values}:",
+            f"{indent}        v = False",
+            f"{indent}    else:",
+            *self.fail(indent + "        ", ref, path, "boolean expected"),
+            f"{indent}v = bool(v)",
+        ]
+        self.emit_base(out, attribute, path, depth)
+
+
+# attributes whose checks are written out inline, by the class
+# that implements their validation
+_INLINE = {
+    Int: Generator.emit_int,
+    Float: Generator.emit_float,
+    Str: Generator.emit_str,
+    Bool: Generator.emit_bool,
+}
+
+
+def generate_source(schema: Schema) -> str:
+    """
+    Return the generated validator source for a schema
+
+    **Arguments**
+
+    - schema (`Schema`): schema instance
+    """
+    generator = Generator()
+    generator.generate(schema)
+    return generator.source
+
+
+def compile_validator(schema: Schema, rebuild: bool = False) -> Callable:
+    """
+    Generate and compile the validator function for a schema
+
+    The validator is called as `validator(config, path, run)` and can
+    be used in place of a `ValidationPlan`.
+
+    Schemas created with `codegen=True` that only hold the attributes
+    defined on their class share the validator, it is cached on the
+    schema class.
+
+    **Arguments**
+
+    - schema (`Schema`): schema instance
+
+    **Keyword Arguments**
+
+    - rebuild (`bool=False`): if `True` ignore any cached validator
+    """
+
+    cls = type(schema)
+    cacheable = (
+        schema.codegen
+        and schema.item is None
+        and all(
+            getattr(cls, name, None) is attribute
+            for name, attribute in schema.attributes()
+        )
+    )
+
+    # cached as (`_plan_generation`, validator), attributes defined on
+    # the class may have been changed since it was generated
+    generation = core._plan_generation
+    if cacheable and not rebuild:
+        cached = cls.__dict__.get("_codegen_validator")
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+
+    generator = Generator()
+    name = generator.generate(schema)
+    source = generator.source
+
+    filename = f"<confu codegen {cls.__module__}.{cls.__qualname__}>"
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    exec(compile(source, filename, "exec"), generator.namespace)
+
+    validator = generator.namespace[name]
+    validator.source = source
+
+    if cacheable:
+        cls._codegen_validator = (generation, validator)
+
+    return validator
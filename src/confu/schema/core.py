@@ -5,19 +5,61 @@ These can be imported directly from `confu.schema`
 """
 from __future__ import annotations
 
+import array
+import asyncio
 import collections.abc
 import configparser
 import copy
+import ipaddress
 import os
+import queue
+import stat
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from inspect import isclass
-from typing import Any, Callable, Iterator, NoReturn
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Callable, Iterator, NoReturn
 
 import munge
 
 from confu import types
-from confu.exceptions import ApplyDefaultError, ValidationError, ValidationWarning
+from confu.exceptions import (
+    ApplyDefaultError,
+    SoftDependencyError,
+    StopValidation,
+    ValidationError,
+    ValidationWarning,
+)
 from confu.util import config_parser_dict
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if TYPE_CHECKING:
+    from confu.schema.parallel import ValidationPool
+
+
+# cache policies of `Attribute` defaults and choices
+CACHE_FOREVER = "forever"
+CACHE_PER_RUN = "per-validation-run"
+
+# attributes holding lazily built state, still set on frozen attributes
+_LAZY_STATE = frozenset(("_frozen_default", "_plan", "_plan_built", "_compiled"))
+
+# incremented whenever an attribute that was compiled into a validation
+# plan is changed, plans built before that are built again, see
+# `Schema._current_plan`
+_plan_generation = 0
+
+# back-references set when an attribute is added to a schema or
+# container, a frozen attribute can be bound once
+_BINDINGS = frozenset(("name", "container"))
+
 
 class Attribute:
 
@@ -48,6 +90,11 @@ class Attribute:
         - deprecated (`str`): version id of when this attribute will be deprecated
         - added (`str`): version id of when this attribute was added to the schema
         - removed (`str`): version id of when this attribute will be removed
+        - cache (`str|float`): how long evaluated defaults and choices are
+          reused, especially useful if they are functions: `"forever"`
+          (until `invalidate_cache` is called), a number of seconds or
+          `"per-validation-run"`. By default they are evaluated on
+          every access.
         """
 
         # attribute name in the schema
@@ -84,8 +131,69 @@ class Attribute:
         # show default value in cli help text
         self.cli_show_default = kwargs.get("cli_show_default", True)
 
+        # cache policy for evaluated defaults and choices
+        self.cache = kwargs.get("cache")
+        if not (
+            self.cache in (None, CACHE_FOREVER, CACHE_PER_RUN)
+            or (
+                isinstance(self.cache, (int, float))
+                and not isinstance(self.cache, bool)
+                and self.cache > 0
+            )
+        ):
+            raise ValueError(
+                "cache needs to be either "
+                f"'{CACHE_FOREVER}', '{CACHE_PER_RUN}' or a number of seconds"
+            )
+        self._cached = {}
+
+        # (default, materializer) of the last default that was copied
+        self._frozen_default = None
+
         self.container = None
 
+    # set by `freeze`
+    _frozen = False
+
+    # set once the attribute was compiled into a validation plan
+    _compiled = False
+
+    def __getstate__(self) -> dict:
+        # the frozen default holds closures, it is rebuilt when needed
+        state = self.__dict__.copy()
+        state["_frozen_default"] = None
+        return state
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if (
+            self._frozen
+            and name not in _LAZY_STATE
+            and not (name in _BINDINGS and getattr(self, name) in (None, "", value))
+        ):
+            raise AttributeError(
+                f"cannot set '{name}' on frozen {type(self).__name__} attribute"
+            )
+        if self._compiled and name not in _LAZY_STATE:
+            global _plan_generation
+            _plan_generation += 1
+        object.__setattr__(self, name, value)
+
+    def __copy__(self) -> Attribute:
+        if self._frozen:
+            return self
+        copied = object.__new__(type(self))
+        copied.__dict__.update(self.__getstate__())
+        return copied
+
+    def __deepcopy__(self, memo: dict) -> Attribute:
+        # frozen attributes cannot change, so they are shared
+        if self._frozen:
+            return self
+        copied = object.__new__(type(self))
+        memo[id(self)] = copied
+        copied.__dict__.update(copy.deepcopy(self.__getstate__(), memo))
+        return copied
+
     @property
     def has_default(self) -> bool:
         return hasattr(self, "default_handler")
@@ -94,16 +202,58 @@ class Attribute:
     def default_is_none(self) -> bool:
         return self.has_default and self.default is None
 
+    def _default_is_none_check(self) -> Callable:
+        """
+        Return a function that tells whether the default of this attribute
+        is None during a validation run, as `is_none(run)`
+
+        A default function is evaluated every time (according to the cache
+        policy), like it is by `default_is_none`, any other default is
+        resolved up front.
+        """
+        if not callable(getattr(self, "default_handler", None)):
+            return _always if self.default_is_none else _never
+
+        attribute = self
+
+        def is_none(run: ValidationRun) -> bool:
+            return attribute._run_default(run) is None
+
+        return is_none
+
     @property
     def default(self) -> Any:
         """
         Return the default value for this attribute
         """
+        return self._cached_value("default", self._default, None)
+
+    def _default(self) -> Any:
         default = getattr(self, "default_handler", None)
         if callable(default):
             return default(self)
         return default
 
+    def _run_default(self, run: ValidationRun) -> Any:
+        """
+        Return the default value during a validation run
+        """
+        return self._cached_value("default", self._default, run)
+
+    def _default_copy(self) -> Any:
+        """
+        Return the default value, copied if it is mutable so it can be
+        changed without affecting the default
+
+        The default is frozen into a template once and copies are built
+        from it, as long as the same default value is returned.
+        """
+        default = self.default
+        frozen = self._frozen_default
+        if frozen is None or frozen[0] is not default:
+            frozen = self._frozen_default = (default, _materializer(default))
+        return frozen[1]()
+
     @property
     def choices(self) -> Any:
         """
@@ -112,13 +262,99 @@ class Attribute:
         Will return an empty list if the attribute is **NOT** limited by
         choices
         """
+        return self._cached_value("choices", self._choices, None)
 
+    def _choices(self) -> Any:
         choices_handler = getattr(self, "choices_handler", None)
 
         if callable(choices_handler):
             return self.choices_handler(self)
         return choices_handler
 
+    def _run_choices(self, run: ValidationRun) -> Any:
+        """
+        Return the choices during a validation run
+        """
+        return self._cached_value("choices", self._choices, run)
+
+    def _run_choices_index(self, run: ValidationRun) -> Any:
+        """
+        Return the choices during a validation run as a `_ChoicesIndex`,
+        which is reused according to the cache policy
+
+        Without a cache policy the index would be built for every value,
+        so the choices are returned as they are.
+        """
+        if self.cache is None:
+            return self._run_choices(run)
+        return self._cached_value(
+            "choices_index", lambda: _ChoicesIndex(self._run_choices(run)), run
+        )
+
+    def _cached_value(
+        self, name: str, evaluate: Callable, run: ValidationRun | None
+    ) -> Any:
+        """
+        Return the value `evaluate` returns, reusing it as long as the
+        cache policy of the attribute allows
+
+        With the `"per-validation-run"` policy values are only reused
+        within `run`, outside of validation runs they are not cached.
+        """
+        cache = self.cache
+        if cache is None:
+            return evaluate()
+
+        if cache == CACHE_PER_RUN:
+            if run is None:
+                return evaluate()
+            key = (id(self), name)
+            try:
+                return run.cache[key]
+            except KeyError:
+                value = run.cache[key] = evaluate()
+                return value
+
+        entry = self._cached.get(name)
+        if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+            return entry[0]
+        value = evaluate()
+        expires = None if cache == CACHE_FOREVER else time.monotonic() + cache
+        self._cached[name] = (value, expires)
+        return value
+
+    def invalidate_cache(self) -> None:
+        """
+        Drop cached defaults and choices, so they are evaluated again
+        on their next use
+        """
+        self._cached.clear()
+
+    @property
+    def frozen(self) -> bool:
+        """
+        Whether the attribute was frozen through `freeze`
+        """
+        return self._frozen
+
+    def freeze(self) -> Attribute:
+        """
+        Make this attribute immutable, so it can be shared between threads
+        and `Config` instances without being copied
+
+        Setting properties of a frozen attribute raises an `AttributeError`,
+        copying it returns the attribute itself. Evaluated defaults and
+        choices are still cached according to the `cache` policy.
+
+        A frozen attribute can still be added to a schema or container,
+        its `name` and `container` are set the first time it is, like
+        they are for attributes that are not frozen.
+
+        Returns the attribute.
+        """
+        object.__setattr__(self, "_frozen", True)
+        return self
+
     @property
     def cli(self) -> bool:
         """
@@ -158,6 +394,270 @@ class Attribute:
                 raise ValidationError(self, path, value, "invalid choice")
         return value
 
+    def validate_many(self, values: list, path: list[str], **kwargs: Any) -> list:
+        """
+        Validate a list of values for this attribute
+
+        Attributes that can check all values at once (`Int`, `Float`)
+        do so, values are only validated one by one to find the first
+        invalid one.
+
+        Will raise a `ValidationError` or `ValidationWarning` exception for
+        the first invalid value
+
+        **Arguments**
+
+        - values (`list`): the values to validate
+        - path (`list`): path of the list in the config, the index
+          of an invalid value is appended to it
+
+        **Returns**
+
+        list of validated values
+        """
+
+        check_many = _batch_check(self)
+        if check_many is not None:
+            validated = check_many(values)
+            if validated is not None:
+                return validated
+
+        return [
+            self.validate(value, path + [idx], **kwargs)
+            for idx, value in enumerate(values)
+        ]
+
+    def compile(self) -> Callable:
+        """
+        Return a check function for this attribute that a `ValidationPlan`
+        can call as `check(value, path, run)`, with `path` being
+        a `ConfigPath`
+
+        The check returns the validated value, or a `ValidationFailure`
+        if the value is not valid.
+
+        Attributes that implement `_check` get a closure with their
+        validation flags resolved up front, anything else (e.g. custom
+        attributes overriding `validate`) is wrapped so that its `validate`
+        method is called as before.
+        """
+
+        if _defined_by(self, "validate") is _defined_by(self, "_check"):
+            return self._check()
+
+        validate = self.validate
+
+        def check(value: Any, path: ConfigPath, run: ValidationRun) -> Any:
+            return validate(
+                value, path.as_list(), errors=run.errors, warnings=run.warnings
+            )
+
+        return check
+
+    def _check(self) -> Callable:
+        """
+        Build the check closure equivalent to `Attribute.validate`
+        """
+
+        attribute = self
+
+        if not self.container and not self.name:
+
+            def check(
+                value: Any, path: ConfigPath, run: ValidationRun
+            ) -> ValidationFailure:
+                return ValidationFailure(
+                    ValidationError,
+                    attribute,
+                    path,
+                    value,
+                    "attribute at top level defined without a name",
+                )
+
+            return check
+
+        if not self.choices_handler:
+            return _check_noop
+
+        if callable(self.choices_handler):
+
+            def check(value: Any, path: ConfigPath, run: ValidationRun) -> Any:
+                if value not in attribute._run_choices_index(run):
+                    return ValidationFailure(
+                        ValidationError, attribute, path, value, "invalid choice"
+                    )
+                return value
+
+            return check
+
+        choices = _ChoicesIndex(self.choices)
+
+        def check(value: Any, path: ConfigPath, run: ValidationRun) -> Any:
+            if value not in choices:
+                return ValidationFailure(
+                    ValidationError, attribute, path, value, "invalid choice"
+                )
+            return value
+
+        return check
+
+    def _check_many(self) -> Callable | None:
+        """
+        Build a function that checks a list of values at once, as
+        `check_many(values)`
+
+        It returns the list of validated values, or `None` if any of
+        the values is invalid (or can't be checked at once), in which
+        case the values are validated one by one.
+
+        `None` for attributes that have no such check.
+        """
+        return None
+
+
+class _ChoicesIndex:
+    """
+    Choices indexed for membership tests
+
+    Hashable choices are looked up in a frozenset, choices that are not
+    hashable but can be sorted through a binary search. Values the index
+    can't handle (e.g. unhashable values) are searched for in the list of
+    choices, so membership is the same as for the list.
+    """
+
+    __slots__ = ("choices", "hashed", "ordered")
+
+    def __init__(self, choices: Any) -> None:
+        self.choices = list(choices)
+        self.hashed = None
+        self.ordered = None
+        try:
+            self.hashed = frozenset(self.choices)
+        except TypeError:
+            try:
+                self.ordered = sorted(self.choices)
+            except TypeError:
+                pass
+
+    def __contains__(self, value: Any) -> bool:
+        if self.hashed is not None:
+            try:
+                return value in self.hashed
+            except TypeError:
+                return value in self.choices
+
+        ordered = self.ordered
+        if ordered is not None:
+            try:
+                idx = bisect_left(ordered, value)
+            except TypeError:
+                return value in self.choices
+            return idx < len(ordered) and ordered[idx] == value
+
+        return value in self.choices
+
+    def __iter__(self) -> Iterator:
+        return iter(self.choices)
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+
+def _batch_check(attribute: Attribute) -> Callable | None:
+    """
+    Return the `_check_many` function of an attribute, `None` if
+    it has none or if it is not the same validation its
+    `validate` and `_check` methods do
+    """
+    owner = _defined_by(attribute, "_check_many")
+    if (
+        _defined_by(attribute, "validate") is not owner
+        or _defined_by(attribute, "_check") is not owner
+    ):
+        return None
+    return attribute._check_many()
+
+
+def _number_batch_check(
+    attribute: Attribute, convert: Callable, kinds: str, dtype: str | None = None
+) -> Callable | None:
+    """
+    Build the `_check_many` function of a number attribute
+
+    Values are converted with `convert`, if NumPy is installed values
+    that make up a NumPy array of one of the `kinds` of data types are
+    converted by NumPy instead (cast to `dtype` if specified).
+    """
+
+    if not attribute.container and not attribute.name:
+        return None
+
+    choices = None
+    if attribute.choices_handler:
+        if callable(attribute.choices_handler):
+            return None
+        try:
+            choices = frozenset(attribute.choices)
+        except TypeError:
+            return None
+
+    def check_many(values: list) -> list | None:
+        validated = None
+        if numpy is not None:
+            try:
+                values_array = numpy.asarray(values)
+            except (TypeError, ValueError):
+                values_array = None
+            if (
+                values_array is not None
+                and values_array.ndim == 1
+                and values_array.dtype.kind in kinds
+            ):
+                if dtype is not None:
+                    values_array = values_array.astype(dtype)
+                validated = values_array.tolist()
+
+        if validated is None:
+            try:
+                validated = list(map(convert, values))
+            except (TypeError, ValueError, OverflowError):
+                return None
+
+        if choices is not None and not choices.issuperset(validated):
+            return None
+        return validated
+
+    return check_many
+
+
+# types of values `List` storage produces, accepted as list values
+if numpy is None:
+    _ARRAY_TYPES = (array.array,)
+else:
+    _ARRAY_TYPES = (array.array, numpy.ndarray)
+
+
+def _defined_by(attribute: Attribute, name: str) -> type | None:
+    """
+    Return the class in the attribute's MRO that defines `name`
+    """
+    for cls in type(attribute).__mro__:
+        if name in vars(cls):
+            return cls
+    return None
+
+
+def _check_noop(value: Any, path: ConfigPath, run: ValidationRun) -> Any:
+    return value
+
+
+def _always(run: ValidationRun) -> bool:
+    return True
+
+
+def _never(run: ValidationRun) -> bool:
+    return False
+
 
 class Str(Attribute):
 
@@ -192,6 +692,27 @@ class Str(Attribute):
 
         return super().validate(value, path, **kwargs)
 
+    def _check(self) -> Callable:
+        attribute = self
+        base = super()._check()
+        blank = self.blank
+        default_is_none = self._default_is_none_check()
+
+        def check(value: Any, path: ConfigPath, run: ValidationRun) -> str | None:
+            if not isinstance(value, str) and not default_is_none(run):
+                return ValidationFailure(
+                    ValidationError, attribute, path, value, "string expected"
+                )
+
+            if value == "" and not blank:
+                return ValidationFailure(
+                    ValidationError, attribute, path, value, "cannot be blank"
+                )
+
+            return base(value, path, run)
+
+        return check
+
 
 class File(Str):
     """
@@ -232,6 +753,42 @@ class File(Str):
 
         return value
 
+    def _check(self) -> Callable:
+        attribute = self
+        base = super()._check()
+        blank = self.blank
+        default_is_none = self._default_is_none_check()
+        require_exist = self.require_exist
+
+        def check(value: Any, path: ConfigPath, run: ValidationRun) -> str | None:
+            value = base(value, path, run)
+            if type(value) is ValidationFailure:
+                return value
+
+            if value is None and default_is_none(run):
+                return value
+
+            if value == "" and blank:
+                return value
+
+            files = run.files
+            if files is not None:
+                value = files.resolve(value)
+                kind = files.kind(value)
+            else:
+                value = _resolve_path(value)
+                kind = _path_kind(value)
+
+            valid = (kind is not None or not require_exist) and kind is not _DIR
+            if not valid:
+                return ValidationFailure(
+                    ValidationError, attribute, path, value, "file does not exist"
+                )
+
+            return value
+
+        return check
+
 
 class Directory(Str):
 
@@ -299,6 +856,52 @@ class Directory(Str):
 
         return value
 
+    def _check(self) -> Callable:
+        attribute = self
+        base = super()._check()
+        default_is_none = self._default_is_none_check()
+        create = self.create
+        require_exist = self.require_exist
+
+        def check(value: Any, path: ConfigPath, run: ValidationRun) -> str | None:
+            value = base(value, path, run)
+            if type(value) is ValidationFailure:
+                return value
+
+            if value is None and default_is_none(run):
+                return value
+
+            value = os.path.expandvars(value)
+
+            if value == "":
+                return value
+
+            value = os.path.abspath(os.path.expanduser(value))
+
+            files = run.files
+            kind = files.kind(value) if files is not None else _path_kind(value)
+
+            if create is not None and kind is None:
+                attribute.makedir(value, path)
+                if files is not None:
+                    files.forget(value)
+                    kind = files.kind(value)
+                else:
+                    kind = _path_kind(value)
+
+            if require_exist and kind is not _DIR:
+                return ValidationFailure(
+                    ValidationError,
+                    attribute,
+                    path,
+                    value,
+                    f"valid path to directory expected: {value}",
+                )
+
+            return value
+
+        return check
+
 
 class Bool(Attribute):
     """
@@ -322,6 +925,27 @@ class Bool(Attribute):
                 raise ValidationError(self, path, value, "boolean expected")
         return super().validate(bool(value), path, **kwargs)
 
+    def _check(self) -> Callable:
+        attribute = self
+        base = super()._check()
+        true_values = self.true_values
+        false_values = self.false_values
+
+        def check(value: Any, path: ConfigPath, run: ValidationRun) -> bool:
+            if isinstance(value, str):
+                lowered = value.lower()
+                if lowered in true_values:
+                    value = True
+                elif lowered in false_values:
+                    value = False
+                else:
+                    return ValidationFailure(
+                        ValidationError, attribute, path, value, "boolean expected"
+                    )
+            return base(bool(value), path, run)
+
+        return check
+
     def finalize_click(self, param: dict[str, Any], name: str) -> str:
         del param["type"]
         return "{}/--no-{}".format(name, name.strip("-"))
@@ -358,6 +982,27 @@ class Int(Attribute):
             raise ValidationError(self, path, value, "integer expected")
         return super().validate(value, path, **kwargs)
 
+    def _check(self) -> Callable:
+        attribute = self
+        base = super()._check()
+        default_is_none = self._default_is_none_check()
+
+        def check(value: Any, path: ConfigPath, run: ValidationRun) -> int | None:
+            if value is None and default_is_none(run):
+                return value
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                return ValidationFailure(
+                    ValidationError, attribute, path, value, "integer expected"
+                )
+            return base(value, path, run)
+
+        return check
+
+    def _check_many(self) -> Callable | None:
+        return _number_batch_check(self, int, "iu")
+
 
 class Float(Attribute):
 
@@ -376,6 +1021,27 @@ class Float(Attribute):
             raise ValidationError(self, path, value, "float expected")
         return super().validate(value, path, **kwargs)
 
+    def _check(self) -> Callable:
+        attribute = self
+        base = super()._check()
+        default_is_none = self._default_is_none_check()
+
+        def check(value: Any, path: ConfigPath, run: ValidationRun) -> float | None:
+            if value is None and default_is_none(run):
+                return value
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return ValidationFailure(
+                    ValidationError, attribute, path, value, "float expected"
+                )
+            return base(value, path, run)
+
+        return check
+
+    def _check_many(self) -> Callable | None:
+        return _number_batch_check(self, float, "iuf", "float64")
+
 
 class TimeDuration(Attribute):
 
@@ -398,17 +1064,35 @@ class TimeDuration(Attribute):
             raise ValidationError(self, path, value, "TimeDuration expected")
         return super().validate(value, path, **kwargs)
 
-    @property
-    def default(self) -> TimeDuration | None:
-        default = super().default
+    def _check(self) -> Callable:
+        attribute = self
+        base = super()._check()
+        default_is_none = self._default_is_none_check()
+
+        def check(
+            value: Any, path: ConfigPath, run: ValidationRun
+        ) -> types.TimeDuration | None:
+            if value is None and default_is_none(run):
+                return value
+            try:
+                value = types.TimeDuration(value)
+            except (TypeError, ValueError):
+                return ValidationFailure(
+                    ValidationError, attribute, path, value, "TimeDuration expected"
+                )
+            return base(value, path, run)
+
+        return check
+
+    def _default(self) -> TimeDuration | None:
+        default = super()._default()
         if default is None:
             return None
         else:
             return types.TimeDuration(default)
 
-    @property
-    def choices(self) -> list:
-        return list(map(types.TimeDuration, super().choices))
+    def _choices(self) -> list:
+        return list(map(types.TimeDuration, super()._choices()))
 
 
 class List(Attribute):
@@ -425,6 +1109,7 @@ class List(Attribute):
         self,
         name: str | None = None,
         item: Attribute | None = None,
+        storage: str = "list",
         **kwargs: Any,
     ) -> None:
         """
@@ -437,6 +1122,10 @@ class List(Attribute):
           the attribute.
         - item (`Attribute`): allows you to specify an arbitrary attribute
           to use for all values in the list.
+        - storage (`str="list"`): type of the validated value, `"array"`
+          for an `array.array` or `"numpy"` for a NumPy array, which store
+          numbers without a python object for each. Only supported for
+          `Int` and `Float` items.
         - default (`mixed`): the default value of this attribute. Once a default
           value is set, schema validation will no longer raise a
           validation error if the attribute is missing from the
@@ -451,18 +1140,26 @@ class List(Attribute):
         if not isinstance(item, Attribute):
             raise TypeError("item needs to be a confu attribute")
 
+        if storage not in ("list", "array", "numpy"):
+            raise ValueError("List storage needs to be either list, array or numpy")
+        if storage != "list" and not isinstance(item, (Int, Float)):
+            raise ValueError(f"{storage} storage requires Int or Float items")
+        if storage == "numpy" and numpy is None:
+            raise SoftDependencyError("numpy")
+
         if "default" not in kwargs:
             kwargs["default"] = []
 
         if isclass(item):
             kwargs["cli"] = False
 
-        if isinstance(item, Attribute):
+        if isinstance(item, Attribute) and not (item.frozen and item.container):
             item.container = self
 
         super().__init__(name, **kwargs)
 
         self.item = item
+        self.storage = storage
 
     @property
     def cli(self) -> bool:
@@ -470,6 +1167,22 @@ class List(Attribute):
             return False
         return super().cli
 
+    def invalidate_cache(self) -> None:
+        """
+        Drop cached defaults and choices of this list and its item
+        attribute
+        """
+        super().invalidate_cache()
+        self.item.invalidate_cache()
+
+    def freeze(self) -> List:
+        """
+        Make this list and its item attribute immutable, see
+        `Attribute.freeze`
+        """
+        self.item.freeze()
+        return super().freeze()
+
     def validate(
         self,
         value: list | str,
@@ -479,6 +1192,8 @@ class List(Attribute):
 
         if isinstance(value, str):
             value = value.split(",")
+        elif isinstance(value, _ARRAY_TYPES):
+            value = value.tolist()
 
         if not isinstance(value, list):
             raise ValidationError(self, path, value, "list expected")
@@ -487,23 +1202,148 @@ class List(Attribute):
         warnings = kwargs.get("warnings", ValidationErrorProcessor())
 
         validated = []
-        idx = 0
-        for item in value:
+        limit = _error_limit(
+            errors, kwargs.get("max_errors"), kwargs.get("fail_fast", False)
+        )
+        try:
+            with limit as limited:
+                for idx, item in enumerate(value):
+                    try:
+                        if isinstance(self.item, Schema):
+                            validated.append(
+                                self.item.validate(
+                                    item, path + [idx], errors=errors, warnings=warnings
+                                )
+                            )
+                        else:
+                            validated.append(self.item.validate(item, path + [idx]))
+                    except ValidationError as error:
+                        errors.error(error)
+                    except ValidationWarning as warning:
+                        warnings.warning(warning)
+        except StopValidation:
+            if not limited:
+                raise
+            return validated
+        validated = super().validate(validated, path, **kwargs)
+
+        store = self._check_storage()
+        if store is None:
+            return validated
+        result = store(validated, ConfigPath.from_list(path), None)
+        if type(result) is ValidationFailure:
+            raise result.exception()
+        return result
+
+    def _check_base(self) -> Callable:
+        """
+        Build the check for the validated list, the checks
+        `Attribute.validate` performs followed by the conversion
+        to the storage type
+        """
+        base = Attribute._check(self)
+        store = self._check_storage()
+        if store is None:
+            return base
+
+        def check(value: list, path: ConfigPath, run: ValidationRun) -> Any:
+            value = base(value, path, run)
+            if type(value) is ValidationFailure:
+                return value
+            return store(value, path, run)
+
+        return check
+
+    def _check_storage(self) -> Callable | None:
+        """
+        Build the check converting the validated list to the
+        storage type, `None` for `"list"` storage
+        """
+        attribute = self
+
+        if self.storage == "list":
+            return None
+
+        if self.storage == "numpy":
+            dtype = "float64" if isinstance(self.item, Float) else "int64"
+
+            def convert(value: list) -> Any:
+                return numpy.array(value, dtype=dtype)
+
+        else:
+            typecode = "d" if isinstance(self.item, Float) else "q"
+
+            def convert(value: list) -> Any:
+                return array.array(typecode, value)
+
+        def check(value: list, path: ConfigPath, run: ValidationRun) -> Any:
             try:
-                if isinstance(self.item, Schema):
-                    validated.append(
-                        self.item.validate(
-                            item, path + [idx], errors=errors, warnings=warnings
-                        )
-                    )
-                else:
-                    validated.append(self.item.validate(item, path + [idx]))
-                idx += 1
-            except ValidationError as error:
-                errors.error(error)
-            except ValidationWarning as warning:
-                warnings.warning(warning)
-        return super().validate(validated, path, **kwargs)
+                return convert(value)
+            except (TypeError, OverflowError):
+                return ValidationFailure(
+                    ValidationError,
+                    attribute,
+                    path,
+                    value,
+                    f"cannot be stored as {attribute.storage}",
+                )
+
+        return check
+
+    def _check(self) -> Callable:
+        attribute = self
+        base = self._check_base()
+        item_attribute = self.item
+        item = self.item.compile()
+        item_many = _batch_check(self.item)
+
+        # only schema items get to report errors to the processors
+        # of the run, anything else raises on the first error
+        item_is_schema = isinstance(self.item, Schema)
+
+        def check(value: Any, path: ConfigPath, run: ValidationRun) -> list:
+            if isinstance(value, str):
+                value = value.split(",")
+            elif isinstance(value, _ARRAY_TYPES):
+                value = value.tolist()
+
+            if not isinstance(value, list):
+                return ValidationFailure(
+                    ValidationError, attribute, path, value, "list expected"
+                )
+
+            pool = run.pool
+            if pool is not None and len(value) >= pool.min_items:
+                validated = pool.validate_list(item_attribute, value, path, run)
+                if validated is not None:
+                    return base(validated, path, run)
+
+            if item_many is not None:
+                validated = item_many(value)
+                if validated is not None:
+                    return base(validated, path, run)
+
+            item_run = run if item_is_schema else run.raising()
+            errors = run.errors
+            warnings = run.warnings
+
+            validated = []
+            for idx, entry in enumerate(value):
+                try:
+                    result = item(entry, ConfigPath(path, idx), item_run)
+                except ValidationError as error:
+                    errors.error(error)
+                    continue
+                except ValidationWarning as warning:
+                    warnings.warning(warning)
+                    continue
+                if type(result) is ValidationFailure:
+                    run.report(result)
+                    continue
+                validated.append(result)
+            return base(validated, path, run)
+
+        return check
 
 
 class ValidationErrorProcessor:
@@ -512,49 +1352,761 @@ class ValidationErrorProcessor:
     when a warning or error is encountered
     """
 
+    # processors that do not raise stop validation once they have
+    # handled this many errors, `None` for no limit
+    max_errors = None
+
     def error(self, error: ValidationError) -> NoReturn:
         raise error
 
     def warning(self, warning):
         raise warning
 
+    def failure(self, failure: ValidationFailure) -> None:
+        """
+        Handle a failure record reported by a compiled check
+
+        The exception is created from the record and passed on to
+        `error` or `warning`
+        """
+        if failure.cls is ValidationWarning:
+            self.warning(failure.exception())
+        else:
+            self.error(failure.exception())
+
 
 class CollectValidationExceptions(ValidationErrorProcessor):
     """
     This validation error processor will store all errors and warnings it encounters
     and NOT raise any exceptions
+
+    Failure records are stored as they are and only turned into
+    exceptions once they are accessed.
+
+    **Keyword Arguments**
+
+    - max_errors (`int`): stop validation once this many errors and
+      warnings have been collected
     """
 
-    def __init__(self) -> None:
-        self.exceptions = []
+    def __init__(self, max_errors: int | None = None) -> None:
+        self._exceptions = []
+        self.max_errors = max_errors
+
+    @property
+    def exceptions(self) -> list:
+        """
+        list of collected errors and warnings
+        """
+        exceptions = self._exceptions
+        for idx, exception in enumerate(exceptions):
+            if type(exception) is ValidationFailure:
+                exceptions[idx] = exception.exception()
+        return exceptions
+
+    @exceptions.setter
+    def exceptions(self, exceptions: list) -> None:
+        self._exceptions = exceptions
 
     def __iter__(self):
-        yield from self.exceptions
+        exceptions = self._exceptions
+        for idx, exception in enumerate(exceptions):
+            if type(exception) is ValidationFailure:
+                exception = exceptions[idx] = exception.exception()
+            yield exception
 
     def __len__(self) -> int:
-        return len(self.exceptions)
+        return len(self._exceptions)
 
     def __getitem__(self, key: int) -> ValidationError:
-        return self.exceptions[key]
+        exception = self._exceptions[key]
+        if type(exception) is ValidationFailure:
+            exception = self._exceptions[key] = exception.exception()
+        return exception
 
     def error(self, error: ValidationError) -> None:
-        self.exceptions.append(error)
+        self._exceptions.append(error)
+        if self.max_errors is not None and len(self._exceptions) >= self.max_errors:
+            raise StopValidation()
 
     def warning(self, warning: ValidationWarning) -> None:
-        self.exceptions.append(warning)
+        self._exceptions.append(warning)
+        if self.max_errors is not None and len(self._exceptions) >= self.max_errors:
+            raise StopValidation()
 
+    def failure(self, failure: ValidationFailure) -> None:
+        # subclasses overriding `error` or `warning` get the exceptions
+        cls = type(self)
+        if (
+            cls.error is not CollectValidationExceptions.error
+            or cls.warning is not CollectValidationExceptions.warning
+        ):
+            return super().failure(failure)
+        self._exceptions.append(failure)
+        if self.max_errors is not None and len(self._exceptions) >= self.max_errors:
+            raise StopValidation()
 
-class Schema(Attribute):
 
+class _FailureAdapter:
+    """
+    Wraps error processors that only implement `error` and `warning`,
+    so compiled checks can report failure records to them
     """
-    Describes a confu schema.
 
-    Instantiate confu attributes as properties of the schema.
+    def __init__(self, processor: Any) -> None:
+        self.processor = processor
 
-    As the schema itself is a confu attribute, you may nest schemas
-    within schemas
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.processor, name)
+
+    def error(self, error: ValidationError) -> None:
+        self.processor.error(error)
+
+    def warning(self, warning: ValidationWarning) -> None:
+        self.processor.warning(warning)
+
+    def failure(self, failure: ValidationFailure) -> None:
+        ValidationErrorProcessor.failure(self, failure)
+
+
+# marks the end of the validation in `_ErrorQueue`
+_DONE = object()
+
+
+class _ErrorQueue(ValidationErrorProcessor):
+    """
+    Validation error processor handing errors and warnings to
+    `Schema.iter_errors` through a bounded queue
+
+    Validation blocks while the queue is full and is stopped once
+    the processor has been closed.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue = queue.Queue(maxsize)
+        self.closed = False
+        self.count = 0
+
+        # unexpected exception raised by the validation
+        self.exception = None
+
+    def put(self, item: Any) -> None:
+        if self.closed:
+            raise StopValidation()
+        self.queue.put(item)
+        self.count += 1
+        if self.max_errors is not None and self.count >= self.max_errors:
+            raise StopValidation()
+
+    def error(self, error: ValidationError) -> None:
+        self.put(error)
+
+    def warning(self, warning: ValidationWarning) -> None:
+        self.put(warning)
+
+    def failure(self, failure: ValidationFailure) -> None:
+        self.put(failure)
+
+
+@contextmanager
+def _error_limit(
+    errors: ValidationErrorProcessor, max_errors: int | None, fail_fast: bool
+) -> Iterator[bool]:
+    """
+    Apply `max_errors` / `fail_fast` validation arguments to an errors
+    processor for the duration of the block, yields whether a limit
+    was set
+
+    The previous limit of the processor is restored afterwards, so
+    processors passed in by the caller keep their own limit.
+    """
+    if fail_fast:
+        max_errors = 1
+    if max_errors is None:
+        yield False
+        return
+    previous = getattr(errors, "max_errors", None)
+    errors.max_errors = max_errors
+    try:
+        yield True
+    finally:
+        errors.max_errors = previous
+
+
+class ConfigPath:
+    """
+    Path to a value in config data
+
+    Stored as the last key and a reference to the parent path, so paths
+    of nested values share their common prefix. It is only turned into
+    a list of keys when needed, e.g., once an exception is created
+    from a `ValidationFailure`.
+    """
+
+    __slots__ = ("parent", "key")
+
+    def __init__(self, parent: ConfigPath | None = None, key: Any = None) -> None:
+        """
+        **Keyword Arguments**
+
+        - parent (`ConfigPath`): path of the containing value, `None` for
+          the root path
+        - key (`mixed`): dict key or list index of the value
+        """
+        self.parent = parent
+        self.key = key
+
+    @classmethod
+    def from_list(cls, keys: list) -> ConfigPath:
+        path = cls()
+        for key in keys:
+            path = cls(path, key)
+        return path
+
+    def as_list(self) -> list:
+        keys = []
+        path = self
+        while path.parent is not None:
+            keys.append(path.key)
+            path = path.parent
+        keys.reverse()
+        return keys
+
+    def __iter__(self) -> Iterator:
+        return iter(self.as_list())
+
+    def __len__(self) -> int:
+        length = 0
+        path = self
+        while path.parent is not None:
+            length += 1
+            path = path.parent
+        return length
+
+    def __repr__(self) -> str:
+        return repr(self.as_list())
+
+
+class ValidationFailure:
+    """
+    Lightweight record of a failed check
+
+    Compiled checks return these instead of raising, the actual
+    `ValidationError` or `ValidationWarning` is only created through
+    `exception()` when it is needed.
+    """
+
+    __slots__ = ("cls", "attribute", "path", "value", "reason")
+
+    def __init__(
+        self,
+        cls: type,
+        attribute: Attribute | str | None,
+        path: ConfigPath | list[str],
+        value: Any,
+        reason: str,
+    ) -> None:
+        self.cls = cls
+        self.attribute = attribute
+        self.path = path
+        self.value = value
+        self.reason = reason
+
+    def exception(self) -> ValidationError | ValidationWarning:
+        return self.cls(self.attribute, self.path, self.value, self.reason)
+
+
+# kinds of filesystem paths as returned by `FilesystemCache.kind`
+_FILE = "file"
+_DIR = "dir"
+
+
+def _resolve_path(value: str) -> str:
+    """
+    Return the absolute path for a config value, with environment
+    and user variables expanded
+    """
+    return os.path.abspath(os.path.expanduser(os.path.expandvars(value)))
+
+
+def _path_kind(path: str) -> str | None:
+    """
+    Return whether `path` is a directory or file, `None` if it
+    does not exist
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except (OSError, ValueError):
+        return None
+    return _DIR if stat.S_ISDIR(mode) else _FILE
+
+
+def _scan_directory(directory: str, names: set) -> dict:
+    """
+    Return the kinds of the paths for `names` in `directory` with
+    a single `os.scandir`
+
+    Symlinks, paths in directories that can not be listed and names
+    that are not listed are left out, they need to be looked up on
+    their own. Names are compared as they are, on case insensitive
+    filesystems a name may exist with a different case than listed.
+    """
+    kinds = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name in names and not entry.is_symlink():
+                    kinds[entry.path] = _DIR if entry.is_dir() else _FILE
+    except (FileNotFoundError, NotADirectoryError):
+        # nothing exists in a directory that does not exist
+        for name in names:
+            kinds[os.path.join(directory, name)] = None
+    except OSError:
+        pass
+    return kinds
+
+
+class FilesystemCache:
+    """
+    Cache of the filesystem lookups done by `File` and `Directory`
+    checks
+
+    Every validation run uses its own cache, so each path is only
+    looked up once per run. Pass an instance to `Schema.validate` (or
+    `validate`) through the `files` keyword argument to enable batched
+    lookups, or to share the cache between validations.
+
+    Lookups are cached for the lifetime of the cache and never
+    refreshed, paths created or removed by others after they were
+    looked up keep their cached state. Use a new cache (or `forget`)
+    to see changes, e.g. for every validation of a shared instance.
+
+    **Keyword Arguments**
+
+    - batch (`bool=False`): collect all `File` and `Directory` paths of
+      the config before validating it and look them up with one
+      `os.scandir` per directory
+    - max_workers (`int`): list directories for batched lookups in a
+      thread pool with this many threads, useful for slow network mounts
+    """
+
+    def __init__(self, batch: bool = False, max_workers: int | None = None) -> None:
+        self.batch = batch
+        self.max_workers = max_workers
+        self._kinds = {}
+        self._paths = {}
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def resolve(self, value: str) -> str:
+        """
+        Return the absolute path for a config value, with environment
+        and user variables expanded
+        """
+        try:
+            return self._paths[value]
+        except KeyError:
+            path = self._paths[value] = _resolve_path(value)
+            return path
+
+    def kind(self, path: str) -> str | None:
+        """
+        Return `"dir"` or `"file"` for an absolute path, `None` if
+        it does not exist
+        """
+        try:
+            return self._kinds[path]
+        except KeyError:
+            kind = self._kinds[path] = _path_kind(path)
+            return kind
+
+    def forget(self, path: str) -> None:
+        """
+        Drop the cached lookups for a path and its parent directories,
+        e.g., after the path was created
+        """
+        while True:
+            self._kinds.pop(path, None)
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+
+    def prefetch(self, values: collections.abc.Iterable) -> None:
+        """
+        Look up the paths for config values in batches, listing each
+        of their directories once
+        """
+        directories = {}
+        for value in values:
+            path = self.resolve(value)
+            if path in self._kinds:
+                continue
+            directory, name = os.path.split(path)
+            if name:
+                directories.setdefault(directory, set()).add(name)
+
+        if self.max_workers and len(directories) > 1:
+            with ThreadPoolExecutor(self.max_workers) as executor:
+                results = list(
+                    executor.map(_scan_directory, directories, directories.values())
+                )
+        else:
+            results = map(_scan_directory, directories, directories.values())
+
+        for kinds in results:
+            self._kinds.update(kinds)
+
+
+def _file_paths(attribute: Attribute, value: Any) -> Iterator[str]:
+    """
+    Yield the `File` and `Directory` values in config data
+    """
+    if isinstance(attribute, (File, Directory)):
+        if isinstance(value, str) and value:
+            yield value
+    elif isinstance(attribute, Schema):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                child = attribute._attr.get(key, attribute.item)
+                if child is not None:
+                    yield from _file_paths(child, item)
+    elif isinstance(attribute, List):
+        if isinstance(value, str):
+            value = value.split(",")
+        if isinstance(value, list):
+            for item in value:
+                yield from _file_paths(attribute.item, item)
+
+
+class ValidationRun:
+    """
+    State of a single validation pass, handed to the check functions
+    of a `ValidationPlan`
+    """
+
+    __slots__ = ("errors", "warnings", "memo", "pool", "files", "cache", "defaults")
+
+    def __init__(
+        self,
+        errors: ValidationErrorProcessor,
+        warnings: ValidationErrorProcessor,
+        memo: ValidationMemo | None = None,
+        pool: ValidationPool | None = None,
+        files: FilesystemCache | None = None,
+        cache: dict | None = None,
+        defaults: bool = False,
+    ) -> None:
+        if getattr(errors, "failure", None) is None:
+            errors = _FailureAdapter(errors)
+        if getattr(warnings, "failure", None) is None:
+            warnings = _FailureAdapter(warnings)
+        self.errors = errors
+        self.warnings = warnings
+        self.memo = memo
+        self.pool = pool
+        self.files = files
+
+        # values of attributes with the "per-validation-run" cache policy
+        self.cache = {} if cache is None else cache
+
+        # apply defaults to missing values while validating
+        self.defaults = defaults
+
+    def raising(self) -> ValidationRun:
+        """
+        Return a run that raises on the first error or warning and
+        otherwise shares the state of this run
+        """
+        return ValidationRun(
+            _RAISE.errors,
+            _RAISE.warnings,
+            self.memo,
+            self.pool,
+            self.files,
+            self.cache,
+            self.defaults,
+        )
+
+    def report(self, failure: ValidationFailure) -> None:
+        """
+        Pass a failure record to the errors or warnings processor
+        """
+        if failure.cls is ValidationWarning:
+            self.warnings.failure(failure)
+        else:
+            self.errors.failure(failure)
+
+
+# run that raises on the first error or warning
+_RAISE = ValidationRun(ValidationErrorProcessor(), ValidationErrorProcessor())
+
+
+class ValidationMemo:
+    """
+    Bounded cache of validated config subtrees
+
+    Pass an instance to `Schema.validate` (or `validate`) through the
+    `memo` keyword argument. Every dict validated by a schema is looked
+    up by the schema and the exact content of the dict, identical
+    subtrees are validated once and a copy of the validated result is
+    used for any repeats. Only subtrees that validated without errors
+    or warnings are cached.
+
+    The same instance may be reused for any number of validations, for
+    example to validate many configs sharing large common blocks, but
+    should not be used by several threads at once.
+
+    Checks are expected to depend on the value only, results of checks
+    that look at external state (like `File` or `Directory`) are reused
+    as long as they stay in the cache.
+
+    **Keyword Arguments**
+
+    - maxsize (`int=1024`): maximum number of validated subtrees to
+      keep, least recently used ones are dropped first
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = collections.OrderedDict()
+
+        # content keys of the dicts in the config currently being
+        # validated, by id
+        self._keys = None
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def clear(self) -> None:
+        """
+        Drop all cached subtrees and reset the counters
+        """
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def validate(
+        self,
+        plan: ValidationPlan | Callable,
+        config: dict,
+        path: ConfigPath,
+        run: ValidationRun,
+    ) -> dict:
+        """
+        Validate `config` with `plan`, reusing a cached result if the
+        same content has been validated by the plan before
+
+        `plan` is a `ValidationPlan` or generated validator, its
+        `validate` method is used to validate `config` on a cache miss.
+        As with the plan itself `config` is updated in place.
+        """
+        keys = self._keys
+        if keys is None:
+            # content keys of nested dicts are computed along with the
+            # key of the outermost one and kept until it is validated
+            self._keys = {}
+            try:
+                return self.validate(plan, config, path, run)
+            finally:
+                self._keys = None
+
+        key = self._key(plan, config, run)
+        if key is None:
+            # unhashable values, can't be cached
+            return plan.validate(config, path, run)
+
+        if self._lookup(key, config):
+            return config
+
+        collected, memo_run = self._collecting_run(run)
+        config = plan.validate(config, path, memo_run)
+        self._store(key, config, collected, run)
+        return config
+
+    def _key(self, owner: Any, config: dict, run: ValidationRun) -> tuple | None:
+        """
+        Return the cache key of `config` validated by `owner`, or None
+        if it holds unhashable values
+        """
+        keys = self._keys
+        try:
+            content = keys.get(id(config))
+            if content is None:
+                content = _content_key(config, keys)
+        except TypeError:
+            return None
+        return (owner, run.defaults, content)
+
+    def _lookup(self, key: tuple, config: dict) -> bool:
+        """
+        Update `config` with the cached result for `key`, returns
+        whether there is one
+        """
+        cache = self._cache
+        validated = cache.get(key)
+        if validated is None:
+            self.misses += 1
+            return False
+        self.hits += 1
+        cache.move_to_end(key)
+        config.update(_copy_validated(validated))
+        return True
+
+    def _collecting_run(
+        self, run: ValidationRun
+    ) -> tuple[CollectValidationExceptions, ValidationRun]:
+        """
+        Return a processor and a copy of `run` reporting to it, failures
+        of a subtree are collected to know whether the result can be
+        cached and passed on afterwards in order by `_store`
+        """
+        collected = CollectValidationExceptions()
+        return collected, ValidationRun(
+            collected,
+            collected,
+            self,
+            run.pool,
+            run.files,
+            run.cache,
+            run.defaults,
+        )
+
+    def _store(
+        self,
+        key: tuple,
+        config: dict,
+        collected: CollectValidationExceptions,
+        run: ValidationRun,
+    ) -> None:
+        """
+        Cache the validated `config` if it validated without failures,
+        otherwise report the collected failures to `run`
+        """
+        if not len(collected):
+            cache = self._cache
+            cache[key] = _copy_validated(config)
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+            return
+
+        for failure in collected._exceptions:
+            if type(failure) is ValidationFailure:
+                run.report(failure)
+            elif isinstance(failure, ValidationWarning):
+                run.warnings.warning(failure)
+            else:
+                run.errors.error(failure)
+
+
+def _content_key(value: Any, keys: dict) -> Any:
+    """
+    Return a hashable representation of config data that compares
+    equal only for identical content, raises `TypeError` for
+    unhashable values
+
+    The keys of all dicts are stored in `keys` by id
+    """
+    vtype = type(value)
+    if vtype is str:
+        # strings only compare equal to strings
+        return value
+    if vtype is dict:
+        content = keys[id(value)] = (
+            dict,
+            tuple(
+                (
+                    key if type(key) is str else (type(key), key),
+                    item if type(item) is str else _content_key(item, keys),
+                )
+                for key, item in value.items()
+            ),
+        )
+        return content
+    if vtype is list:
+        return (list, tuple(_content_key(item, keys) for item in value))
+    hash(value)
+    return (vtype, value)
+
+
+# validated values that can be shared between copies
+_IMMUTABLE = {
+    str,
+    int,
+    float,
+    bool,
+    type(None),
+    types.TimeDuration,
+    ipaddress.IPv4Address,
+    ipaddress.IPv6Address,
+    ipaddress.IPv4Network,
+    ipaddress.IPv6Network,
+    ipaddress.IPv4Interface,
+    ipaddress.IPv6Interface,
+}
+
+
+def _copy_validated(value: Any) -> Any:
+    """
+    Copy validated config data, only dicts, lists and values of
+    unknown types are copied
+    """
+    vtype = type(value)
+    if vtype is dict:
+        return {
+            key: item if type(item) in _IMMUTABLE else _copy_validated(item)
+            for key, item in value.items()
+        }
+    if vtype is list:
+        return [
+            item if type(item) in _IMMUTABLE else _copy_validated(item)
+            for item in value
+        ]
+    if vtype in _IMMUTABLE:
+        return value
+    return copy.deepcopy(value)
+
+
+def _materializer(value: Any) -> Callable[[], Any]:
+    """
+    Freeze a default value and return a function building copies of it
+    that are safe to mutate
+
+    Dicts and lists are frozen into tuples, values of immutable types are
+    shared between the template and all copies built from it.
+    """
+    vtype = type(value)
+    if vtype in _IMMUTABLE:
+        return lambda: value
+    if vtype is dict:
+        if all(type(item) in _IMMUTABLE for item in value.values()):
+            return MappingProxyType(dict(value)).copy
+        items = tuple((key, _materializer(item)) for key, item in value.items())
+        return lambda: {key: build() for key, build in items}
+    if vtype is list:
+        if all(type(item) in _IMMUTABLE for item in value):
+            template = tuple(value)
+            return lambda: list(template)
+        builders = tuple(_materializer(item) for item in value)
+        return lambda: [build() for build in builders]
+    template = copy.deepcopy(value)
+    return lambda: copy.deepcopy(template)
 
-    **Example**
+
+class Schema(Attribute):
+
+    """
+    Describes a confu schema.
+
+    Instantiate confu attributes as properties of the schema.
+
+    As the schema itself is a confu attribute, you may nest schemas
+    within schemas
+
+    **Example**
 
     ```
     class MySchema(Schema):
@@ -562,6 +2114,27 @@ class Schema(Attribute):
     ```
     """
 
+    # attributes defined on the schema class by name, in definition
+    # order - collected once per class by `__init_subclass__`
+    _attributes = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+
+        # collect attributes, base classes first
+        names = {}
+        for klass in reversed(cls.__mro__):
+            for name in vars(klass):
+                names[name] = None
+
+        cls._attributes = {}
+        for name in names:
+            attr = getattr(cls, name, None)
+            if isinstance(attr, Attribute):
+                cls._attributes[name] = attr
+                if not attr.name:
+                    attr.name = name
+
     def __init__(self, *args: str, **kwargs: Any) -> None:
         """
         Initialize schema
@@ -583,16 +2156,21 @@ class Schema(Attribute):
         - deprecated (`str`): version id of when this attribute will be deprecated
         - added (`str`): version id of when this attribute was added to the schema
         - removed (`str`): version id of when this attribute will be removed
+        - codegen (`bool=False`): if `True` validation will use a validator
+          function generated specifically for this schema, see
+          `confu.schema.codegen`
         """
 
-        # collect attributes
-        self._attr = {}
-        for name in dir(self):
-            attr = getattr(self, name)
+        # attributes are collected when the class is created, only
+        # attributes set on the instance need to be added here
+        self._attr = dict(self._attributes)
+        for name, attr in list(vars(self).items()):
             if isinstance(attr, Attribute):
                 self._attr[name] = attr
                 if not attr.name:
                     attr.name = name
+            elif name in self._attr:
+                del self._attr[name]
 
         if "default" not in kwargs:
             kwargs["default"] = {}
@@ -605,24 +2183,66 @@ class Schema(Attribute):
                 "You cannot specify an `item` attribute on a "
                 "Schema instance that has attributes defined within"
             )
-        elif self.item:
+        elif self.item and not (self.item.frozen and self.item.container):
             self.item.container = self
 
+        self.codegen = kwargs.get("codegen", False)
+        self._plan = None
+
+        # `_plan_generation` the plan was built at
+        self._plan_built = None
+
         super().__init__(*args, **kwargs)
 
+    def __getstate__(self) -> dict:
+        # the compiled plan holds closures, it is rebuilt when needed
+        state = super().__getstate__()
+        state["_plan"] = None
+        return state
+
     def attributes(self) -> Iterator:
         # redundant?
         yield from list(self._attr.items())
 
-    def walk(self, callback: Callable, path: list[str] | None = None) -> None:
-        if not path:
-            path = []
+    def invalidate_cache(self) -> None:
+        """
+        Drop cached defaults and choices of this schema and all
+        of its attributes
+        """
+        super().invalidate_cache()
         for name, attribute in self.attributes():
+            attribute.invalidate_cache()
+        if self.item is not None:
+            self.item.invalidate_cache()
+
+    def freeze(self) -> Schema:
+        """
+        Make this schema and all of its attributes immutable, see
+        `Attribute.freeze`
+
+        The validation plan is built up front, so threads validating
+        with a shared frozen schema do not build it concurrently.
+
+        Attributes defined on the schema class are shared by all
+        instances of the class and are frozen for all of them.
+        """
+        for name, attribute in self.attributes():
+            attribute.freeze()
+        if self.item is not None:
+            self.item.freeze()
+        self._current_plan()
+        return super().freeze()
+
+    def walk(
+        self, callback: Callable, path: list[str] | ConfigPath | None = None
+    ) -> None:
+        if not isinstance(path, ConfigPath):
+            path = ConfigPath.from_list(path or [])
+        for name, attribute in self.attributes():
+            child = ConfigPath(path, name)
+            callback(attribute, child.as_list())
             if isinstance(attribute, Schema):
-                callback(attribute, path + [name])
-                attribute.walk(callback, path=path + [name])
-            else:
-                callback(attribute, path + [name])
+                attribute.walk(callback, path=child)
 
     def validate(
         self,
@@ -630,8 +2250,13 @@ class Schema(Attribute):
         path: list[str] | None = None,
         errors: ValidationErrorProcessor | None = None,
         warnings: ValidationErrorProcessor | None = None,
+        max_errors: int | None = None,
+        fail_fast: bool = False,
+        memo: ValidationMemo | None = None,
+        pool: ValidationPool | None = None,
+        files: FilesystemCache | None = None,
+        defaults: bool = False,
     ) -> dict[str, Any]:
-
         """
         Validate config data against this schema
 
@@ -646,8 +2271,25 @@ class Schema(Attribute):
           on any subsequent calls (nested schemas)
         - errors (`ValidationErrorProcessor`)
         - warnigns (`ValidationErrorProcessor`)
+        - max_errors (`int`): stop validating once the errors processor
+          has handled this many errors
+        - fail_fast (`bool=False`): stop validating at the first error,
+          same as `max_errors=1`
+        - memo (`ValidationMemo`): reuse validation results for identical
+          subtrees, see `ValidationMemo`
+        - pool (`ValidationPool`): validate large collections in worker
+          processes, see `confu.schema.parallel`
+        - files (`FilesystemCache`): cache for filesystem lookups, a new
+          one is used for every validation by default
+        - defaults (`bool=False`): apply defaults to missing values while
+          validating, which has the same result as calling `apply_defaults`
+          first, but visits the config data only once
         """
 
+        # the call that starts the validation (or sets the limit) is the
+        # one that handles validation being stopped
+        handle_stop = path is None
+
         if path is None:
             path = []
         if errors is None:
@@ -655,43 +2297,402 @@ class Schema(Attribute):
         if warnings is None:
             warnings = ValidationErrorProcessor()
 
-        # munge Config support without having to import munge
-        if isinstance(config, collections.abc.MutableMapping) and hasattr(
-            config, "data"
-        ):
-            config = config.data
-        elif isinstance(config, configparser.ConfigParser):
-            config = config_parser_dict(config)
+        if not isinstance(path, ConfigPath):
+            path = ConfigPath.from_list(path)
+
+        if files is None:
+            files = FilesystemCache()
+        elif files.batch:
+            files.prefetch(_file_paths(self, config))
+
+        plan = self._current_plan()
+
+        run = ValidationRun(errors, warnings, memo, pool, files, defaults=defaults)
+        with _error_limit(errors, max_errors, fail_fast) as limited:
+            try:
+                return plan(config, path, run)
+            except StopValidation:
+                if not (handle_stop or limited):
+                    raise
+                return config
+
+    async def avalidate(
+        self,
+        config: dict,
+        path: list[str] | None = None,
+        errors: ValidationErrorProcessor | None = None,
+        warnings: ValidationErrorProcessor | None = None,
+        max_errors: int | None = None,
+        fail_fast: bool = False,
+        memo: ValidationMemo | None = None,
+        pool: ValidationPool | None = None,
+        files: FilesystemCache | None = None,
+        defaults: bool = False,
+        yield_every: int = 1000,
+    ) -> dict[str, Any]:
+        """
+        Validate config data against this schema without blocking
+        the event loop, see `confu.schema.aio`
+
+        Takes the same arguments as `validate`, a `pool` validates
+        collections in its worker processes while the event loop
+        keeps running
+
+        **Keyword Arguments**
+
+        - yield_every (`int=1000`): hand control back to the event loop
+          after this many values have been validated
+        """
+        from confu.schema.aio import AsyncValidator
 
-        if not isinstance(config, dict):
-            return errors.error(
-                ValidationError(path[-1], path, config, "dictionary expected")
+        handle_stop = path is None
+
+        if path is None:
+            path = []
+        if errors is None:
+            errors = ValidationErrorProcessor()
+        if warnings is None:
+            warnings = ValidationErrorProcessor()
+
+        if not isinstance(path, ConfigPath):
+            path = ConfigPath.from_list(path)
+
+        if files is None:
+            files = FilesystemCache()
+        elif files.batch:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, files.prefetch, list(_file_paths(self, config))
             )
 
-        for key, value in list(config.items()):
+        run = ValidationRun(errors, warnings, memo, pool, files, defaults=defaults)
+        with _error_limit(errors, max_errors, fail_fast) as limited:
             try:
-                attribute = self._attr.get(key, self.item)
+                result = await AsyncValidator(yield_every).validate(
+                    self, config, path, run
+                )
+            except StopValidation:
+                if not (handle_stop or limited):
+                    raise
+                return config
+        if type(result) is ValidationFailure:
+            run.report(result)
+            return config
+        return result
+
+    def iter_errors(
+        self,
+        config: dict,
+        path: list[str] | None = None,
+        queue_size: int = 1000,
+        **kwargs: Any,
+    ) -> Iterator[ValidationError | ValidationWarning]:
+        """
+        Validate config data against this schema and yield errors and
+        warnings as they are found
+
+        Validation runs in a separate thread and hands errors over
+        through a queue holding at most `queue_size` of them, so they
+        are never collected as a whole. Validation is stopped once the
+        iteration stops.
+
+        Unlike `validate` the validated values are not written to
+        `config`, the thread validates a deep copy of it, so `config`
+        is never changed while it is iterated or after the iteration
+        stopped early.
+
+        **Arguments**
+
+        - config (`dict`): config to validate
+
+        **Keyword Arguments**
+
+        - path (`list`): path of the config data
+        - queue_size (`int=1000`): number of errors validation may get
+          ahead of the iteration by
+
+        Any additional kwargs (`max_errors`, `fail_fast`, `memo`, `pool`,
+        `files`) will be passed on to `validate`
+        """
+        processor = _ErrorQueue(queue_size)
+        config = copy.deepcopy(config)
+
+        def run() -> None:
+            try:
+                self.validate(
+                    config, path, errors=processor, warnings=processor, **kwargs
+                )
+            except StopValidation:
+                pass
+            except Exception as exc:
+                processor.exception = exc
+            processor.queue.put(_DONE)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                item = processor.queue.get()
+                if item is _DONE:
+                    break
+                if type(item) is ValidationFailure:
+                    item = item.exception()
+                yield item
+        finally:
+            # unblock and stop the validation if the iteration ended early
+            processor.closed = True
+            while thread.is_alive():
+                try:
+                    processor.queue.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+
+        if processor.exception is not None:
+            raise processor.exception
+
+    def compile(self) -> ValidationPlan | Callable:
+        """
+        Lower this schema into a `ValidationPlan` and cache it for
+        use by `validate`
+
+        This happens automatically on the first validation, calling it
+        again will rebuild the plan. The plan is also rebuilt on the next
+        validation if any attribute it was built from was changed.
+
+        If the schema was created with `codegen=True` the plan is a
+        generated validator function instead (see `confu.schema.codegen`)
+
+        Schemas that override `validate` return a check wrapping their
+        `validate` method instead, so they can still be nested within
+        other schemas.
+        """
+        self._current_plan(rebuild=True)
+        if _defined_by(self, "validate") is not Schema:
+            return super().compile()
+        return self._plan
+
+    def _current_plan(self, rebuild: bool = False) -> ValidationPlan | Callable:
+        """
+        Return the validation plan of this schema, building it if there
+        is none yet or if attributes were changed since it was built
 
-                if attribute is None:
-                    raise ValidationWarning(
-                        key, path, value, f"unknown attribute '{key}'"
+        Frozen schemas cannot be changed, their plan is always current.
+        """
+        plan = self._plan
+        if plan is not None and not rebuild:
+            if self._frozen or self._plan_built == _plan_generation:
+                return plan
+            rebuild = True
+        generation = _plan_generation
+        plan = self._plan = self._build_plan(rebuild=rebuild)
+        self._plan_built = generation
+        return plan
+
+    def _build_plan(self, rebuild: bool = False) -> ValidationPlan | Callable:
+        _mark_compiled(self)
+        if self.codegen:
+            from confu.schema.codegen import compile_validator
+
+            return compile_validator(self, rebuild=rebuild)
+        return ValidationPlan(self)
+
+
+class ValidationPlan:
+    """
+    Flat validation plan for a schema as returned by `Schema.compile`
+
+    Holds a check function for each attribute with nested schemas and
+    lists already compiled, so that validating config data does not
+    need to resolve attributes and their flags again for every value.
+
+    The plan is called as `plan(config, path, run)`, if the run has
+    a `ValidationMemo` it is consulted first.
+    """
+
+    def __init__(self, schema: Schema) -> None:
+        self.schema = schema
+
+        # check functions by attribute name
+        self.checks = {
+            name: attribute.compile() for name, attribute in schema.attributes()
+        }
+
+        # check function for arbitrary keys
+        self.item = schema.item.compile() if schema.item is not None else None
+
+        # attributes that need to be present in the config
+        self.required = tuple(
+            (name, attribute)
+            for name, attribute in schema.attributes()
+            if not attribute.has_default
+        )
+
+        # applies defaults for runs that do so
+        self.apply_defaults = _defaults_applier(schema)
+
+    def __call__(self, config: Any, path: ConfigPath, run: ValidationRun) -> Any:
+        if run.memo is not None and type(config) is dict:
+            return run.memo.validate(self, config, path, run)
+        return self.validate(config, path, run)
+
+    def validate(self, config: Any, path: ConfigPath, run: ValidationRun) -> Any:
+        """
+        Validate config data, without consulting a memo
+        """
+        errors = run.errors
+
+        if type(config) is not dict:
+            config = _config_dict(config)
+            if not isinstance(config, dict):
+                return errors.failure(
+                    ValidationFailure(
+                        ValidationError,
+                        path.key,
+                        path,
+                        config,
+                        "dictionary expected",
                     )
-                else:
-                    config[key] = attribute.validate(
-                        value, path + [key], errors=errors, warnings=warnings
+                )
+
+        if run.defaults:
+            self.apply_defaults(config, path, run)
+
+        checks = self.checks
+        item = self.item
+
+        pool = run.pool
+        if (
+            item is not None
+            and pool is not None
+            and len(config) >= pool.min_items
+            and pool.validate_dict(self.schema.item, config, path, run)
+        ):
+            # all keys are validated by the item attribute
+            entries = ()
+        else:
+            entries = list(config.items())
+
+        for key, value in entries:
+            check = checks.get(key, item)
+            if check is None:
+                run.warnings.failure(
+                    ValidationFailure(
+                        ValidationWarning,
+                        key,
+                        path,
+                        value,
+                        f"unknown attribute '{key}'",
                     )
+                )
+                continue
+            try:
+                result = check(value, ConfigPath(path, key), run)
             except ValidationError as error:
                 errors.error(error)
+                continue
             except ValidationWarning as warning:
-                warnings.warning(warning)
-
-        for name, attribute in self.attributes():
-            if name not in config and not attribute.has_default:
-                errors.error(ValidationError(attribute, path + [name], None, "missing"))
+                run.warnings.warning(warning)
+                continue
+            if type(result) is ValidationFailure:
+                run.report(result)
+            else:
+                config[key] = result
+
+        for name, attribute in self.required:
+            if name not in config:
+                errors.failure(
+                    ValidationFailure(
+                        ValidationError,
+                        attribute,
+                        ConfigPath(path, name),
+                        None,
+                        "missing",
+                    )
+                )
 
         return config
 
 
+def _default_value(attribute: Attribute) -> Any:
+    """
+    Return the value `apply_default` sets for an attribute missing
+    from the config
+
+    Schemas are always set, to an empty dict if they have no default.
+    """
+    if isinstance(attribute, Schema):
+        if isinstance(attribute, ProxySchema):
+            attribute = attribute.schema(None)
+        return attribute._default_copy() or {}
+    return attribute._default_copy()
+
+
+def _mark_compiled(attribute: Attribute) -> None:
+    """
+    Mark an attribute and the attributes it holds as compiled into
+    a validation plan, changing them afterwards rebuilds the plan
+    """
+    pending = [attribute]
+    seen = set()
+    while pending:
+        attribute = pending.pop()
+        if id(attribute) in seen:
+            continue
+        seen.add(id(attribute))
+        if not attribute._compiled:
+            object.__setattr__(attribute, "_compiled", True)
+        if isinstance(attribute, Schema):
+            pending.extend(child for name, child in attribute.attributes())
+        item = getattr(attribute, "item", None)
+        if isinstance(item, Attribute):
+            pending.append(item)
+
+
+def _defaults_applier(schema: Schema) -> Callable:
+    """
+    Build the function that applies the defaults of a schema's attributes
+    to config data, as `apply(config, path, run)`
+
+    Values of the attributes are set if they are missing or `None`, as
+    they are by `apply_defaults`. Defaults of nested schemas are applied
+    once they are validated. Exceptions raised while evaluating
+    a default are reported as `ApplyDefaultError`.
+    """
+    attributes = tuple(
+        (name, attribute)
+        for name, attribute in schema.attributes()
+        if isinstance(attribute, Schema) or attribute.has_default
+    )
+
+    def apply(config: dict, path: ConfigPath, run: ValidationRun) -> None:
+        for name, attribute in attributes:
+            if config.get(name) is not None:
+                continue
+            try:
+                config[name] = _default_value(attribute)
+            except Exception as exc:
+                run.errors.error(
+                    ApplyDefaultError(attribute, ConfigPath(path, name), None, exc)
+                )
+
+    return apply
+
+
+def _config_dict(config: Any) -> Any:
+    """
+    Return the dict held by munge and configparser config objects,
+    anything else is returned as is
+    """
+
+    # munge Config support without having to import munge
+    if isinstance(config, collections.abc.MutableMapping) and hasattr(config, "data"):
+        return config.data
+    elif isinstance(config, configparser.ConfigParser):
+        return config_parser_dict(config)
+    return config
+
+
 class Dict(Schema):
     """
     Wrapper for schema with arbitrary keys
@@ -723,18 +2724,51 @@ class ProxySchema(Schema):
         """
         raise NotImplementedError()
 
+    def compile(self) -> Callable:
+        """
+        Return a check that validates config data with the plan of the
+        schema returned by `schema`, as part of the same validation run
+        """
+        if _defined_by(self, "validate") is not ProxySchema:
+            return super().compile()
+
+        proxy = self
+
+        def check(config: Any, path: ConfigPath, run: ValidationRun) -> Any:
+            schema = proxy.schema(config)
+            if _defined_by(schema, "validate") is not Schema:
+                return Attribute.compile(schema)(config, path, run)
+            return schema._current_plan()(config, path, run)
+
+        return check
+
     def validate(
         self,
         config: dict,
         path: list[str] | None = None,
         errors: ValidationErrorProcessor | None = None,
         warnings: ValidationErrorProcessor | None = None,
+        max_errors: int | None = None,
+        fail_fast: bool = False,
+        memo: ValidationMemo | None = None,
+        pool: ValidationPool | None = None,
+        files: FilesystemCache | None = None,
+        defaults: bool = False,
     ) -> dict:
         """
         call validate on the schema returned by self.schema
         """
         return self.schema(config).validate(
-            config, path=path, errors=errors, warnings=warnings
+            config,
+            path=path,
+            errors=errors,
+            warnings=warnings,
+            max_errors=max_errors,
+            fail_fast=fail_fast,
+            memo=memo,
+            pool=pool,
+            files=files,
+            defaults=defaults,
         )
 
 
@@ -743,6 +2777,8 @@ def validate(
     config: dict | munge.Config,
     raise_errors: bool = False,
     log: Callable | None = None,
+    max_errors: int | None = None,
+    fail_fast: bool = False,
     **kwargs: Any,
 ) -> tuple[bool, CollectValidationExceptions, CollectValidationExceptions] | None:
     """
@@ -766,6 +2802,16 @@ def validate(
 
     - log (`callable`): function to use to log errors, will be passed
       a str message
+    - max_errors (`int`): stop validating once this many errors have been
+      collected
+    - fail_fast (`bool=False`): stop validating at the first error, use this
+      if only success is of interest
+    - memo (`ValidationMemo`): reuse validation results for identical
+      subtrees, see `ValidationMemo`
+    - pool (`ValidationPool`): validate large collections in worker
+      processes, see `confu.schema.parallel`
+    - files (`FilesystemCache`): cache for filesystem lookups, see
+      `FilesystemCache`
     - any additional kwargs will be passed on to `Schema.validate`
     """
 
@@ -775,22 +2821,92 @@ def validate(
         return (True, [], warnings)
     else:
         errors = CollectValidationExceptions()
-        schema.validate(config, errors=errors, warnings=warnings, **kwargs)
+        schema.validate(
+            config,
+            errors=errors,
+            warnings=warnings,
+            max_errors=max_errors,
+            fail_fast=fail_fast,
+            **kwargs,
+        )
+        return _validation_result(errors, warnings, log)
+
+
+def validate_with_defaults(
+    schema: Schema,
+    config: dict | munge.Config,
+    raise_errors: bool = False,
+    log: Callable | None = None,
+    **kwargs: Any,
+) -> tuple[bool, CollectValidationExceptions, CollectValidationExceptions] | None:
+    """
+    Same as `validate`, but also applies defaults to missing values
+
+    This has the same result as calling `apply_defaults` before `validate`,
+    but defaults are applied to each part of the config as it is
+    validated, so the config data is only visited once.
+
+    Unlike `apply_defaults`, defaults of the item schema of a `Dict` nested
+    in another schema are applied to the values of the dict, not to the
+    dict itself.
+
+    - any additional kwargs will be passed on to `validate`
+    """
+    return validate(schema, config, raise_errors, log, defaults=True, **kwargs)
+
+
+async def avalidate(
+    schema: Schema,
+    config: dict | munge.Config,
+    raise_errors: bool = False,
+    log: Callable | None = None,
+    max_errors: int | None = None,
+    fail_fast: bool = False,
+    **kwargs: Any,
+) -> tuple[bool, CollectValidationExceptions, CollectValidationExceptions] | None:
+    """
+    Same as `validate`, but validates through `Schema.avalidate`
+    so the event loop is not blocked, see `confu.schema.aio`
+
+    - any additional kwargs will be passed on to `Schema.avalidate`
+    """
+
+    warnings = CollectValidationExceptions()
+    if raise_errors:
+        await schema.avalidate(config, warnings=warnings, **kwargs)
+        return (True, [], warnings)
+    else:
+        errors = CollectValidationExceptions()
+        await schema.avalidate(
+            config,
+            errors=errors,
+            warnings=warnings,
+            max_errors=max_errors,
+            fail_fast=fail_fast,
+            **kwargs,
+        )
+        return _validation_result(errors, warnings, log)
+
 
-        num_errors = len(errors)
-        num_warnings = len(warnings)
+def _validation_result(
+    errors: CollectValidationExceptions,
+    warnings: CollectValidationExceptions,
+    log: Callable | None,
+) -> tuple[bool, CollectValidationExceptions, CollectValidationExceptions]:
+    num_errors = len(errors)
+    num_warnings = len(warnings)
 
-        success = num_errors == 0
+    success = num_errors == 0
 
-        if log and callable(log):
-            for error in errors:
-                log(f"[Config Error] {error.pretty}")
-            for warning in warnings:
-                log(f"[Config Warning] {warning.pretty}")
-            if not success:
-                log(f"{num_errors} errors, {num_warnings} warnings in config")
+    if log and callable(log):
+        for error in errors:
+            log(f"[Config Error] {error.pretty}")
+        for warning in warnings:
+            log(f"[Config Warning] {warning.pretty}")
+        if not success:
+            log(f"{num_errors} errors, {num_warnings} warnings in config")
 
-        return (success, errors, warnings)
+    return (success, errors, warnings)
 
 
 def apply_default(config: dict, attribute: Attribute, path: list[str]) -> None:
@@ -815,14 +2931,14 @@ def apply_default(config: dict, attribute: Attribute, path: list[str]) -> None:
 
         # attribute is a List, need to handle items
         # accordingly
-        if _config and isinstance(attribute.item, Schema):
+        if isinstance(attribute.item, Schema) and _config:
 
             # list is holding schemas, apply defaults
             # to each item in the list
             for item in _config:
                 apply_defaults(attribute.item, item, debug=True)
 
-        if _config and isinstance(attribute.item, List):
+        if isinstance(attribute.item, List) and _config:
 
             # list is holding lists, apply defaults
             # to each item in the list
@@ -833,7 +2949,7 @@ def apply_default(config: dict, attribute: Attribute, path: list[str]) -> None:
 
             # list is holding normal attribute, set default
             # value
-            prev[section] = attribute.default
+            prev[section] = attribute._default_copy()
 
     elif isinstance(attribute, Schema):
 
@@ -855,7 +2971,7 @@ def apply_default(config: dict, attribute: Attribute, path: list[str]) -> None:
                 apply_default(_config, attribute.item, [k])
 
         if _config is None:
-            prev[section] = copy.deepcopy(attribute.default or {})
+            prev[section] = attribute._default_copy() or {}
 
         if attribute.item is None:
             apply_defaults(attribute, prev[section])
@@ -863,7 +2979,7 @@ def apply_default(config: dict, attribute: Attribute, path: list[str]) -> None:
             apply_defaults(attribute.item, prev[section])
 
     elif _config is None and attribute.has_default:
-        prev[section] = attribute.default
+        prev[section] = attribute._default_copy()
 
 
 def apply_defaults(schema: Schema, config: dict, debug: bool = False) -> None:
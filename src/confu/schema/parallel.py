@@ -0,0 +1,272 @@
+"""
+Validate large collections in a process pool
+
+The items of `List` attributes and of schemas with an `item` attribute
+(like `Dict`) can be validated in worker processes. Collections are
+split into chunks, every chunk is validated in a worker and the
+validated values and any errors or warnings are merged back in their
+original order, so the results are the same as for sequential
+validation.
+
+Enable it by passing a `ValidationPool` to the validation
+
+```
+from confu.schema.parallel import ValidationPool
+
+with ValidationPool(max_workers=4, min_items=10000) as pool:
+    success, errors, warnings = validate(MySchema(), config, pool=pool)
+```
+
+Collections with fewer than `min_items` items are validated sequentially.
+The item attributes and values are pickled to be sent to the workers,
+if that is not possible the collection is validated sequentially as well.
+"""
+from __future__ import annotations
+
+import math
+import os
+import pickle
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from confu.exceptions import ValidationError, ValidationWarning
+from confu.schema.core import (
+    Attribute,
+    CollectValidationExceptions,
+    ConfigPath,
+    FilesystemCache,
+    List,
+    Schema,
+    ValidationFailure,
+    ValidationRun,
+)
+
+# errors `pickle.dumps` raises for objects that cannot be pickled, only
+# caught around pickling so errors raised by validation are not hidden
+_PICKLE_ERRORS = (pickle.PicklingError, TypeError, AttributeError)
+
+
+class ValidationPool:
+    """
+    Process pool used to validate large collections
+
+    The same pool may be used for any number of validations, the
+    worker processes are started when first needed and are
+    shut down by `shutdown` or when leaving the `with` block.
+
+    **Keyword Arguments**
+
+    - max_workers (`int`): number of worker processes, defaults to the
+      number of cpus
+    - min_items (`int=10000`): collections with fewer items are
+      validated sequentially
+    - chunksize (`int`): number of items per chunk, by default items
+      are split into four chunks per worker
+    - executor (`Executor`): use this executor instead of starting
+      a `ProcessPoolExecutor`
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        min_items: int = 10000,
+        chunksize: int | None = None,
+        executor: Executor | None = None,
+    ) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_items = min_items
+        self.chunksize = chunksize
+        self._executor = executor
+
+    def __enter__(self) -> ValidationPool:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.shutdown()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def shutdown(self) -> None:
+        """
+        Shut down the worker processes
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def validate_list(
+        self, item: Attribute, value: list, path: ConfigPath, run: ValidationRun
+    ) -> list | None:
+        """
+        Validate the entries of a list against `item`
+
+        Returns the validated entries, entries that failed validation
+        are left out. Returns `None` if the entries could not be
+        validated in the pool.
+        """
+        validated = self._validate(
+            item, list(enumerate(value)), path, run, not isinstance(item, Schema)
+        )
+        if validated is None:
+            return None
+        return [result for _, result in validated]
+
+    def validate_dict(
+        self, item: Attribute, config: dict, path: ConfigPath, run: ValidationRun
+    ) -> bool:
+        """
+        Validate the values of a dict against `item`, the dict is
+        updated in place
+
+        Returns `False` if the values could not be validated in the pool.
+        """
+        validated = self._validate(item, list(config.items()), path, run, False)
+        if validated is None:
+            return False
+        config.update(validated)
+        return True
+
+    def _validate(
+        self,
+        item: Attribute,
+        entries: list,
+        path: ConfigPath,
+        run: ValidationRun,
+        raise_items: bool,
+    ) -> list | None:
+        size = self.chunksize or math.ceil(len(entries) / (self.max_workers * 4))
+        chunks = []
+        for start in range(0, len(entries), size):
+            end = start + size
+            chunks.append(entries[start:end])
+
+        # chunks are pickled here instead of by the executor, so only
+        # pickling errors make validation fall back to sequential
+        try:
+            payloads = [
+                _dumps((item, chunk, raise_items, run.defaults)) for chunk in chunks
+            ]
+        except _PICKLE_ERRORS:
+            return None
+
+        # results are collected before anything is reported, so validation
+        # can still fall back to sequential if a chunk could not be returned
+        try:
+            results = list(self.executor.map(_validate_chunk, payloads))
+        except BrokenProcessPool:
+            return None
+        if None in results:
+            return None
+        results = [pickle.loads(result) for result in results]
+
+        refs = _attribute_refs(item)
+        validated = []
+        for chunk_validated, failures in results:
+            validated += chunk_validated
+            for cls, ref, attribute, keys, value, reason in failures:
+                if ref is not None:
+                    attribute = refs[ref]
+                failure_path = path
+                for key in keys:
+                    failure_path = ConfigPath(failure_path, key)
+                run.report(
+                    ValidationFailure(cls, attribute, failure_path, value, reason)
+                )
+        return validated
+
+
+def _attribute_refs(attribute: Attribute) -> list:
+    """
+    Return all attributes reachable from `attribute` in a fixed order,
+    so attributes can be referred to by index across processes
+    """
+    refs = []
+    seen = set()
+    stack = [attribute]
+    while stack:
+        attribute = stack.pop()
+        if id(attribute) in seen:
+            continue
+        seen.add(id(attribute))
+        refs.append(attribute)
+        if isinstance(attribute, Schema):
+            stack += [child for _, child in attribute.attributes()]
+            if attribute.item is not None:
+                stack.append(attribute.item)
+        elif isinstance(attribute, List):
+            stack.append(attribute.item)
+    return refs
+
+
+def _dumps(value: Any) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _validate_chunk(payload: bytes) -> bytes | None:
+    """
+    Validate a pickled `(item, entries, raise_items, defaults)` chunk
+    in a worker process
+
+    Returns the pickled validated `(key, value)` pairs and failures, with
+    attributes referred to by their index in `_attribute_refs` and paths
+    relative to the collection, or `None` if they cannot be pickled.
+    """
+    item, entries, raise_items, defaults = pickle.loads(payload)
+    check = item.compile()
+    collected = CollectValidationExceptions()
+    run = ValidationRun(
+        collected, collected, files=FilesystemCache(), defaults=defaults
+    )
+    item_run = run.raising() if raise_items else run
+    root = ConfigPath()
+
+    validated = []
+    for key, value in entries:
+        try:
+            result = check(value, ConfigPath(root, key), item_run)
+        except ValidationError as error:
+            collected.error(error)
+            continue
+        except ValidationWarning as warning:
+            collected.warning(warning)
+            continue
+        if type(result) is ValidationFailure:
+            collected.failure(result)
+            continue
+        validated.append((key, result))
+
+    refs = {id(attribute): idx for idx, attribute in enumerate(_attribute_refs(item))}
+    failures = []
+    for failure in collected._exceptions:
+        if type(failure) is ValidationFailure:
+            failure = (
+                failure.cls,
+                failure.attribute,
+                failure.path.as_list(),
+                failure.value,
+                failure.reason,
+            )
+        else:
+            details = failure.details
+            failure = (
+                type(failure),
+                details["attribute"],
+                details["path"],
+                details["value"],
+                details["reason"],
+            )
+        cls, attribute, keys, value, reason = failure
+        ref = refs.get(id(attribute)) if isinstance(attribute, Attribute) else None
+        if ref is not None:
+            attribute = None
+        failures.append((cls, ref, attribute, keys, value, reason))
+
+    try:
+        return _dumps((validated, failures))
+    except _PICKLE_ERRORS:
+        return None
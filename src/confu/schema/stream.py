@@ -0,0 +1,554 @@
+"""
+Validate JSON documents while they are being parsed
+
+The document is read from a file object in chunks by an incremental
+tokenizer and validated as it is parsed: objects validated by a
+`Schema` (including `Dict`) and arrays validated by a `List` are
+traversed value by value, any other value is parsed on its own and
+passed to its attribute's `Attribute.compile` check. So the raw
+document is never held in memory as a whole, only the validated config
+is built, and not even that if only the error report is of interest.
+
+```
+with open("config.json") as fh:
+    config = stream_validate(MySchema(), fh)
+
+with open("config.json", "rb") as fh:
+    success, errors, warnings = validate_json(MySchema(), fh)
+```
+
+Errors and warnings are the same as for `json.load` followed by
+`Schema.validate`.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from json.decoder import scanstring
+from json.scanner import make_scanner
+from typing import IO, Any, Callable
+
+from confu.exceptions import StopValidation, ValidationError, ValidationWarning
+from confu.schema.core import (
+    Attribute,
+    CollectValidationExceptions,
+    ConfigPath,
+    FilesystemCache,
+    List,
+    Schema,
+    ValidationErrorProcessor,
+    ValidationFailure,
+    ValidationRun,
+    _defined_by,
+    _error_limit,
+    _validation_result,
+)
+
+_SPACE = " \t\n\r"
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# characters a number can continue with, a number followed by nothing
+# but these in the buffer may continue in the next chunk
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+# the scanner `json.loads` uses (the C implementation if available),
+# parses a single value starting at an index
+_scan = make_scanner(json.JSONDecoder())
+
+# kinds of values `StreamValidator` handles
+_OBJECT = "object"
+_ARRAY = "array"
+_VALUE = "value"
+
+
+class JSONTokenizer:
+    """
+    Incremental JSON tokenizer reading a file object in chunks
+
+    Text and binary (utf-8) file objects are supported.
+
+    **Arguments**
+
+    - fp (`file`): file object to read from
+
+    **Keyword Arguments**
+
+    - chunk_size (`int=65536`): number of characters or bytes to
+      read at once
+    """
+
+    def __init__(self, fp: IO, chunk_size: int = 65536) -> None:
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+        # number of characters dropped from the start of the buffer
+        self.offset = 0
+
+        # number of arrays and objects currently open
+        self.depth = 0
+
+        self.decoder = None
+
+    def fill(self, size: int | None = None) -> None:
+        """
+        Read the next chunk, dropping the consumed part of the buffer
+
+        **Keyword Arguments**
+
+        - size (`int`): read this much instead of `chunk_size`
+        """
+        data = self.fp.read(size or self.chunk_size)
+        if not data:
+            self.eof = True
+        if isinstance(data, bytes):
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder("utf-8")()
+            data = self.decoder.decode(data, final=self.eof)
+        pos = self.pos
+        self.offset += pos
+        self.buffer = self.buffer[pos:] + data
+        self.pos = 0
+
+    def error(self, msg: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(
+            f"{msg} (offset {self.offset + self.pos})", self.buffer, self.pos
+        )
+
+    def peek(self) -> str:
+        """
+        Skip whitespace and return the next character, an empty string
+        at the end of the document
+        """
+        buffer = self.buffer
+        pos = self.pos
+        if pos < len(buffer):
+            char = buffer[pos]
+            if char not in _SPACE:
+                return char
+            pos = self.pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ""
+            self.fill()
+
+    def consume(self, char: str) -> None:
+        """
+        Consume the next character, which needs to be `char`
+        """
+        if self.peek() != char:
+            raise self.error(f"Expecting {char!r}")
+        self.pos += 1
+        if char == "{" or char == "[":
+            self.depth += 1
+        elif char == "}" or char == "]":
+            self.depth -= 1
+
+    def separator(self, end: str) -> bool:
+        """
+        Consume the separator after an array item or object member,
+        returns `True` if it was the end of the array or object
+        """
+        char = self.peek()
+        if char == ",":
+            self.pos += 1
+            return False
+        if char == end:
+            self.consume(end)
+            return True
+        raise self.error(f"Expecting ',' delimiter or {end!r}")
+
+    def string(self) -> str:
+        self.consume('"')
+        while True:
+            try:
+                value, self.pos = scanstring(self.buffer, self.pos)
+                return value
+            except json.JSONDecodeError as exc:
+                # the string may continue in the next chunk
+                if self.eof or (
+                    "Unterminated" not in exc.msg and exc.pos < len(self.buffer) - 6
+                ):
+                    raise self.error(exc.msg)
+                self.fill()
+
+    def value(self) -> Any:
+        """
+        Parse the next value
+
+        The value needs to be in the buffer as a whole for the scanner,
+        so more is read until it is.
+        """
+        size = self.chunk_size
+        while True:
+            self.peek()
+            try:
+                value, end = _scan(self.buffer, self.pos)
+            except StopIteration:
+                if self.eof:
+                    raise self.error("Expecting value")
+            except json.JSONDecodeError as exc:
+                if self.eof:
+                    self.pos = exc.pos
+                    raise self.error(exc.msg)
+            else:
+                # the scanner stops a number at a trailing "." or exponent
+                # ("1." or "1e"), which may continue in the next chunk
+                if (
+                    self.eof
+                    or type(value) not in (int, float)
+                    or _NUMBER_TAIL.match(self.buffer, end).end() < len(self.buffer)
+                ):
+                    self.pos = end
+                    return value
+            self.fill(size)
+            size *= 2
+
+    def skip_to(self, depth: int) -> None:
+        """
+        Skip the rest of a partially parsed value, until the arrays
+        and objects opened within it are closed
+        """
+        while self.depth > depth:
+            char = self.peek()
+            if char == "":
+                raise self.error("Unexpected end of document")
+            elif char in "{[}]":
+                self.consume(char)
+            elif char in ",:":
+                self.pos += 1
+            elif char == '"':
+                self.string()
+            else:
+                self.value()
+
+    def end(self) -> None:
+        """
+        Make sure nothing but whitespace follows the document
+        """
+        if self.peek() != "":
+            raise self.error("Extra data")
+
+
+class StreamValidator:
+    """
+    Validates a JSON document against a schema while parsing it
+
+    **Arguments**
+
+    - tokenizer (`JSONTokenizer`)
+
+    **Keyword Arguments**
+
+    - build (`bool=True`): build the validated config, if `False`
+      values are only validated and then dropped
+    """
+
+    def __init__(self, tokenizer: JSONTokenizer, build: bool = True) -> None:
+        self.tokenizer = tokenizer
+        self.build = build
+        self.checks = {}
+
+        # unvalidated value of the last value that failed validation
+        self.unvalidated = None
+
+        # object or array that was being built when validation was
+        # stopped, holding the values built up to that point
+        self.partial = None
+
+    def dispatch(self, attribute: Attribute) -> tuple[str, Callable | None]:
+        """
+        Return how values of an attribute are handled, objects or arrays
+        validated while parsing them or values passed to the
+        compiled check
+        """
+        dispatch = self.checks.get(id(attribute))
+        if dispatch is None:
+            owner = _defined_by(attribute, "validate")
+            if owner is Schema:
+                kind = _OBJECT
+            elif owner is List and _defined_by(attribute, "_check") is List:
+                kind = _ARRAY
+            else:
+                kind = _VALUE
+            dispatch = self.checks[id(attribute)] = (kind, attribute.compile())
+        return dispatch
+
+    def base(self, attribute: Attribute) -> Callable:
+        key = ("base", id(attribute))
+        base = self.checks.get(key)
+        if base is None:
+            base = self.checks[key] = attribute._check_base()
+        return base
+
+    def value(self, attribute: Attribute, path: ConfigPath, run: ValidationRun) -> Any:
+        """
+        Parse and validate the next value
+
+        As with compiled checks the validated value or a
+        `ValidationFailure` is returned.
+        """
+        kind, check = self.dispatch(attribute)
+
+        if kind is _OBJECT and self.tokenizer.peek() == "{":
+            return self.object(attribute, path, run)
+
+        if kind is _ARRAY and self.tokenizer.peek() == "[":
+            result = self.array(attribute, path, run)
+            if type(result) is ValidationFailure:
+                self.unvalidated = result.value
+            return result
+
+        value = self.tokenizer.value()
+        result = check(value, path, run)
+        if type(result) is ValidationFailure:
+            self.unvalidated = value
+        return result
+
+    def object(self, schema: Schema, path: ConfigPath, run: ValidationRun) -> dict:
+        config = {}
+        try:
+            self.object_items(schema, config, path, run)
+        except StopValidation:
+            self.partial = config
+            raise
+        return config
+
+    def object_items(
+        self, schema: Schema, config: dict, path: ConfigPath, run: ValidationRun
+    ) -> None:
+        """
+        Parse and validate the items of an object into `config`
+        """
+        tokenizer = self.tokenizer
+        errors = run.errors
+        attributes = dict(schema.attributes())
+        item = schema.item
+        seen = set()
+
+        tokenizer.consume("{")
+        end = tokenizer.peek() == "}"
+        if end:
+            tokenizer.consume("}")
+
+        while not end:
+            key = tokenizer.string()
+            tokenizer.consume(":")
+            seen.add(key)
+
+            attribute = attributes.get(key, item)
+            if attribute is None:
+                value = tokenizer.value()
+                if self.build:
+                    config[key] = value
+                run.warnings.failure(
+                    ValidationFailure(
+                        ValidationWarning,
+                        key,
+                        path,
+                        value,
+                        f"unknown attribute '{key}'",
+                    )
+                )
+                end = tokenizer.separator("}")
+                continue
+
+            depth = tokenizer.depth
+            self.partial = None
+            try:
+                result = self.value(attribute, ConfigPath(path, key), run)
+            except ValidationError as error:
+                tokenizer.skip_to(depth)
+                errors.error(error)
+            except ValidationWarning as warning:
+                tokenizer.skip_to(depth)
+                run.warnings.warning(warning)
+            except StopValidation:
+                if self.build and self.partial is not None:
+                    config[key] = self.partial
+                raise
+            else:
+                # the unvalidated value is kept for failed values, as
+                # it is by `Schema.validate`
+                failure = None
+                if type(result) is ValidationFailure:
+                    failure = result
+                    result = self.unvalidated
+                if self.build:
+                    config[key] = result
+                if failure is not None:
+                    run.report(failure)
+
+            end = tokenizer.separator("}")
+
+        for name, attribute in attributes.items():
+            if not attribute.has_default and name not in seen:
+                errors.failure(
+                    ValidationFailure(
+                        ValidationError,
+                        attribute,
+                        ConfigPath(path, name),
+                        None,
+                        "missing",
+                    )
+                )
+
+    def array(self, attribute: List, path: ConfigPath, run: ValidationRun) -> list:
+        tokenizer = self.tokenizer
+        item = attribute.item
+        item_run = run if isinstance(item, Schema) else run.raising()
+
+        # the list is needed for checking choices
+        build = self.build or bool(attribute.choices_handler)
+
+        validated = []
+        tokenizer.consume("[")
+        end = tokenizer.peek() == "]"
+        if end:
+            tokenizer.consume("]")
+
+        idx = 0
+        try:
+            while not end:
+                depth = tokenizer.depth
+                self.partial = None
+                try:
+                    result = self.value(item, ConfigPath(path, idx), item_run)
+                except ValidationError as error:
+                    tokenizer.skip_to(depth)
+                    run.errors.error(error)
+                except ValidationWarning as warning:
+                    tokenizer.skip_to(depth)
+                    run.warnings.warning(warning)
+                except StopValidation:
+                    if self.build and self.partial is not None:
+                        validated.append(self.partial)
+                    raise
+                else:
+                    if type(result) is ValidationFailure:
+                        run.report(result)
+                    elif build:
+                        validated.append(result)
+                idx += 1
+                end = tokenizer.separator("]")
+        except StopValidation:
+            self.partial = validated if self.build else None
+            raise
+
+        return self.base(attribute)(validated, path, run)
+
+
+def stream_validate(
+    schema: Schema,
+    fp: IO,
+    path: list[str] | None = None,
+    errors: ValidationErrorProcessor | None = None,
+    warnings: ValidationErrorProcessor | None = None,
+    max_errors: int | None = None,
+    fail_fast: bool = False,
+    build: bool = True,
+    chunk_size: int = 65536,
+) -> dict | None:
+    """
+    Parse a JSON document from a file object and validate it against
+    a schema while parsing
+
+    Errors and warnings are handled like they are by `Schema.validate`,
+    raised by default.
+
+    Returns the validated config, `None` if `build` is `False`. If
+    validation is stopped early (`max_errors`, `fail_fast`) the config
+    holds the values parsed up to that point.
+
+    **Arguments**
+
+    - schema (`Schema`): schema instance
+    - fp (`file`): text or binary file object to read the document from
+
+    **Keyword Arguments**
+
+    - path (`list`): path of the document in the config
+    - errors (`ValidationErrorProcessor`)
+    - warnings (`ValidationErrorProcessor`)
+    - max_errors (`int`): stop validating once the errors processor
+      has handled this many errors
+    - fail_fast (`bool=False`): stop validating at the first error
+    - build (`bool=True`): if `False` the validated config is not built,
+      use this if only the errors are of interest
+    - chunk_size (`int=65536`): number of characters or bytes to
+      read at once
+
+    Raises `json.JSONDecodeError` for invalid documents
+    """
+
+    if errors is None:
+        errors = ValidationErrorProcessor()
+    if warnings is None:
+        warnings = ValidationErrorProcessor()
+    path = ConfigPath.from_list(path or [])
+    run = ValidationRun(errors, warnings, files=FilesystemCache())
+    tokenizer = JSONTokenizer(fp, chunk_size=chunk_size)
+    validator = StreamValidator(tokenizer, build=build)
+
+    try:
+        with _error_limit(errors, max_errors, fail_fast):
+            config = validator.value(schema, path, run)
+    except StopValidation:
+        # the config built up to where validation was stopped, as
+        # `Schema.validate` returns the partially validated config
+        return validator.partial if build else None
+
+    if type(config) is ValidationFailure:
+        run.report(config)
+        config = validator.unvalidated
+
+    tokenizer.end()
+
+    if not build:
+        return None
+    return config
+
+
+def validate_json(
+    schema: Schema,
+    fp: IO,
+    raise_errors: bool = False,
+    log: Callable | None = None,
+    max_errors: int | None = None,
+    fail_fast: bool = False,
+    **kwargs: Any,
+) -> tuple[bool, CollectValidationExceptions, CollectValidationExceptions]:
+    """
+    Same as `confu.schema.validate`, but validates a JSON document read
+    from a file object while parsing it
+
+    The validated config is not built, use `stream_validate` for that.
+
+    - any additional kwargs will be passed on to `stream_validate`
+    """
+    kwargs.setdefault("build", False)
+
+    warnings = CollectValidationExceptions()
+    if raise_errors:
+        stream_validate(schema, fp, warnings=warnings, **kwargs)
+        return (True, [], warnings)
+
+    errors = CollectValidationExceptions()
+    stream_validate(
+        schema,
+        fp,
+        errors=errors,
+        warnings=warnings,
+        max_errors=max_errors,
+        fail_fast=fail_fast,
+        **kwargs,
+    )
+    return _validation_result(errors, warnings, log)
@@ -0,0 +1,433 @@
+"""
+Cache validated config data on disk
+
+Loading and validating a large config can take a while, processes that
+start with the same config files can skip both with a `SnapshotCache`:
+
+```
+cache = SnapshotCache("/var/cache/myapp")
+config = load_config(MySchema(), ["config.yaml"], cache=cache)
+```
+
+The first process loads and validates the files and stores the
+validated data (with defaults applied) in the cache, processes started
+after that load the snapshot instead, as long as
+
+- the files were not changed (compared by modification time and size,
+  or by a hash of their content with `check="hash"`)
+- the schema was not changed (see `schema_fingerprint`), schemas that
+  cannot be fingerprinted are never cached
+- the same confu version is used
+
+Only valid config data is stored. Snapshots are pickled, so the cache
+directory needs to be writable only by trusted users.
+"""
+from __future__ import annotations
+
+import functools
+import gc
+import hashlib
+import importlib.metadata
+import marshal
+import os
+import pickle
+import re
+import tempfile
+import weakref
+from inspect import isclass
+from typing import Any, Callable
+
+import confu
+from confu.config import Config
+from confu.exceptions import SchemaFingerprintError
+from confu.schema import (
+    Attribute,
+    CollectValidationExceptions,
+    List,
+    ProxySchema,
+    Schema,
+)
+from confu.util import load_datafiles
+
+# attribute properties that hold caches or references to other
+# attributes, left out of the schema fingerprint
+_FINGERPRINT_SKIP = {
+    "_cached",
+    "_compiled",
+    "_frozen_default",
+    "_frozen",
+    "_plan",
+    "_plan_built",
+    "container",
+}
+
+# hashes of the code of attribute classes, see `_class_code`
+_CLASS_CODE = weakref.WeakKeyDictionary()
+
+# memory addresses in default object reprs, which differ between processes
+_ADDRESS = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+class SnapshotCache:
+    """
+    Directory of validated config data snapshots
+
+    **Arguments**
+
+    - directory (`str`): directory to store snapshots in, created if
+      it does not exist
+
+    **Keyword Arguments**
+
+    - check (`str="mtime"`): how to detect changed files, `"mtime"`
+      compares their modification time and size, `"hash"` their content
+    """
+
+    def __init__(self, directory: str, check: str = "mtime") -> None:
+        if check not in ("mtime", "hash"):
+            raise ValueError("check needs to be either 'mtime' or 'hash'")
+        self.directory = directory
+        self.check = check
+
+    def key(self, schema: Schema, paths: list[str]) -> str:
+        """
+        Return the key of the snapshot for config data loaded from
+        `paths` and validated with `schema`
+
+        Raises a `SchemaFingerprintError` if the schema cannot be
+        fingerprinted, see `schema_fingerprint`
+        """
+        hasher = hashlib.sha256()
+        hasher.update(repr(_confu_version()).encode())
+        hasher.update(schema_fingerprint(schema).encode())
+        for path in paths:
+            hasher.update(repr(self._file_state(path)).encode())
+        return hasher.hexdigest()
+
+    def _file_state(self, path: str) -> tuple:
+        path = os.path.abspath(path)
+        if self.check == "hash":
+            hasher = hashlib.sha256()
+            with open(path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    hasher.update(chunk)
+            return (path, hasher.hexdigest())
+        info = os.stat(path)
+        return (path, info.st_mtime_ns, info.st_size)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.snapshot")
+
+    def load(self, key: str) -> dict | None:
+        """
+        Return the snapshot stored with `key` or None if there is none
+        """
+        # unpickling creates lots of containers, which would trigger
+        # garbage collection runs over all of them
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(self._path(key), "rb") as fh:
+                snapshot = pickle.load(fh)
+        except Exception:
+            # missing, or a snapshot that cannot be loaded anymore
+            return None
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if not isinstance(snapshot, dict) or snapshot.get("key") != key:
+            return None
+        return snapshot
+
+    def store(self, key: str, config: Config) -> bool:
+        """
+        Store the validated data of a config with `key`
+
+        Returns whether the snapshot was stored, which it is not if the
+        config is not valid, its data cannot be pickled or the snapshot
+        cannot be written to the cache directory.
+        """
+        data = config.data
+        if not config.valid:
+            return False
+        try:
+            content = pickle.dumps(
+                {
+                    "key": key,
+                    "frozen": config.frozen,
+                    "fused_defaults": config.fused_defaults,
+                    "base": config._base_data,
+                    "data": data,
+                    # warnings are stored without their attribute,
+                    # which would pickle the whole schema, it is looked
+                    # up by path when the snapshot is loaded
+                    "warnings": [
+                        (
+                            type(warning),
+                            None
+                            if isinstance(warning.details["attribute"], Attribute)
+                            else warning.details["attribute"],
+                            warning.details["path"],
+                            warning.details["value"],
+                            warning.details["reason"],
+                        )
+                        for warning in config.warnings
+                    ],
+                },
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        except Exception:
+            return False
+
+        # written to a temporary file first so other processes never
+        # read an incomplete snapshot
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return False
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(content)
+            os.replace(tmp, self._path(key))
+        except BaseException as exc:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            if isinstance(exc, OSError):
+                return False
+            raise
+        return True
+
+
+def load_config(
+    schema: Schema,
+    paths: list[str],
+    cache: SnapshotCache | None = None,
+    loader: Callable[[list[str]], dict] | None = None,
+    **kwargs: Any,
+) -> Config:
+    """
+    Load config data from files into a validated `Config`, using the
+    snapshot in `cache` if there is a valid one
+
+    **Arguments**
+
+    - schema (`Schema`): schema to validate the data with
+    - paths (`list(str)`): files to load the data from
+
+    **Keyword Arguments**
+
+    - cache (`SnapshotCache`): snapshot cache to use
+    - loader (`function`): called with `paths` to load the data, by default
+      the files are loaded with `confu.util.load_datafiles`
+    - any additional kwargs are passed on to `Config`
+    """
+    if cache is None:
+        config = Config(schema, (loader or load_datafiles)(paths), **kwargs)
+        config.data
+        return config
+
+    # the key is built before loading the files, if they are changed
+    # while they are loaded the snapshot is stored with the key of their
+    # previous state, which is not looked up again
+    try:
+        key = cache.key(schema, paths)
+    except SchemaFingerprintError:
+        # the schema cannot be told apart from a changed one
+        return load_config(schema, paths, loader=loader, **kwargs)
+    snapshot = cache.load(key)
+
+    # frozen data is stored as it is, it cannot be used for configs
+    # that are not frozen and the other way around, defaults applied in
+    # a single pass can differ from defaults applied before validating
+    if (
+        snapshot is not None
+        and snapshot["frozen"] == kwargs.get("frozen", False)
+        and snapshot.get("fused_defaults", False) == kwargs.get("fused_defaults", False)
+    ):
+        config = Config(schema, snapshot["base"], **kwargs)
+        data = snapshot["data"]
+        config._data = data
+        config.valid = True
+        config.errors = CollectValidationExceptions()
+        config.warnings = CollectValidationExceptions()
+        config.warnings.exceptions.extend(
+            cls(
+                _resolve_attribute(schema, data, path)
+                if attribute is None
+                else attribute,
+                path,
+                value,
+                reason,
+            )
+            for cls, attribute, path, value, reason in snapshot["warnings"]
+        )
+        return config
+
+    config = Config(schema, (loader or load_datafiles)(paths), **kwargs)
+    cache.store(key, config)
+    return config
+
+
+def schema_fingerprint(schema: Schema) -> str:
+    """
+    Return a hash of the structure of a schema, the types and
+    properties of its attributes and the code of their classes
+
+    Functions used as defaults, choices or validators are included by
+    name and code, `functools.partial` objects by their function and
+    arguments. The schemas a `ProxySchema` returns are included if
+    their classes are referenced by name in its `schema` method.
+
+    Raises a `SchemaFingerprintError` if the schema holds an object
+    that is only described by its memory address, which would change
+    the fingerprint in every process.
+    """
+    return hashlib.sha256(repr(_describe(schema, set())).encode()).hexdigest()
+
+
+def _describe(value: Any, seen: set) -> Any:
+    if isinstance(value, Attribute):
+        description = (
+            _class_code(type(value)),
+            tuple(
+                (name, _describe(item, seen))
+                for name, item in sorted(vars(value).items())
+                if name not in _FINGERPRINT_SKIP
+            ),
+        )
+        if isinstance(value, ProxySchema):
+            description += (_describe_targets(type(value).schema, seen),)
+        return description
+    if isinstance(value, dict):
+        return tuple((repr(key), _describe(item, seen)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_describe(item, seen) for item in value)
+    if isinstance(value, (set, frozenset)):
+        # the iteration order of sets differs between processes
+        items = sorted((_describe(item, seen) for item in value), key=repr)
+        return (type(value).__name__, tuple(items))
+    if isinstance(value, functools.partial):
+        return (
+            "functools.partial",
+            _describe(value.func, seen),
+            _describe(value.args, seen),
+            _describe(value.keywords, seen),
+        )
+    if callable(value) and hasattr(value, "__qualname__"):
+        return (
+            f"{getattr(value, '__module__', None)}.{value.__qualname__}",
+            _code_hash(value),
+        )
+    description = repr(value)
+    if _ADDRESS.search(description):
+        raise SchemaFingerprintError(
+            f"cannot fingerprint {type(value).__name__} object: {description}"
+        )
+    return description
+
+
+def _describe_targets(function: Callable, seen: set) -> tuple:
+    """
+    Describe the attribute classes a function references by name,
+    the schemas a `ProxySchema.schema` method can return
+    """
+    code = getattr(function, "__code__", None)
+    if code is None:
+        return ()
+    targets = []
+    for name in code.co_names:
+        target = function.__globals__.get(name)
+        if not isclass(target) or not issubclass(target, Attribute):
+            continue
+        if target in seen:
+            continue
+        seen.add(target)
+        targets.append(
+            (
+                _class_code(target),
+                _describe(getattr(target, "_attributes", {}), seen),
+            )
+        )
+    return tuple(targets)
+
+
+def _class_code(cls: type) -> str:
+    """
+    Return the name of an attribute class with a hash of the code of
+    the methods it and its base classes define
+    """
+    try:
+        return _CLASS_CODE[cls]
+    except KeyError:
+        pass
+    hasher = hashlib.sha256()
+    for klass in cls.__mro__:
+        hasher.update(f"{klass.__module__}.{klass.__qualname__}".encode())
+        for name, member in sorted(vars(klass).items()):
+            if isinstance(member, property):
+                members = (member.fget, member.fset, member.fdel)
+            else:
+                members = (getattr(member, "__func__", member),)
+            for function in members:
+                code = getattr(function, "__code__", None)
+                if code is not None:
+                    hasher.update(name.encode())
+                    hasher.update(marshal.dumps(code))
+    description = f"{cls.__module__}.{cls.__qualname__}:{hasher.hexdigest()}"
+    _CLASS_CODE[cls] = description
+    return description
+
+
+def _code_hash(function: Callable) -> str | None:
+    code = getattr(function, "__code__", None)
+    if code is None:
+        return None
+    return hashlib.sha256(marshal.dumps(code)).hexdigest()
+
+
+def _resolve_attribute(schema: Schema, data: Any, path: list) -> Attribute | None:
+    """
+    Return the attribute validating the value at `path` of validated
+    config data, or None if there is none
+    """
+    attribute = schema
+    for key in path:
+        if isinstance(attribute, ProxySchema):
+            attribute = attribute.schema(data)
+        if isinstance(attribute, List):
+            attribute = attribute.item
+        elif isinstance(attribute, Schema):
+            if attribute.item is not None:
+                attribute = attribute.item
+            else:
+                attribute = attribute._attr.get(key)
+        else:
+            return None
+        if attribute is None:
+            return None
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            data = None
+    return attribute
+
+
+@functools.lru_cache(maxsize=None)
+def _confu_version() -> tuple:
+    """
+    Return the installed confu version and the modification times of
+    its modules, which also change when running from a source checkout
+    """
+    try:
+        version = importlib.metadata.version("confu")
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    mtimes = []
+    for directory, _, files in os.walk(os.path.dirname(confu.__file__)):
+        for name in sorted(files):
+            if name.endswith(".py"):
+                mtimes.append(os.stat(os.path.join(directory, name)).st_mtime_ns)
+    return (version, max(mtimes, default=None))
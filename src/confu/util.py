@@ -7,6 +7,8 @@ import os
 from configparser import ConfigParser
 from typing import Any
 
+import munge
+
 from confu.types import TimeDuration
 
 
@@ -26,6 +28,29 @@ def config_parser_dict(config: ConfigParser) -> dict:
     return {s: dict(config.items(s)) for s in config.sections()}
 
 
+def load_datafiles(paths: list[str]) -> dict:
+    """
+    Load config data from files with the munge codec matching their
+    extension, top level keys of later files replace those of earlier
+    files
+
+    **Arguments**
+
+    - paths (`list(str)`)
+
+    **Returns**
+
+    dict
+    """
+    data = {}
+    for path in paths:
+        codec = munge.get_codec(os.path.splitext(path)[1].lstrip("."))
+        if codec is None:
+            raise ValueError(f"cannot load {path}, unknown file extension")
+        data.update(codec().loadu(path) or {})
+    return data
+
+
 _DEFAULT_ARG = object()
 
 
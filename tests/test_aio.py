@@ -0,0 +1,187 @@
+import asyncio
+import copy
+import json
+import os
+
+import pytest
+
+import confu.schema
+from confu.exceptions import ValidationError
+from confu.schema import (
+    Attribute,
+    Directory,
+    File,
+    FilesystemCache,
+    Int,
+    List,
+    Schema,
+    Str,
+    ValidationMemo,
+    validate,
+)
+from confu.schema.parallel import ValidationPool
+from tests.schemas import Schema_01, Schema_03, Schema_06, Schema_10, Schema_12
+
+
+def data(name):
+    with open(os.path.join(os.path.dirname(__file__), "data", name)) as fh:
+        return json.load(fh)
+
+
+def result(success, errors, warnings):
+    return (
+        success,
+        [(e.details["path"], e.details["reason"]) for e in errors],
+        [(w.details["path"], w.details["reason"]) for w in warnings],
+    )
+
+
+class AsyncPort(Attribute):
+    async def validate(self, value, path, **kwargs):
+        await asyncio.sleep(0)
+        if not isinstance(value, int) or not 0 < value < 65536:
+            raise ValidationError(self, path, value, "port expected")
+        return value
+
+
+class AsyncSchema(Schema):
+    name = Str()
+    ports = List(item=AsyncPort())
+    path = File(default=None)
+    directory = Directory(default=None)
+    sizes = confu.schema.Dict(item=Int())
+
+
+@pytest.mark.parametrize(
+    "SchemaClass,config",
+    [
+        (Schema_01, data("nesting/success.json")),
+        (Schema_01, data("nesting/failure01.json")),
+        (Schema_01, data("nesting/failure03.json")),
+        (Schema_01, {"list_attr": 1, "nested": [], "unknown": 1}),
+        (Schema_03, {"list_attr_str": "a,b", "nested": {"int_attr_choices": 4}}),
+        (Schema_06, data("nesting/proxy_success.json")),
+        (Schema_06, data("nesting/proxy_failure01.json")),
+        (Schema_10, data("defaults/expected.01.json")),
+        (Schema_12, data("defaults/expected.04.json")),
+        (
+            AsyncSchema,
+            {
+                "name": "a",
+                "ports": [1, 0, "x", 443],
+                "path": __file__,
+                "directory": "/nonexistent",
+                "sizes": {"a": "1", "b": "x"},
+            },
+        ),
+    ],
+)
+def test_avalidate_matches_validate(SchemaClass, config):
+    config_async = copy.deepcopy(config)
+    outcome = asyncio.run(confu.schema.avalidate(SchemaClass(), config_async))
+
+    if SchemaClass is AsyncSchema:
+        # async validators can only be awaited
+        assert result(*outcome) == (
+            False,
+            [
+                (["ports", 1], "port expected"),
+                (["ports", 2], "port expected"),
+                (["directory"], "valid path to directory expected: /nonexistent"),
+                (["sizes", "b"], "integer expected"),
+            ],
+            [],
+        )
+        assert config_async["ports"] == [1, 443]
+        assert config_async["sizes"] == {"a": 1, "b": "x"}
+        return
+
+    config_sync = copy.deepcopy(config)
+    assert result(*outcome) == result(*validate(SchemaClass(), config_sync))
+    assert config_async == config_sync
+
+
+@pytest.mark.parametrize("option", ["memo", "pool", "defaults"])
+def test_avalidate_options(option):
+    class Ports(Schema):
+        hosts = List(item=Schema_01())
+        ports = List(item=Int())
+        sizes = confu.schema.Dict(item=Int())
+
+    config = {
+        "hosts": [data("nesting/success.json"), data("nesting/failure01.json")] * 2,
+        "ports": [1, "2", "x"],
+        "sizes": {"a": "1", "b": "x", "c": 3},
+    }
+    if option == "memo":
+        kwargs = {"memo": ValidationMemo()}
+    elif option == "pool":
+        kwargs = {"pool": ValidationPool(max_workers=2, min_items=2)}
+    else:
+        kwargs = {"defaults": True}
+
+    config_async = copy.deepcopy(config)
+    outcome = asyncio.run(confu.schema.avalidate(Ports(), config_async, **kwargs))
+    config_sync = copy.deepcopy(config)
+    assert result(*outcome) == result(*validate(Ports(), config_sync, **kwargs))
+    assert config_async == config_sync
+
+    if option == "memo":
+        assert kwargs["memo"].hits
+    elif option == "pool":
+        # items with async validators are not validated by the pool
+        pool = kwargs["pool"]
+        with pool:
+            outcome = asyncio.run(
+                confu.schema.avalidate(
+                    AsyncSchema(),
+                    {"name": "a", "ports": [1, 0], "sizes": {}},
+                    pool=pool,
+                )
+            )
+        assert result(*outcome) == (False, [(["ports", 1], "port expected")], [])
+
+
+def test_avalidate_raise():
+    with pytest.raises(ValidationError) as exc_info:
+        asyncio.run(Schema_01().avalidate(data("nesting/failure01.json")))
+    with pytest.raises(ValidationError) as sync_exc_info:
+        Schema_01().validate(data("nesting/failure01.json"))
+    assert exc_info.value == sync_exc_info.value
+
+
+def test_avalidate_max_errors():
+    config = {"list_attr": [{"int_attr": "a"} for _ in range(5)], "int_attr": "b"}
+    success, errors, warnings = asyncio.run(
+        confu.schema.avalidate(Schema_01(), config, max_errors=2)
+    )
+    assert not success
+    assert len(errors) == 2
+
+
+def test_avalidate_yields():
+    class Paths(Schema):
+        files = List(item=File())
+
+    config = {"files": [__file__] * 50, "ints": list(range(50))}
+    ticks = []
+
+    async def main():
+        async def count():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(count())
+        await asyncio.sleep(0)
+        outcome = await confu.schema.avalidate(
+            Paths(), config, yield_every=10, files=FilesystemCache(batch=True)
+        )
+        task.cancel()
+        return outcome
+
+    success, errors, warnings = asyncio.run(main())
+    assert success
+    assert len(warnings) == 1
+    # the event loop got to run other tasks during validation
+    assert len(ticks) > 5
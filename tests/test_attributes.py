@@ -1,6 +1,16 @@
 import pytest
 
-from confu.schema import Bool, Directory, Float, Int, List, Schema, Str, TimeDuration
+from confu.schema import (
+    Bool,
+    Directory,
+    Float,
+    Int,
+    List,
+    Schema,
+    Str,
+    TimeDuration,
+    validate,
+)
 
 
 @pytest.mark.parametrize("Class", [Str, Int, Float, Bool, Directory])
@@ -94,3 +104,145 @@ def test_none_default(Class):
     attribute = Class("test", default=None)
     assert attribute.has_default is True
     assert attribute.default is None
+
+
+class Counter:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self, attribute):
+        self.calls += 1
+        return self.value
+
+
+def test_cache_none():
+    choices = Counter([1, 2])
+    attribute = Int("test", choices=choices)
+    attribute.choices
+    attribute.choices
+    assert choices.calls == 2
+
+
+def test_cache_forever():
+    choices = Counter([1, 2])
+    default = Counter(1)
+    attribute = Int("test", choices=choices, default=default, cache="forever")
+    assert attribute.choices == [1, 2]
+    assert attribute.choices == [1, 2]
+    assert attribute.default == 1
+    assert attribute.default == 1
+    assert (choices.calls, default.calls) == (1, 1)
+
+    choices.value = [3]
+    attribute.invalidate_cache()
+    assert attribute.choices == [3]
+    assert choices.calls == 2
+
+
+def test_cache_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("confu.schema.core.time.monotonic", lambda: now[0])
+
+    choices = Counter([1, 2])
+    attribute = Int("test", choices=choices, cache=10)
+    attribute.choices
+    now[0] += 5
+    attribute.choices
+    assert choices.calls == 1
+    now[0] += 6
+    attribute.choices
+    assert choices.calls == 2
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_cache_per_run(codegen):
+    choices = Counter([1, 2])
+
+    class Ports(Schema):
+        ports = List(item=Int(choices=choices, cache="per-validation-run"))
+
+    schema = Ports(codegen=codegen)
+    success, errors, warnings = validate(schema, {"ports": [1, 2, 3, 1]})
+    assert [e.pretty for e in errors] == ["ports.2: invalid choice"]
+    assert choices.calls == 1
+
+    validate(schema, {"ports": [1, 2]})
+    assert choices.calls == 2
+
+    # not cached outside of validation
+    schema.ports.item.choices
+    assert choices.calls == 3
+
+
+def test_cache_time_duration():
+    attribute = TimeDuration("test", choices=["1m", "2m"], cache="forever")
+    assert attribute.choices is attribute.choices
+    assert attribute.choices == [60, 120]
+
+
+def test_cache_invalidate_schema():
+    choices = Counter([1])
+
+    class Item(Schema):
+        value = Int(choices=choices, cache="forever")
+
+    class Outer(Schema):
+        items = List(item=Item())
+
+    schema = Outer()
+    schema.items.item.value.choices
+    schema.invalidate_cache()
+    schema.items.item.value.choices
+    assert choices.calls == 2
+
+
+def test_cache_invalid():
+    with pytest.raises(ValueError):
+        Int("test", cache="sometimes")
+    with pytest.raises(ValueError):
+        Int("test", cache=0)
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_default_function_evaluated(codegen):
+    default = [None]
+
+    class Server(Schema):
+        host = Str(default=lambda attribute: default[0])
+        port = Int(default=lambda attribute: default[0])
+
+    schema = Server(codegen=codegen)
+    success, errors, warnings = validate(schema, {"host": None, "port": None})
+    assert success
+
+    # the default is no longer None, neither are the values allowed to be
+    default[0] = 1
+    success, errors, warnings = validate(schema, {"host": None, "port": None})
+    assert [e.pretty for e in errors] == [
+        "host: string expected",
+        "port: integer expected",
+    ]
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_attribute_changed(codegen):
+    class Server(Schema):
+        host = Str()
+        ports = List(item=Int())
+
+    schema = Server(codegen=codegen)
+    success, errors, warnings = validate(schema, {"host": "", "ports": [1, 2]})
+    assert [e.pretty for e in errors] == ["host: cannot be blank"]
+
+    # checks are compiled again once attributes were changed
+    schema.host.blank = True
+    schema.ports.item.choices_handler = [1]
+    success, errors, warnings = validate(schema, {"host": "", "ports": [1, 2]})
+    assert [e.pretty for e in errors] == ["ports.1: invalid choice"]
+
+    # other instances of the schema class use the changed attributes as well
+    success, errors, warnings = validate(
+        Server(codegen=codegen), {"host": "", "ports": [2]}
+    )
+    assert [e.pretty for e in errors] == ["ports.0: invalid choice"]
@@ -0,0 +1,159 @@
+import copy
+import json
+import os
+
+import pytest
+
+from confu.schema import (
+    Bool,
+    Dict,
+    Float,
+    Int,
+    List,
+    Schema,
+    Str,
+    ValidationPlan,
+    validate,
+)
+from confu.schema.codegen import compile_validator, generate_source
+from tests.schemas import (
+    Schema_01,
+    Schema_03,
+    Schema_04,
+    Schema_06,
+    Schema_10,
+    Schema_11,
+    Schema_12,
+)
+
+
+class CodegenSchema(Schema):
+    int_attr = Int()
+    int_null = Int(default=None)
+    float_attr = Float(default=1.0)
+    bool_attr = Bool(default=False)
+    str_attr = Str(choices=["a", "b"])
+    str_blank_null = Str(default=None, blank=True)
+    str_choices_fn = Str(default="x", choices=lambda attr: ["x", "y"])
+    list_attr = List(item=Int())
+    list_list = List(item=List(item=Str()))
+    dict_attr = Dict(item=Float())
+
+    class Nested(Schema):
+        int_attr = Int(choices=[1, 2])
+
+    nested = Nested()
+    nested_list = List(item=Nested())
+
+
+def data(name):
+    with open(os.path.join(os.path.dirname(__file__), "data", name)) as fh:
+        return json.load(fh)
+
+
+def collect(schema, config):
+    config = copy.deepcopy(config)
+    success, errors, warnings = validate(schema, config)
+    return (
+        config,
+        [(e.details["path"], e.details["reason"]) for e in errors],
+        [(w.details["path"], w.details["reason"]) for w in warnings],
+    )
+
+
+@pytest.mark.parametrize(
+    "SchemaClass,config",
+    [
+        (CodegenSchema, {}),
+        (
+            CodegenSchema,
+            {
+                "int_attr": "12",
+                "int_null": None,
+                "float_attr": "1.5",
+                "bool_attr": "yes",
+                "str_attr": "a",
+                "str_blank_null": "",
+                "str_choices_fn": "y",
+                "list_attr": "1,2,3",
+                "list_list": [["a"], ["b", "c"]],
+                "dict_attr": {"a": 1, "b": "2.5"},
+                "nested": {"int_attr": 2},
+                "nested_list": [{"int_attr": 1}, {"int_attr": "2"}],
+            },
+        ),
+        (
+            CodegenSchema,
+            {
+                "int_attr": "twelve",
+                "float_attr": [],
+                "bool_attr": "maybe",
+                "str_attr": "c",
+                "str_choices_fn": "z",
+                "list_attr": [1, "two", 3, "four"],
+                "list_list": [["a", ""], 1, "b,"],
+                "dict_attr": {"a": "b", "c": 1},
+                "nested": {"int_attr": 3, "unknown": 1},
+                "nested_list": [{"int_attr": 3}, 1, {}],
+                "unknown": True,
+            },
+        ),
+        (CodegenSchema, {"nested": [1], "list_attr": 1}),
+        (Schema_01, data("nesting/success.json")),
+        (Schema_01, data("nesting/failure01.json")),
+        (Schema_01, data("nesting/failure02.json")),
+        (Schema_01, data("nesting/failure03.json")),
+        (Schema_01, data("nesting/failure04.json")),
+        (Schema_03, {"list_attr_str": "a,b", "nested": {"int_attr_choices": 4}}),
+        (Schema_04, {"int_attr": "x", "list_attr": [{"int_attr": "y"}]}),
+        (Schema_06, data("nesting/proxy_success.json")),
+        (Schema_06, data("nesting/proxy_failure01.json")),
+        (Schema_10, data("defaults/expected.01.json")),
+        (Schema_11, data("defaults/expected.02.json")),
+        (Schema_12, data("defaults/expected.04.json")),
+    ],
+)
+def test_codegen_matches_plan(SchemaClass, config):
+    schema = SchemaClass()
+    generated = SchemaClass(codegen=True)
+    assert isinstance(schema.compile(), ValidationPlan)
+    assert not isinstance(generated.compile(), ValidationPlan)
+    assert collect(generated, config) == collect(schema, config)
+
+
+def test_codegen_raise():
+    schema = Schema_01(codegen=True)
+    with pytest.raises(Exception) as plan_exc:
+        Schema_01().validate(data("nesting/failure01.json"))
+    with pytest.raises(Exception) as codegen_exc:
+        schema.validate(data("nesting/failure01.json"))
+    assert codegen_exc.value == plan_exc.value
+
+
+def test_codegen_cache():
+    validator = compile_validator(Schema_01(codegen=True))
+    assert compile_validator(Schema_01(codegen=True)) is validator
+    assert Schema_01.__dict__["_codegen_validator"][1] is validator
+    assert compile_validator(Schema_01(codegen=True), rebuild=True) is not validator
+
+    # validators compiled for schemas without codegen are not cached
+    class Uncached(Schema):
+        int_attr = Int()
+
+    assert compile_validator(Uncached()) is not compile_validator(Uncached())
+    assert "_codegen_validator" not in Uncached.__dict__
+
+    # schemas with an item attribute are not cached on the class
+    assert compile_validator(Dict(item=Int())) is not compile_validator(
+        Dict(item=Int())
+    )
+
+
+def test_codegen_source():
+    source = generate_source(CodegenSchema())
+    assert "int(v)" in source
+    assert "float(v)" in source
+    assert "def validate_list_" in source
+    assert "def validate_schema_" in source
+    assert "dispatch.get(key)" in source
+    assert "key ==" not in source
@@ -1,5 +1,25 @@
-from confu.config import Config
+import array
+import copy
+import pickle
+
+import pytest
+
+import confu.config
+from confu.config import Config, FrozenDict
+from confu.exceptions import ApplyDefaultError, ValidationError
+from confu.schema import (
+    Attribute,
+    Float,
+    Int,
+    List,
+    ProxySchema,
+    Schema,
+    apply_defaults,
+    validate,
+    validate_with_defaults,
+)
 from tests.schemas import Schema_04
+from tests.test_schema import APPLY_DEFAULTS_CASES, load_defaults_case
 
 
 def test_config_init():
@@ -40,3 +60,310 @@ def test_get_nested():
     cfg.data
     assert cfg.get_nested("nested") == {"int_attr_choices": 1}
     assert cfg.get_nested("nested.nonexistant") is None
+
+
+def test_config_set():
+    cfg = Config(Schema_04(), {"int_attr": 1, "nested": {"int_attr": 2}})
+    data = cfg.data
+    assert cfg.valid
+
+    cfg.set(["int_attr"], "invalid")
+    assert cfg.data["int_attr"] == "invalid"
+    assert not cfg.valid
+    assert [e.pretty for e in cfg.errors] == ["int_attr: integer expected"]
+
+    # untouched values are reused, previously returned data is unchanged
+    assert cfg.data["nested"] is data["nested"]
+    assert data["int_attr"] == 1
+
+    cfg.set(["int_attr"], "3")
+    assert cfg.data["int_attr"] == 3
+    assert cfg.valid
+    assert len(cfg.errors) == 0
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_config_set_compiled_once(monkeypatch, codegen):
+    class Server(Schema):
+        port = Int()
+        ports = List(item=Int(), default=[])
+
+    cfg = Config(Server(codegen=codegen), {"port": 1})
+    cfg.data
+    cfg.set(["port"], "2")
+    cfg.set(["ports"], ["3"])
+    assert cfg["ports"] == [3]
+
+    # checks are compiled once, not for every `set`
+    def compile(attribute):
+        raise AssertionError("compiled again")
+
+    monkeypatch.setattr(Attribute, "compile", compile)
+    cfg.set(["port"], "4")
+    cfg.set(["ports"], ["5"])
+    assert cfg["port"] == 4
+    assert cfg["ports"] == [5]
+
+
+def test_config_set_nested():
+    cfg = Config(Schema_04(), {"nested": {"int_attr": 2}})
+    data = cfg.data
+
+    cfg.set(["nested", "int_attr_choices"], 4)
+    assert cfg.data["nested"]["int_attr_choices"] == 4
+    assert [e.pretty for e in cfg.errors] == ["nested.int_attr_choices: invalid choice"]
+    assert cfg.data["list_attr_w_default"] is data["list_attr_w_default"]
+
+    cfg.set(["nested", "int_attr_choices"], 2)
+    assert cfg.data["nested"] == {"int_attr": 2, "int_attr_choices": 2}
+    assert cfg.valid
+
+    # new schema values get their defaults applied
+    cfg.set(["nested"], {"int_attr": 5})
+    assert cfg.data["nested"] == {"int_attr": 5, "int_attr_choices": 1}
+
+    cfg.set(["nested"], {})
+    assert cfg.data["nested"] == {"int_attr_choices": 1}
+    assert [e.pretty for e in cfg.errors] == ["nested.int_attr: missing"]
+
+    cfg.set(["unknown"], 1)
+    assert cfg.data["unknown"] == 1
+    assert [w.pretty for w in cfg.warnings] == [": unknown attribute 'unknown'"]
+
+
+class ProxyRoot(ProxySchema):
+    def schema(self, config):
+        return Schema(item=Int())
+
+
+class CheckedRoot(Schema):
+    x = Int()
+
+    def validate(self, config, path=None, errors=None, warnings=None, **kwargs):
+        config = super().validate(config, path, errors, warnings, **kwargs)
+        if config.get("x") == 2:
+            errors.error(ValidationError(self, ["x"], 2, "x cannot be 2"))
+        return config
+
+
+def test_config_set_root_schema():
+    # the root schema is a proxy schema, the data is validated again
+    cfg = Config(ProxyRoot(), {"x": 1})
+    cfg.data
+    cfg.set(["x"], "2")
+    assert cfg["x"] == 2
+    assert cfg.valid
+    assert len(cfg.warnings) == 0
+
+    # the root schema validates the data itself
+    cfg = Config(CheckedRoot(), {"x": 1})
+    cfg.data
+    cfg.set(["x"], "2")
+    assert cfg["x"] == 2
+    assert [e.pretty for e in cfg.errors] == ["x: x cannot be 2"]
+
+
+@pytest.mark.parametrize("fused_defaults", [False, True])
+@pytest.mark.parametrize("SchemaClass,config,expected", APPLY_DEFAULTS_CASES)
+def test_config_defaults(SchemaClass, config, expected, fused_defaults):
+    config, expected = load_defaults_case(config, expected)
+    cfg = Config(SchemaClass(), copy.deepcopy(config), fused_defaults=fused_defaults)
+
+    # by default the same as applying defaults and then validating
+    data = copy.deepcopy(config)
+    if fused_defaults:
+        result = validate_with_defaults(SchemaClass(), data)
+    else:
+        try:
+            apply_defaults(SchemaClass(), data)
+        except ApplyDefaultError:
+            pass
+        result = validate(SchemaClass(), data)
+
+    assert cfg.data == data
+    assert cfg.valid == result[0]
+    assert [e.pretty for e in cfg.errors] == [e.pretty for e in result[1]]
+    assert [w.pretty for w in cfg.warnings] == [w.pretty for w in result[2]]
+
+
+@pytest.mark.parametrize("fused_defaults", [False, True])
+def test_config_set_matches_full_validation(fused_defaults):
+    cfg = Config(
+        Schema_04(), {"nested": {"int_attr": 2}}, fused_defaults=fused_defaults
+    )
+    cfg.data
+    cfg.set(["list_attr"], [{"int_attr": "a"}])
+    cfg.set(["nested", "int_attr"], "b")
+    cfg.set(["str_attr"], None)
+
+    full = Config(Schema_04(), cfg._base_data, fused_defaults=fused_defaults)
+    assert cfg.data == full.data
+    assert sorted(e.pretty for e in cfg.errors) == sorted(e.pretty for e in full.errors)
+
+
+def test_config_list_storage():
+    class Tables(Schema):
+        weights = List(item=Float(), storage="array")
+        ports = List(item=Int(), storage="array", default=[22])
+
+    cfg = Config(Tables(), {"weights": [1, 2.5]})
+    assert cfg.valid is None
+    assert cfg["weights"] == array.array("d", [1.0, 2.5])
+    assert cfg["ports"] == array.array("q", [22])
+    assert cfg == Config(Tables(), {"weights": [1, 2.5]})
+    assert cfg.copy() == cfg.data
+
+    cfg.set(["weights"], cfg["weights"] + array.array("d", [3.0]))
+    assert cfg["weights"] == array.array("d", [1.0, 2.5, 3.0])
+    assert cfg.valid
+
+
+def test_config_default_error():
+    def fail(attribute):
+        raise ValueError("no default")
+
+    class Failing(Schema):
+        int_attr = Int()
+        other = Attribute(default=fail)
+
+    cfg = Config(Failing(), {"int_attr": "x"})
+    assert cfg.data == {"int_attr": "x"}
+    assert [type(e) for e in cfg.errors] == [ApplyDefaultError, ValidationError]
+
+
+def test_config_frozen():
+    cfg = Config(Schema_04(), {"nested": {"int_attr": 2}}, frozen=True)
+    data = cfg.data
+    assert isinstance(data, FrozenDict)
+    assert isinstance(data["list_attr"], tuple)
+    assert cfg == Config(Schema_04(), {"nested": {"int_attr": 2}})
+
+    with pytest.raises(TypeError):
+        data["str_attr"] = "changed"
+    with pytest.raises(TypeError):
+        data["nested"].update(int_attr=3)
+
+    # frozen data is shared instead of copied
+    assert cfg.copy() is data
+    assert copy.deepcopy(data) is data
+    assert pickle.loads(pickle.dumps(data)) == data
+
+    cfg.set(["nested", "int_attr"], "3")
+    assert isinstance(cfg.data["nested"], FrozenDict)
+    assert cfg.data["nested"]["int_attr"] == 3
+    assert data["nested"]["int_attr"] == 2
+
+
+def test_config_frozen_storage():
+    class Tables(Schema):
+        weights = List(item=Float(), storage="array")
+
+    cfg = Config(Tables(), {"weights": [1, 2.5]}, frozen=True)
+    assert cfg["weights"] == (1.0, 2.5)
+    assert cfg.copy() is cfg.data
+    assert cfg == Config(Tables(), {"weights": [1, 2.5]})
+
+
+def test_config_frozen_numpy():
+    numpy = pytest.importorskip("numpy")
+
+    class Tables(Schema):
+        weights = List(item=Float(), storage="numpy")
+
+    cfg = Config(Tables(), {"weights": [1, 2.5]}, frozen=True)
+    weights = cfg["weights"]
+    assert isinstance(weights, numpy.ndarray)
+    assert weights.tolist() == [1.0, 2.5]
+    with pytest.raises(ValueError):
+        weights[0] = 3.0
+
+    # read only arrays are shared
+    assert confu.config._freeze(weights) is weights
+    assert cfg.copy()["weights"] is weights
+    assert cfg == Config(Tables(), {"weights": [1, 2.5]})
+
+
+@pytest.mark.parametrize("frozen", [False, True])
+def test_config_derive(frozen):
+    cfg = Config(Schema_04(), {"nested": {"int_attr": 2}}, meta={"a": 1}, frozen=frozen)
+    data = cfg.data
+    derived = cfg.derive(["nested", "int_attr"], "x")
+
+    assert derived["nested"]["int_attr"] == "x"
+    assert [e.pretty for e in derived.errors] == ["nested.int_attr: integer expected"]
+    assert derived.meta == cfg.meta and derived.meta is not cfg.meta
+
+    # unchanged values are shared, the original config is unchanged
+    assert derived["list_attr"] is data["list_attr"]
+    assert cfg.data is data
+    assert cfg.data["nested"]["int_attr"] == 2
+    assert cfg.valid
+
+
+def test_config_frozen_schema():
+    class Frozen(Schema):
+        int_attr = Int(default=1)
+
+    schema = Frozen().freeze()
+    cfg = Config(schema, {"int_attr": "2"})
+    assert cfg.schema is schema
+    assert cfg["int_attr"] == 2
+    assert cfg.derive(["int_attr"], 3).schema is schema
+    assert Config(Frozen()).schema is not schema
+
+
+@pytest.mark.parametrize("index", [False, True])
+def test_config_index(index):
+    cfg = Config(Schema_04(), {"nested": {"int_attr": 2}}, index=index)
+    assert cfg.get_nested("nested", "int_attr") == 2
+    assert cfg.get_nested("nested", "missing") is None
+    assert cfg.get_nested() == cfg.data
+    assert cfg.get_path("nested.int_attr") == 2
+    assert cfg.get_path("str_attr.missing", "default") == "default"
+    assert cfg.get_prefix("nested") == {
+        ("nested", "int_attr"): 2,
+        ("nested", "int_attr_choices"): 1,
+    }
+    assert cfg.get_prefix("int_attr") == {}
+
+    cfg.set(["nested"], {"int_attr": "3", "int_attr_choices": 2})
+    cfg.set(["int_attr"], 4)
+    assert cfg.get_path("nested.int_attr") == 3
+    assert cfg.get_nested("int_attr") == 4
+    assert cfg.get_prefix("nested") == {
+        ("nested", "int_attr"): 3,
+        ("nested", "int_attr_choices"): 2,
+    }
+
+    derived = cfg.derive(["nested", "int_attr"], 5)
+    assert derived.get_path("nested.int_attr") == 5
+    assert cfg.get_path("nested.int_attr") == 3
+
+    # the index matches the data after values were changed
+    if index:
+        assert cfg._index[0] is cfg._data
+        assert_index(cfg)
+        assert_index(derived)
+
+        # derived configs share the index of the config they were
+        # derived from
+        derived = cfg.derive(["nested", "int_attr_choices"], 3)
+        assert derived._index[1].base is cfg._index[1].base
+        assert derived.get_path("nested.int_attr_choices") == 3
+        assert cfg.get_path("nested.int_attr_choices") == 2
+        cfg.set(["nested", "int_attr"], 7)
+        assert derived.get_path("nested.int_attr") == 3
+        assert_index(cfg)
+        assert_index(derived)
+
+        for value in range(20):
+            derived = derived.derive(["int_attr"], value)
+            assert derived.get_nested("int_attr") == value
+            assert_index(derived)
+
+
+def assert_index(cfg):
+    index = cfg._get_index()
+    expected = confu.config._build_index(cfg.data)
+    assert {path: index.get(path) for path in expected} == expected
+    assert index.get(("nested", "missing"), "missing") == "missing"
@@ -1,8 +1,10 @@
+import array
 import json
 
 import pytest
 
 from confu.generator import ConfigGenerator, generate
+from confu.schema import Int, List, Schema
 from tests.schemas import Schema_02
 
 
@@ -21,3 +23,10 @@ def test_generate_config_shortcut(generator):
     assert config == json.loads(
         '{"int_attr": 123, "nested": {"int_attr": null}, "list_attr": [], "str_attr": "test", "str_attr_null": null}'
     )
+
+
+def test_generate_list_storage():
+    class Tables(Schema):
+        ports = List(item=Int(), storage="array", default=[22, 80])
+
+    assert generate(Tables()) == {"ports": array.array("q", [22, 80])}
@@ -0,0 +1,90 @@
+import pickle
+
+import pytest
+
+from confu.config import Config, FrozenDict
+from confu.objects import ConfigObject, materialize, object_class
+from confu.schema import Dict, Int, List, Str
+from tests.schemas import ProxySchema_01, Schema_04, Schema_06
+
+
+def test_materialize():
+    schema = Schema_04()
+    config = Config(schema, {"list_attr": [{"int_attr": 1}], "nested": {}})
+    obj = materialize(schema, config.data)
+
+    assert isinstance(obj, ConfigObject)
+    assert type(obj) is object_class(schema)
+    assert type(obj).__name__ == "Schema_04"
+    assert not hasattr(obj, "__dict__")
+
+    assert obj.int_attr == 123
+    assert obj["str_attr"] == "test"
+    assert obj.str_attr_null is None
+    assert obj.list_attr_w_default == (1, 2, 3)
+    assert obj.list_attr[0].int_attr == 1
+    assert obj.nested.int_attr_choices == 1
+    assert obj._asdict().keys() == config.data.keys()
+
+    with pytest.raises(AttributeError):
+        obj.int_attr = 1
+    with pytest.raises(KeyError):
+        obj["_asdict"]
+
+    assert materialize(schema, config.data) == obj
+    assert object_class(schema) is type(obj)
+    assert object_class(Schema_04()) is type(obj)
+    assert pickle.loads(pickle.dumps(obj)) == obj
+
+
+def test_materialize_proxy_list():
+    # proxy schemas return new schema instances, which share the class
+    schema = Schema_06()
+    data = {"proxies": [{"int_attr": 1}, {"name": "a"}]}
+    obj = materialize(schema, data)
+    assert materialize(schema, data) == obj
+    assert pickle.loads(pickle.dumps(obj)) == obj
+    assert obj.proxies[1].name == "a"
+
+
+def test_object_class_fields():
+    schema = Schema_04()
+    schema._attr = dict(schema._attr, extra=Int())
+    assert object_class(schema) is not object_class(Schema_04())
+    assert "extra" in object_class(schema).__slots__
+
+
+def test_materialize_dict():
+    schema = Dict(item=List(item=Str()))
+    obj = materialize(schema, {"a": ["b", "c"], "d": []})
+    assert obj == {"a": ("b", "c"), "d": ()}
+    assert isinstance(obj, FrozenDict)
+
+
+def test_materialize_proxy():
+    schema = ProxySchema_01()
+    assert materialize(schema, {"int_attr": 1}).int_attr == 1
+    assert materialize(schema, {"name": "a"}).name == "a"
+
+
+def test_config_as_object():
+    schema = Schema_04()
+    cfg = Config(schema, {"nested": {"int_attr": 2}})
+    obj = cfg.as_object()
+    assert obj.nested.int_attr == 2
+    assert cfg.as_object() is obj
+
+    cfg.set(["nested", "int_attr"], "3")
+    assert cfg.as_object().nested.int_attr == 3
+    assert obj.nested.int_attr == 2
+
+    frozen = Config(schema, {"nested": {"int_attr": 2}}, frozen=True)
+    assert frozen.as_object() == obj
+
+
+def test_materialize_invalid():
+    class Ports(Dict):
+        pass
+
+    obj = materialize(Ports(item=Int()), {"a": "x"})
+    assert obj == {"a": "x"}
@@ -0,0 +1,124 @@
+import copy
+
+import pytest
+
+from confu.schema import (
+    CollectValidationExceptions,
+    ConfigPath,
+    Dict,
+    Float,
+    Int,
+    List,
+    Schema,
+    Str,
+    ValidationRun,
+    validate,
+)
+from confu.schema.parallel import ValidationPool
+
+
+class Device(Schema):
+    name = Str()
+    port = Int(choices=[22, 80, 443])
+    tags = List(item=Str(), default=[])
+
+
+class ParallelSchema(Schema):
+    devices = List(item=Device())
+    ports = List(item=Int())
+    weights = Dict(item=Float())
+    sites = Dict(item=Device())
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ValidationPool(max_workers=2, min_items=2, chunksize=3) as pool:
+        yield pool
+
+
+def collect(schema, config, **kwargs):
+    config = copy.deepcopy(config)
+    success, errors, warnings = validate(schema, config, **kwargs)
+    return (
+        config,
+        [e.pretty for e in errors],
+        [w.pretty for w in warnings],
+    )
+
+
+CONFIG = {
+    "devices": [
+        {"name": f"device{idx}", "port": [22, 80, "443"][idx % 3], "tags": "a,b"}
+        for idx in range(10)
+    ]
+    + [{"name": "", "port": 21}, 1, {"port": "x", "unknown": 1}, {"name": "last"}],
+    "ports": [1, "2", "three", 4, "five", "6"],
+    "weights": {"a": 1, "b": "x", "c": "0.5"},
+    "sites": {"a": {"name": "a", "port": 22}, "b": {"name": 1}, "c": []},
+}
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_parallel_matches_sequential(pool, codegen):
+    expected = collect(ParallelSchema(), CONFIG)
+    assert collect(ParallelSchema(codegen=codegen), CONFIG, pool=pool) == expected
+
+    # indexes are positions in the list
+    assert "ports.2: integer expected" in expected[1]
+    assert "ports.4: integer expected" in expected[1]
+    assert "devices.13.port: missing" in expected[1]
+
+
+def test_parallel_attributes(pool):
+    schema = ParallelSchema()
+    errors = CollectValidationExceptions()
+    schema.validate(copy.deepcopy(CONFIG), errors=errors, warnings=errors, pool=pool)
+    error = next(e for e in errors if e.details["path"] == ["devices", 10, "port"])
+
+    # errors reference the attributes of the schema, not copies
+    assert error.details["attribute"] is schema.devices.item.port
+
+
+def test_parallel_max_errors(pool):
+    success, errors, warnings = validate(
+        ParallelSchema(), copy.deepcopy(CONFIG), max_errors=2, pool=pool
+    )
+    assert len(errors) == 2
+
+    with pytest.raises(Exception):
+        ParallelSchema().validate(copy.deepcopy(CONFIG), pool=pool)
+
+
+def test_parallel_min_items():
+    pool = ValidationPool(min_items=100)
+    assert collect(ParallelSchema(), CONFIG, pool=pool) == collect(
+        ParallelSchema(), CONFIG
+    )
+
+    # small collections are validated without starting workers
+    assert pool._executor is None
+
+
+class Broken(Int):
+    def validate(self, value, path, **kwargs):
+        raise TypeError("broken")
+
+
+def test_parallel_error(pool):
+    # errors raised by validation in a worker are not taken for pickling
+    # errors, validation does not silently fall back to sequential
+    attribute = List("ports", item=Broken())
+    errors = CollectValidationExceptions()
+    run = ValidationRun(errors, errors, pool=pool)
+    with pytest.raises(TypeError, match="broken"):
+        attribute.compile()([1, 2, 3], ConfigPath(ConfigPath(), "ports"), run)
+
+
+def test_parallel_unpicklable(pool):
+    # attributes that can't be pickled are validated sequentially
+    attribute = List("ports", item=Int(choices=lambda attribute: [1, 2]))
+    errors = CollectValidationExceptions()
+    run = ValidationRun(errors, errors, pool=pool)
+    path = ConfigPath(ConfigPath(), "ports")
+    assert attribute.compile()([1, 2, 3], path, run) == [1, 2]
+    assert [e.pretty for e in errors] == ["ports.2: invalid choice"]
@@ -0,0 +1,155 @@
+import json
+import os
+import time
+
+import pytest
+
+from confu.config import Config
+from confu.reload import (
+    _EVENT,
+    _IN_Q_OVERFLOW,
+    ConfigReloader,
+    _InotifyWatcher,
+    _libc,
+)
+from confu.schema import Int, Schema, Str
+
+WATCHERS = [
+    "poll",
+    pytest.param(
+        "inotify",
+        marks=pytest.mark.skipif(_libc() is None, reason="inotify not available"),
+    ),
+]
+
+
+class Server(Schema):
+    host = Str(default="localhost")
+    port = Int()
+
+
+def write(path, data):
+    # replace the file like editors do
+    with open(f"{path}.tmp", "w") as fh:
+        json.dump(data, fh)
+    os.replace(f"{path}.tmp", path)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("watcher", WATCHERS)
+def test_reload(tmp_path, watcher):
+    path = str(tmp_path / "server.json")
+    write(path, {"port": 80})
+    config = Config(Server(), {"port": 80}, index=True)
+
+    with ConfigReloader(
+        config, [path], debounce=0.05, interval=0.02, watcher=watcher
+    ) as reloader:
+        write(path, {"port": "8080"})
+        wait_for(lambda: reloader.reloads == 1)
+        assert config["port"] == 8080
+        assert config.get_path("host") == "localhost"
+        assert reloader.last_latency >= 0
+
+        # invalid data is not swapped in
+        write(path, {"port": "invalid"})
+        wait_for(lambda: reloader.failures == 1)
+        assert config["port"] == 8080
+        assert config.valid
+        assert [e.pretty for e in reloader.last_error] == ["port: integer expected"]
+
+        with open(path, "w") as fh:
+            fh.write("{")
+        wait_for(lambda: reloader.failures == 2)
+        assert isinstance(reloader.last_error, ValueError)
+        assert config["port"] == 8080
+
+
+def swap_data(directory, version, data):
+    # the layout Kubernetes mounts ConfigMaps with: the file is a symlink
+    # into `..data`, a symlink to a versioned directory that is replaced
+    versioned = directory / f"..{version}"
+    versioned.mkdir()
+    with open(versioned / "server.json", "w") as fh:
+        json.dump(data, fh)
+    os.symlink(versioned.name, directory / "..data_tmp")
+    os.replace(directory / "..data_tmp", directory / "..data")
+
+
+@pytest.mark.parametrize("watcher", WATCHERS)
+def test_reload_symlink_swap(tmp_path, watcher):
+    swap_data(tmp_path, 1, {"port": 80})
+    os.symlink(os.path.join("..data", "server.json"), tmp_path / "server.json")
+    config = Config(Server(), {"port": 80})
+
+    with ConfigReloader(
+        config,
+        [str(tmp_path / "server.json")],
+        debounce=0.05,
+        interval=0.02,
+        watcher=watcher,
+    ) as reloader:
+        swap_data(tmp_path, 2, {"port": 8080})
+        wait_for(lambda: reloader.reloads == 1)
+        assert config["port"] == 8080
+
+        swap_data(tmp_path, 3, {"port": 8081})
+        wait_for(lambda: reloader.reloads == 2)
+        assert config["port"] == 8081
+
+
+@pytest.mark.skipif(_libc() is None, reason="inotify not available")
+def test_inotify_overflow(tmp_path, monkeypatch):
+    watcher = _InotifyWatcher([str(tmp_path / "server.json")])
+    try:
+        assert not watcher.read()
+        # dropped events are reported with a watch descriptor of -1
+        monkeypatch.setattr(
+            "confu.reload.os.read",
+            lambda fd, size: _EVENT.pack(-1, _IN_Q_OVERFLOW, 0, 0),
+        )
+        assert watcher.read()
+    finally:
+        monkeypatch.undo()
+        watcher.close()
+
+
+def test_reload_debounce(tmp_path):
+    path = str(tmp_path / "server.json")
+    write(path, {"port": 1})
+    loads = []
+
+    def loader():
+        with open(path) as fh:
+            loads.append(json.load(fh))
+        return loads[-1]
+
+    config = Config(Server(), {"port": 1})
+    with ConfigReloader(
+        config, [path], loader=loader, debounce=0.3, interval=0.02, watcher="poll"
+    ) as reloader:
+        for port in range(2, 7):
+            write(path, {"port": port})
+            time.sleep(0.02)
+        wait_for(lambda: reloader.reloads == 1)
+
+    assert loads == [{"port": 6}]
+    assert config["port"] == 6
+
+
+def test_reload_now():
+    data = {"port": 1}
+    config = Config(Server(), {"port": 0}, frozen=True)
+    reloader = ConfigReloader(config, [], loader=lambda: data)
+    assert reloader.reload()
+    assert config["port"] == 1
+    assert (reloader.reloads, reloader.failures) == (1, 0)
+
+    with pytest.raises(ValueError):
+        ConfigReloader(config, [], watcher="unknown")
@@ -1,10 +1,27 @@
+import copy
 import json
 import os
+import pickle
 
 import pytest
 
-from confu.schema import ApplyDefaultError, apply_defaults
+from confu.exceptions import ValidationError
+from confu.schema import (
+    ApplyDefaultError,
+    Attribute,
+    CollectValidationExceptions,
+    Dict,
+    Int,
+    List,
+    Schema,
+    Str,
+    ValidationPlan,
+    apply_defaults,
+    validate,
+    validate_with_defaults,
+)
 from tests.schemas import (
+    ProxySchema_01,
     Schema_01,
     Schema_04,
     Schema_10,
@@ -32,6 +49,12 @@ def test_schema_walk():
         ["int_attr", "list_attr", "nested", "nested.int_attr", "str_attr"]
     )
 
+    # callbacks are passed lists, starting from the path passed to walk
+    paths = []
+    Schema_01().walk(lambda attribute, path: paths.append(path), path=["root"])
+    assert all(type(path) is list for path in paths)
+    assert ["root", "nested", "int_attr"] in paths
+
 
 def test_schema_auto_name():
     schema = Schema_13()
@@ -39,76 +62,75 @@ def test_schema_auto_name():
     assert schema.int_attr.name == "int_attr"
 
 
-@pytest.mark.parametrize(
-    "SchemaClass,config,expected",
-    [
-        (
-            Schema_04,
-            {},
-            {
-                "int_attr": 123,
-                "str_attr": "test",
-                "str_attr_null": None,
-                "list_attr": [],
-                "list_attr_w_default": [1, 2, 3],
-                "nested": {"int_attr_choices": 1},
-            },
-        ),
-        (
-            Schema_04,
-            {"int_attr": 999, "str_attr_null": "something"},
-            {
-                "int_attr": 999,
-                "str_attr": "test",
-                "str_attr_null": "something",
-                "list_attr": [],
-                "list_attr_w_default": [1, 2, 3],
-                "nested": {"int_attr_choices": 1},
-            },
-        ),
-        (
-            Schema_04,
-            {"nested": {"int_attr": 1}},
-            {
-                "int_attr": 123,
-                "str_attr": "test",
-                "str_attr_null": None,
-                "list_attr": [],
-                "list_attr_w_default": [1, 2, 3],
-                "nested": {"int_attr_choices": 1, "int_attr": 1},
-            },
-        ),
-        (
-            Schema_04,
-            {"nested": {"int_attr": 1, "int_attr_choices": 2}},
-            {
-                "int_attr": 123,
-                "str_attr": "test",
-                "str_attr_null": None,
-                "list_attr": [],
-                "list_attr_w_default": [1, 2, 3],
-                "nested": {"int_attr_choices": 2, "int_attr": 1},
-            },
-        ),
-        (
-            Schema_04,
-            {"list_attr_w_default": [4, 5, 6]},
-            {
-                "int_attr": 123,
-                "str_attr": "test",
-                "str_attr_null": None,
-                "list_attr": [],
-                "list_attr_w_default": [4, 5, 6],
-                "nested": {"int_attr_choices": 1},
-            },
-        ),
-        (Schema_10, "in.01.json", "expected.01.json"),
-        (Schema_11, "in.02.json", "expected.02.json"),
-        (Schema_10, "in.03.json", "expected.03.json"),
-        (Schema_12, "in.04.json", "expected.04.json"),
-    ],
-)
-def test_apply_defaults(SchemaClass, config, expected):
+APPLY_DEFAULTS_CASES = [
+    (
+        Schema_04,
+        {},
+        {
+            "int_attr": 123,
+            "str_attr": "test",
+            "str_attr_null": None,
+            "list_attr": [],
+            "list_attr_w_default": [1, 2, 3],
+            "nested": {"int_attr_choices": 1},
+        },
+    ),
+    (
+        Schema_04,
+        {"int_attr": 999, "str_attr_null": "something"},
+        {
+            "int_attr": 999,
+            "str_attr": "test",
+            "str_attr_null": "something",
+            "list_attr": [],
+            "list_attr_w_default": [1, 2, 3],
+            "nested": {"int_attr_choices": 1},
+        },
+    ),
+    (
+        Schema_04,
+        {"nested": {"int_attr": 1}},
+        {
+            "int_attr": 123,
+            "str_attr": "test",
+            "str_attr_null": None,
+            "list_attr": [],
+            "list_attr_w_default": [1, 2, 3],
+            "nested": {"int_attr_choices": 1, "int_attr": 1},
+        },
+    ),
+    (
+        Schema_04,
+        {"nested": {"int_attr": 1, "int_attr_choices": 2}},
+        {
+            "int_attr": 123,
+            "str_attr": "test",
+            "str_attr_null": None,
+            "list_attr": [],
+            "list_attr_w_default": [1, 2, 3],
+            "nested": {"int_attr_choices": 2, "int_attr": 1},
+        },
+    ),
+    (
+        Schema_04,
+        {"list_attr_w_default": [4, 5, 6]},
+        {
+            "int_attr": 123,
+            "str_attr": "test",
+            "str_attr_null": None,
+            "list_attr": [],
+            "list_attr_w_default": [4, 5, 6],
+            "nested": {"int_attr_choices": 1},
+        },
+    ),
+    (Schema_10, "in.01.json", "expected.01.json"),
+    (Schema_11, "in.02.json", "expected.02.json"),
+    (Schema_10, "in.03.json", "expected.03.json"),
+    (Schema_12, "in.04.json", "expected.04.json"),
+]
+
+
+def load_defaults_case(config, expected):
     if not isinstance(config, dict):
         with open(
             os.path.join(os.path.dirname(__file__), "data", "defaults", config)
@@ -119,6 +141,12 @@ def test_apply_defaults(SchemaClass, config, expected):
             os.path.join(os.path.dirname(__file__), "data", "defaults", expected)
         ) as fh:
             expected = json.load(fh)
+    return config, expected
+
+
+@pytest.mark.parametrize("SchemaClass,config,expected", APPLY_DEFAULTS_CASES)
+def test_apply_defaults(SchemaClass, config, expected):
+    config, expected = load_defaults_case(config, expected)
 
     if hasattr(SchemaClass(), "schema_attr"):
         print(SchemaClass().schema_attr.default)
@@ -128,6 +156,292 @@ def test_apply_defaults(SchemaClass, config, expected):
     assert expected == config
 
 
+@pytest.mark.parametrize("codegen", [False, True])
+@pytest.mark.parametrize(
+    "SchemaClass,config,expected",
+    # nested `Dict` attributes are covered by test_validate_with_defaults_dict
+    # and test_validate_with_defaults_nested_dict
+    [case for case in APPLY_DEFAULTS_CASES if case[0] not in (Schema_10, Schema_12)],
+)
+def test_validate_with_defaults(SchemaClass, config, expected, codegen):
+    config, expected = load_defaults_case(config, expected)
+    separate = copy.deepcopy(config)
+    fused = copy.deepcopy(config)
+
+    apply_defaults(SchemaClass(), separate)
+    separate_result = validate(SchemaClass(codegen=codegen), separate)
+    fused_result = validate_with_defaults(SchemaClass(codegen=codegen), fused)
+
+    assert fused == separate
+    assert fused_result[0] == separate_result[0]
+    assert [e.pretty for e in fused_result[1]] == [e.pretty for e in separate_result[1]]
+    assert [w.pretty for w in fused_result[2]] == [w.pretty for w in separate_result[2]]
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+@pytest.mark.parametrize(
+    "SchemaClass,config,expected,errors,warnings",
+    [
+        (
+            Schema_10,
+            "in.01.json",
+            "expected_fused.01.json",
+            ["schema_attr.str_attr_nd: missing"],
+            [],
+        ),
+        (
+            Schema_10,
+            "in.03.json",
+            "expected_fused.03.json",
+            [
+                "dict_attr.dict_attr.str_attr_nd: missing",
+                "list_of_dicts2.0.test.dict_attr.str_attr: dictionary expected",
+                "list_of_dicts2.0.test.dict_attr.str_attr_null: dictionary expected",
+                "list_of_dicts2.0.test.dict_attr.int_attr: dictionary expected",
+                "schema_attr.str_attr_nd: missing",
+            ],
+            [
+                "dict_attr.dict_attr: unknown attribute 'str_attr'",
+                "dict_attr.dict_attr: unknown attribute 'str_attr_null'",
+                "dict_attr.dict_attr: unknown attribute 'int_attr'",
+            ],
+        ),
+        (
+            Schema_12,
+            "in.04.json",
+            "expected_fused.04.json",
+            [
+                "proxies_dict.item 1.str_attr_nd: dictionary expected",
+                "proxies_dict.item 2.str_attr_nd: dictionary expected",
+                "proxies_dict.item 2.int_attr: dictionary expected",
+            ],
+            [],
+        ),
+    ],
+)
+def test_validate_with_defaults_nested_dict(
+    SchemaClass, config, expected, errors, warnings, codegen
+):
+    # these schemas nest `Dict` attributes, the fused pass applies item
+    # schema defaults to the values of the dicts while `apply_defaults`
+    # applies them to the dicts themselves, so their results differ from
+    # `apply_defaults` followed by `validate`
+    config, expected = load_defaults_case(config, expected)
+    result = validate_with_defaults(SchemaClass(codegen=codegen), config)
+    assert config == expected
+    assert result[0] is False
+    assert [e.pretty for e in result[1]] == errors
+    assert [w.pretty for w in result[2]] == warnings
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_validate_with_defaults_dict(codegen):
+    class Device(Schema):
+        name = Str()
+        port = Int(default=22)
+
+    class Root(Schema):
+        sites = Dict(item=Device())
+        regions = Dict(item=Dict(item=Device()))
+
+    config = {"sites": {"a": {"name": "a"}}, "regions": {"eu": {"b": {"name": "b"}}}}
+    success, errors, warnings = validate_with_defaults(Root(codegen=codegen), config)
+    assert success
+
+    # defaults of the item schema are applied to the values of the dict,
+    # `apply_defaults` applies them to the dict itself
+    assert config == {
+        "sites": {"a": {"name": "a", "port": 22}},
+        "regions": {"eu": {"b": {"name": "b", "port": 22}}},
+    }
+
+    config = {}
+    assert validate_with_defaults(Root(codegen=codegen), config)[0]
+    assert config == {"sites": {}, "regions": {}}
+
+
+def test_validate_with_defaults_error():
+    def fail(attribute):
+        raise ValueError("no default")
+
+    class Failing(Schema):
+        int_attr = Attribute(default=fail)
+        str_attr = Str(default="test")
+
+    config = {}
+    success, errors, warnings = validate_with_defaults(Failing(), config)
+    assert isinstance(errors[0], ApplyDefaultError)
+    assert errors[0].details["path"] == ["int_attr"]
+    assert config == {"str_attr": "test"}
+
+
 def test_apply_defaults_error():
     with pytest.raises(ApplyDefaultError):
         apply_defaults(Schema_04(), {"nested": 123})
+
+
+@pytest.mark.parametrize("fused", [False, True])
+def test_apply_defaults_copies(fused):
+    class Nested(Schema):
+        tags = List(item=Str(), default=["a", "b"])
+
+    class Root(Schema):
+        tags = List(item=Str(), default=["a", "b"])
+        nested = Nested(default={"tags": ["c"], "extra": {"d": [1]}})
+
+    schema = Root()
+    first, second = {}, {}
+    for config in (first, second):
+        if fused:
+            validate_with_defaults(schema, config)
+        else:
+            apply_defaults(schema, config)
+
+    first["tags"].append("x")
+    first["nested"]["tags"].append("x")
+    first["nested"]["extra"]["d"].append(2)
+
+    assert second == {
+        "tags": ["a", "b"],
+        "nested": {"tags": ["c"], "extra": {"d": [1]}},
+    }
+    assert schema.tags.default == ["a", "b"]
+    assert schema.nested.default == {"tags": ["c"], "extra": {"d": [1]}}
+
+    # frozen defaults are rebuilt after unpickling
+    assert pickle.loads(pickle.dumps(schema.tags))._default_copy() == ["a", "b"]
+
+
+def test_schema_compile():
+    schema = Schema_01()
+    plan = schema.compile()
+    assert isinstance(plan, ValidationPlan)
+    assert schema._plan is plan
+    assert set(plan.checks) == {"int_attr", "str_attr", "list_attr", "nested"}
+    assert [name for name, _ in plan.required] == ["int_attr", "str_attr"]
+
+    # plan is reused by validate
+    schema.validate(
+        {"int_attr": 1, "str_attr": "a", "list_attr": [], "nested": {}},
+        errors=CollectValidationExceptions(),
+    )
+    assert schema._plan is plan
+
+    # proxy schemas keep going through their validate method
+    assert not isinstance(ProxySchema_01().compile(), ValidationPlan)
+
+
+def test_schema_compile_custom_attribute():
+    class Upper(Str):
+        def validate(self, value, path, **kwargs):
+            value = super().validate(value, path, **kwargs)
+            if value != value.upper():
+                raise ValidationError(self, path, value, "upper case expected")
+            return value
+
+    class CustomSchema(Schema):
+        upper = Upper()
+
+    errors = CollectValidationExceptions()
+    CustomSchema().validate({"upper": "abc"}, errors=errors)
+    assert errors[0] == ValidationError(None, ["upper"], "abc", "upper case expected")
+
+
+def test_schema_attributes_definition_order():
+    class OrderedSchema(Schema_13):
+        z_attr = Int()
+        a_attr = Int()
+        int_attr = Int(default=2)
+
+    assert list(OrderedSchema._attributes) == [
+        "int_attr",
+        "str_attr",
+        "z_attr",
+        "a_attr",
+    ]
+
+    # subclass attribute replaces the base class attribute
+    assert OrderedSchema._attributes["int_attr"].default == 2
+    assert OrderedSchema.z_attr.name == "z_attr"
+
+    schema = OrderedSchema()
+    assert [name for name, _ in schema.attributes()] == list(OrderedSchema._attributes)
+    assert schema._attr is not OrderedSchema._attributes
+
+
+def test_schema_freeze():
+    # freezing a schema freezes the attributes of its class, so the
+    # shared test schemas are not used here
+    class Nested(Schema):
+        int_attr = Int(choices=[1, 2, 3], default=1)
+
+    class Frozen(Schema):
+        str_attr = Str(default="test")
+        list_attr = List(item=Int(), default=[1, 2])
+        nested = Nested()
+
+    schema = Frozen().freeze()
+    assert schema.frozen
+    assert all(attribute.frozen for name, attribute in schema.attributes())
+    assert schema.list_attr.item.frozen
+    assert not Frozen().frozen
+
+    with pytest.raises(AttributeError):
+        schema.codegen = True
+    with pytest.raises(AttributeError):
+        schema.nested.int_attr.help = "changed"
+
+    # frozen schemas are shared instead of copied
+    assert copy.deepcopy(schema) is schema
+    assert copy.copy(schema.nested) is schema.nested
+    assert pickle.loads(pickle.dumps(schema.list_attr)).frozen
+
+    config = {"nested": {"int_attr": 4}}
+    success, errors, warnings = validate_with_defaults(schema, config)
+    assert [e.pretty for e in errors] == ["nested.int_attr: invalid choice"]
+    assert config["list_attr"] == [1, 2]
+
+
+def test_schema_freeze_nested():
+    # frozen schemas and attributes can be used within other schemas
+    class Nested(Schema):
+        int_attr = Int(default=1)
+
+    frozen = Nested().freeze()
+    frozen_int = Int().freeze()
+
+    class Parent(Schema):
+        inner = frozen
+        ints = List(item=frozen_int)
+        nested_list = List(item=frozen)
+        nested_dict = Dict(item=frozen)
+
+    assert frozen.name == "inner"
+    assert frozen_int.container is Parent.ints
+    assert frozen.container is Parent.nested_list
+
+    # a frozen attribute stays bound to where it was first added
+    Dict(item=frozen_int)
+    assert frozen_int.container is Parent.ints
+    with pytest.raises(AttributeError):
+        frozen.name = "renamed"
+
+    config = {
+        "inner": {},
+        "ints": ["1", 2],
+        "nested_list": [{"int_attr": "x"}],
+        "nested_dict": {"a": {}},
+    }
+    success, errors, warnings = validate_with_defaults(Parent(), config)
+    assert [e.pretty for e in errors] == ["nested_list.0.int_attr: integer expected"]
+    assert config["ints"] == [1, 2]
+    assert config["nested_dict"] == {"a": {"int_attr": 1}}
+    Parent().freeze()
+
+
+def test_schema_copy():
+    schema = Schema_04()
+    copied = copy.deepcopy(schema)
+    assert copied is not schema
+    assert copied._attr["nested"] is not schema._attr["nested"]
+    assert copied._plan is None
@@ -0,0 +1,209 @@
+import functools
+import json
+import os
+
+import pytest
+
+from confu.config import FrozenDict
+from confu.exceptions import SchemaFingerprintError, ValidationWarning
+from confu.schema import Int, List, ProxySchema, Schema, Str
+from confu.snapshot import SnapshotCache, load_config, schema_fingerprint
+
+
+class Server(Schema):
+    host = Str(default="localhost")
+    port = Int()
+    tags = List(item=Str(), default=[])
+
+
+def write(path, data):
+    with open(path, "w") as fh:
+        json.dump(data, fh)
+
+
+@pytest.fixture
+def files(tmp_path):
+    path = str(tmp_path / "server.json")
+    write(path, {"port": "80", "unknown": 1})
+    return [path]
+
+
+@pytest.mark.parametrize("check", ["mtime", "hash"])
+def test_load_config(tmp_path, files, check):
+    cache = SnapshotCache(str(tmp_path / "cache"), check=check)
+    loads = []
+
+    def loader(paths):
+        loads.append(paths)
+        with open(paths[0]) as fh:
+            return json.load(fh)
+
+    config = load_config(Server(), files, cache=cache, loader=loader)
+    assert config.data == {"host": "localhost", "port": 80, "tags": [], "unknown": 1}
+    assert len(loads) == 1
+
+    # the snapshot is used instead of loading and validating the files
+    cached = load_config(Server(), files, cache=cache, loader=loader)
+    assert len(loads) == 1
+    assert cached == config
+    assert cached.valid
+    assert [w.pretty for w in cached.warnings] == [": unknown attribute 'unknown'"]
+
+    # the base data is restored as well
+    cached.set(["port"], "81")
+    assert cached["port"] == 81
+    assert cached["host"] == "localhost"
+
+    # a different schema or changed files are not served from the snapshot
+    class Other(Server):
+        port = Int(default=1)
+
+    load_config(Other(), files, cache=cache, loader=loader)
+    assert len(loads) == 2
+
+    write(files[0], {"port": "8080"})
+    os.utime(files[0], ns=(1, 1))
+    assert load_config(Server(), files, cache=cache, loader=loader)["port"] == 8080
+    assert len(loads) == 3
+
+
+def test_load_config_invalid(tmp_path, files):
+    cache = SnapshotCache(str(tmp_path / "cache"))
+    write(files[0], {"port": "invalid"})
+
+    config = load_config(Server(), files, cache=cache)
+    assert [e.pretty for e in config.errors] == ["port: integer expected"]
+    assert cache.load(cache.key(Server(), files)) is None
+
+
+def test_load_config_frozen(tmp_path, files):
+    cache = SnapshotCache(str(tmp_path / "cache"))
+    load_config(Server(), files, cache=cache)
+    config = load_config(Server(), files, cache=cache, frozen=True)
+    assert isinstance(config.data, FrozenDict)
+    config = load_config(Server(), files, cache=cache, frozen=True)
+    assert isinstance(config.data, FrozenDict)
+    assert type(load_config(Server(), files, cache=cache).data) is dict
+
+
+def test_snapshot_corrupt(tmp_path, files):
+    cache = SnapshotCache(str(tmp_path / "cache"))
+    load_config(Server(), files, cache=cache)
+    key = cache.key(Server(), files)
+    with open(cache._path(key), "wb") as fh:
+        fh.write(b"corrupt")
+    assert cache.load(key) is None
+    assert load_config(Server(), files, cache=cache)["port"] == 80
+
+
+def test_schema_fingerprint():
+    assert schema_fingerprint(Server()) == schema_fingerprint(Server())
+    assert schema_fingerprint(Server()) != schema_fingerprint(Server(default=None))
+    assert schema_fingerprint(Server()) != schema_fingerprint(
+        Schema(item=Int(choices=[1, 2]))
+    )
+
+
+def test_store_error(tmp_path, files):
+    # the cache directory cannot be created, the config is still loaded
+    directory = tmp_path / "cache"
+    directory.write_text("")
+    cache = SnapshotCache(str(directory))
+    config = load_config(Server(), files, cache=cache)
+    assert config["port"] == 80
+    assert not cache.store(cache.key(Server(), files), config)
+
+
+class Port(Int):
+    def validate(self, value, path, **kwargs):
+        value = super().validate(value, path, **kwargs)
+        if value < 1024:
+            raise ValidationWarning(self, path, value, "privileged port")
+        return value
+
+
+class Ports(Schema):
+    ports = List(item=Port())
+
+
+def test_load_config_warning_attribute(tmp_path):
+    path = str(tmp_path / "ports.json")
+    write(path, {"ports": [80, 8080]})
+    cache = SnapshotCache(str(tmp_path / "cache"))
+
+    config = load_config(Ports(), [path], cache=cache)
+    cached = load_config(Ports(), [path], cache=cache)
+    assert cached.data is not config.data
+    assert [w.pretty for w in cached.warnings] == ["ports.0: privileged port"]
+    assert cached.warnings[0] == config.warnings[0]
+    assert cached.warnings[0].details["attribute"] is Ports.ports.item
+
+
+class Target(Schema):
+    port = Int()
+
+
+class Proxy(ProxySchema):
+    def schema(self, config):
+        return Target()
+
+
+def test_schema_fingerprint_code(monkeypatch):
+    def custom():
+        class Custom(Int):
+            def validate(self, value, path, **kwargs):
+                return super().validate(value, path, **kwargs)
+
+        return Custom
+
+    class Custom(Int):
+        def validate(self, value, path, **kwargs):
+            return -super().validate(value, path, **kwargs)
+
+    fingerprint = schema_fingerprint(Schema(item=custom()()))
+    assert schema_fingerprint(Schema(item=custom()())) == fingerprint
+    assert schema_fingerprint(Schema(item=Custom())) != fingerprint
+
+    # schemas returned by a proxy schema are included
+    fingerprint = schema_fingerprint(Proxy())
+
+    class Changed(Schema):
+        port = Int(default=80)
+
+    monkeypatch.setitem(globals(), "Target", Changed)
+    assert schema_fingerprint(Proxy()) != fingerprint
+
+
+def port_default(attribute, offset):
+    return 8000 + offset
+
+
+def test_schema_fingerprint_partial():
+    def fingerprint(offset):
+        return schema_fingerprint(
+            Schema(item=Int(default=functools.partial(port_default, offset=offset)))
+        )
+
+    # described by function and arguments, not the address of the partial
+    assert fingerprint(1) == fingerprint(1)
+    assert fingerprint(1) != fingerprint(2)
+
+    assert schema_fingerprint(Schema(item=Int(choices={"b", "a"}))) == (
+        schema_fingerprint(Schema(item=Int(choices={"a", "b"})))
+    )
+
+
+def test_schema_fingerprint_address(tmp_path, files):
+    class Marker:
+        pass
+
+    class Marked(Server):
+        marker = Int(default=Marker())
+
+    with pytest.raises(SchemaFingerprintError):
+        schema_fingerprint(Marked())
+
+    # the config is loaded without the cache
+    cache = SnapshotCache(str(tmp_path / "cache"))
+    assert load_config(Marked(), files, cache=cache)["port"] == 80
+    assert not (tmp_path / "cache").exists()
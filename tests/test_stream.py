@@ -0,0 +1,205 @@
+import copy
+import io
+import json
+import os
+
+import pytest
+
+import confu.schema  # noqa: F401
+from confu.exceptions import ValidationError
+from confu.schema import (
+    CollectValidationExceptions,
+    Dict,
+    Float,
+    Int,
+    List,
+    Schema,
+    Str,
+    validate,
+)
+from confu.schema.stream import JSONTokenizer, stream_validate, validate_json
+from tests.schemas import Schema_01, Schema_03, Schema_06, Schema_10, Schema_11
+
+
+def data(name):
+    with open(os.path.join(os.path.dirname(__file__), "data", name)) as fh:
+        return json.load(fh)
+
+
+def result(success, errors, warnings):
+    return (
+        success,
+        [(e.details["path"], e.details["reason"], e.details["value"]) for e in errors],
+        [(w.details["path"], w.details["reason"]) for w in warnings],
+    )
+
+
+class NestedListSchema(Schema):
+    lists = List(item=List(item=Int()))
+    strings = Dict(item=Str())
+    numbers = List(item=Float(), storage="array", default=[])
+
+
+CONFIGS = [
+    (Schema_01, data("nesting/success.json")),
+    (Schema_01, data("nesting/failure01.json")),
+    (Schema_01, data("nesting/failure02.json")),
+    (Schema_01, data("nesting/failure03.json")),
+    (Schema_01, data("nesting/failure04.json")),
+    (
+        Schema_01,
+        {
+            "int_attr": "x",
+            "list_attr": [{"int_attr": 1, "x": {"a": [1, {}]}}, 2, [3]],
+            "nested": [],
+            "unknown": {"a": [1, 2.5e3, None, True, False, 'é\\"']},
+        },
+    ),
+    (Schema_03, {"list_attr_str": "a,b", "nested": {"int_attr_choices": 4}}),
+    (Schema_06, data("nesting/proxy_success.json")),
+    (Schema_06, data("nesting/proxy_failure01.json")),
+    (Schema_10, data("defaults/expected.01.json")),
+    (Schema_11, data("defaults/expected.02.json")),
+    (
+        NestedListSchema,
+        {
+            "lists": [[1, 2], [3, "x", 4], "5,6", ["y"], 7],
+            "strings": {"a": "b", "c": 1, "d": {"e": "f"}},
+            "numbers": [1, "2.5", "x"],
+        },
+    ),
+    (
+        NestedListSchema,
+        {
+            "lists": [],
+            "strings": {},
+            "numbers": [1.5, -12.25, 1e5, 2.5e-3, 1000.0, -0.5, 123456.789, 7],
+        },
+    ),
+]
+
+
+@pytest.mark.parametrize("chunk_size", [*range(1, 13), 65536])
+@pytest.mark.parametrize("binary", [False, True])
+@pytest.mark.parametrize("SchemaClass,config", CONFIGS)
+def test_stream_matches_validate(SchemaClass, config, chunk_size, binary):
+    schema = SchemaClass()
+    expected_config = copy.deepcopy(config)
+    expected = result(*validate(schema, expected_config))
+
+    document = json.dumps(config, indent=2)
+    if binary:
+        fp = io.BytesIO(document.encode("utf-8"))
+    else:
+        fp = io.StringIO(document)
+
+    errors = CollectValidationExceptions()
+    warnings = CollectValidationExceptions()
+    validated = stream_validate(
+        schema, fp, errors=errors, warnings=warnings, chunk_size=chunk_size
+    )
+    assert result(not len(errors), errors, warnings) == expected
+    assert validated == expected_config
+
+    fp.seek(0)
+    assert result(*validate_json(schema, fp, chunk_size=chunk_size)) == expected
+
+
+def test_stream_raise():
+    document = json.dumps(data("nesting/failure01.json"))
+    with pytest.raises(ValidationError) as exc_info:
+        stream_validate(Schema_01(), io.StringIO(document))
+    with pytest.raises(ValidationError) as sync_exc_info:
+        Schema_01().validate(data("nesting/failure01.json"))
+    assert exc_info.value == sync_exc_info.value
+
+
+def test_stream_build():
+    document = json.dumps({"list_attr": [{"int_attr": 1}], "int_attr": "1"})
+    errors = CollectValidationExceptions()
+    assert (
+        stream_validate(Schema_01(), io.StringIO(document), errors=errors, build=False)
+        is None
+    )
+    assert [e.pretty for e in errors] == ["str_attr: missing"]
+
+
+def test_stream_max_errors():
+    config = {"list_attr": [{"int_attr": "a"} for _ in range(5)], "int_attr": "b"}
+    success, errors, warnings = validate_json(
+        Schema_01(), io.StringIO(json.dumps(config)), max_errors=2
+    )
+    assert not success
+    assert len(errors) == 2
+
+
+@pytest.mark.parametrize("kwargs", [{"fail_fast": True}, {"max_errors": 2}])
+def test_stream_stopped(kwargs):
+    config = {
+        "int_attr": "1",
+        "list_attr": [{"int_attr": "2"}, {"int_attr": "a"}, {"int_attr": "b"}],
+        "str_attr": 1,
+        "nested": {"int_attr": 3},
+    }
+    errors = CollectValidationExceptions()
+    validated = stream_validate(
+        Schema_01(), io.StringIO(json.dumps(config)), errors=errors, **kwargs
+    )
+    sync_errors = CollectValidationExceptions()
+    Schema_01().validate(copy.deepcopy(config), errors=sync_errors, **kwargs)
+    assert [e.pretty for e in errors] == [e.pretty for e in sync_errors]
+
+    # the config parsed up to where validation was stopped is returned
+    items = [{"int_attr": 2}, {"int_attr": "a"}, {"int_attr": "b"}]
+    if "fail_fast" in kwargs:
+        items = items[:2]
+    assert validated == {"int_attr": 1, "list_attr": items}
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        '{"a": 1, "b": [1, -2.5, 3e2, -0, "x\\ny\\u00e9\\ud83d\\ude00"], "c": {}}',
+        '[true, false, null, NaN, Infinity, -Infinity, [], [[]], {"": ""}]',
+        '  "string"  ',
+        "12345678901234567890",
+        "12.5",
+        "-1.25e+10",
+        "1E5",
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 3, 1024])
+def test_tokenizer(document, chunk_size):
+    tokenizer = JSONTokenizer(io.StringIO(document), chunk_size=chunk_size)
+    value = tokenizer.value()
+    tokenizer.end()
+    assert json.dumps(value) == json.dumps(json.loads(document))
+
+
+DATA_FILES = sorted(
+    os.path.join(directory, name)
+    for directory, _, names in os.walk(os.path.join(os.path.dirname(__file__), "data"))
+    for name in names
+    if name.endswith(".json")
+)
+
+
+@pytest.mark.parametrize("path", DATA_FILES)
+@pytest.mark.parametrize("chunk_size", range(1, 13))
+def test_tokenizer_chunks(path, chunk_size):
+    with open(path) as fh:
+        document = fh.read()
+    tokenizer = JSONTokenizer(io.StringIO(document), chunk_size=chunk_size)
+    value = tokenizer.value()
+    tokenizer.end()
+    assert value == json.loads(document)
+
+
+@pytest.mark.parametrize(
+    "document", ['{"a": 1', '{"a" 1}', "[1, 2] 3", '["abc', "[1,, 2]", "tru"]
+)
+def test_tokenizer_invalid(document):
+    with pytest.raises(json.JSONDecodeError):
+        tokenizer = JSONTokenizer(io.StringIO(document), chunk_size=2)
+        tokenizer.value()
+        tokenizer.end()
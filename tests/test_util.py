@@ -4,7 +4,7 @@ import os
 import pytest
 
 from confu.types import TimeDuration
-from confu.util import SettingsManager, config_parser_dict
+from confu.util import SettingsManager, config_parser_dict, load_datafiles
 
 
 @pytest.fixture()
@@ -34,6 +34,16 @@ def test_config_parser_dict():
     assert config_parser_dict(config) == {"test": {"a": "test"}}
 
 
+def test_load_datafiles(tmp_path):
+    (tmp_path / "a.json").write_text('{"a": 1, "b": {"c": 2}}')
+    (tmp_path / "b.yaml").write_text("b:\n  d: 3\n")
+    paths = [str(tmp_path / "a.json"), str(tmp_path / "b.yaml")]
+    assert load_datafiles(paths) == {"a": 1, "b": {"d": 3}}
+
+    with pytest.raises(ValueError):
+        load_datafiles([str(tmp_path / "a.unknown")])
+
+
 def test_set_option_global(globals_fixture):
     g = globals_fixture
     settings_manager = SettingsManager(g)
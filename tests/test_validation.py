@@ -1,17 +1,22 @@
+import array
 import ipaddress
 import json
 import os
+import threading
 
 import pytest
 
-from confu.exceptions import ValidationError
+import confu.schema.core
+from confu.exceptions import ValidationError, ValidationWarning
 from confu.schema import (
     Bool,
     CollectValidationExceptions,
+    ConfigPath,
     Dict,
     Directory,
     Email,
     File,
+    FilesystemCache,
     Float,
     Int,
     IpAddress,
@@ -21,8 +26,11 @@ from confu.schema import (
     Str,
     TimeDuration,
     Url,
+    ValidationFailure,
+    ValidationMemo,
+    validate,
 )
-from tests.schemas import Schema_01, Schema_05, Schema_06
+from tests.schemas import NestedSchema_01, Schema_01, Schema_05, Schema_06
 
 basedir = os.path.join(os.path.dirname(__file__))
 valid_dir = os.path.join(basedir, "data")
@@ -252,3 +260,578 @@ def test_directory_create(tmpdir):
     path = os.path.join(str(tmpdir), "test3")
     with pytest.raises(ValidationError):
         attr.validate(path, [])
+
+
+class FilesSchema(Schema):
+    files = List(item=File())
+    directories = List(item=Directory(), default=[])
+    created = Directory(create=0o777, default=None)
+
+
+def files_config(tmpdir):
+    for name in ["a", "b", "c"]:
+        tmpdir.mkdir(name)
+        for idx in range(3):
+            tmpdir.join(name, f"file{idx}").write("")
+    os.symlink(str(tmpdir.join("a", "file0")), str(tmpdir.join("a", "link")))
+    return {
+        "files": [
+            str(tmpdir.join(name, f"file{idx}")) for name in "abc" for idx in range(4)
+        ]
+        + [
+            str(tmpdir.join("a", "link")),
+            str(tmpdir.join("a")),
+            str(tmpdir.join("x", "y")),
+        ]
+        * 2,
+        "directories": [str(tmpdir.join("a")), str(tmpdir.join("b", "file0"))],
+        "created": str(tmpdir.join("a", "new")),
+    }
+
+
+@pytest.mark.parametrize(
+    "files", [None, FilesystemCache(), FilesystemCache(batch=True, max_workers=2)]
+)
+def test_filesystem_cache(tmpdir, monkeypatch, files):
+    config = files_config(tmpdir)
+    expected = [
+        ["files", 3, "file does not exist"],
+        ["files", 7, "file does not exist"],
+        ["files", 11, "file does not exist"],
+        ["files", 13, "file does not exist"],
+        ["files", 14, "file does not exist"],
+        ["files", 16, "file does not exist"],
+        ["files", 17, "file does not exist"],
+        ["directories", 1, f"valid path to directory expected: {tmpdir}/b/file0"],
+    ]
+
+    stats = []
+    path_kind = confu.schema.core._path_kind
+    monkeypatch.setattr(
+        confu.schema.core,
+        "_path_kind",
+        lambda path: stats.append(path) or path_kind(path),
+    )
+
+    success, errors, warnings = validate(FilesSchema(), config, files=files)
+    assert [e.details["path"] + [e.details["reason"]] for e in errors] == expected
+    assert os.path.isdir(config["created"])
+
+    # every path is looked up once, batched lookups only need to
+    # stat symlinks and names missing from the listed directories, the
+    # created directory is looked up again after creating it
+    if files is not None and files.batch:
+        assert sorted(stats) == sorted(
+            [str(tmpdir.join("a", "link")), config["created"], config["created"]]
+            + [str(tmpdir.join(name, "file3")) for name in "abc"]
+        )
+    else:
+        # the created directory is looked up again after creating it
+        assert len(set(stats)) == 16
+        assert len(stats) == 17
+
+
+def test_filesystem_cache_unlisted(tmpdir, monkeypatch):
+    # names missing from a directory listing are looked up on their own,
+    # case insensitive filesystems list them with a different case
+    tmpdir.join("Config.yaml").write("")
+    path = str(tmpdir.join("config.yaml"))
+    monkeypatch.setattr(
+        confu.schema.core,
+        "_path_kind",
+        lambda p: "file" if p == path else None,
+    )
+    files = FilesystemCache(batch=True)
+    files.prefetch([path, str(tmpdir.join("missing", "file"))])
+    assert path not in files._kinds
+    assert files.kind(path) == "file"
+    assert files.kind(str(tmpdir.join("missing", "file"))) is None
+
+
+def test_collect_failure_records():
+    errors = CollectValidationExceptions()
+    warnings = CollectValidationExceptions()
+    Schema_01().validate(
+        {"int_attr": "a", "str_attr": 1, "list_attr": [1, {}], "unknown": 1},
+        errors=errors,
+        warnings=warnings,
+    )
+
+    # checks report failure records, exceptions are created on access
+    assert all(type(e) is ValidationFailure for e in errors._exceptions)
+    assert len(errors) == 4
+    assert errors[0] == ValidationError(None, ["int_attr"], "a", "integer expected")
+    assert type(errors._exceptions[0]) is ValidationError
+    assert type(errors._exceptions[1]) is ValidationFailure
+    assert [e.pretty for e in errors] == [
+        "int_attr: integer expected",
+        "str_attr: string expected",
+        "list_attr.0: dictionary expected",
+        "list_attr.1.int_attr: missing",
+    ]
+    assert all(isinstance(e, ValidationError) for e in errors.exceptions)
+    assert isinstance(warnings[0], ValidationWarning)
+    assert warnings[0].pretty == ": unknown attribute 'unknown'"
+
+
+def test_collect_failure_records_subclass():
+    class Errors(CollectValidationExceptions):
+        def error(self, error):
+            self.seen.append(error)
+            super().error(error)
+
+    errors = Errors()
+    errors.seen = []
+    Schema_01().validate({"int_attr": "a", "str_attr": 1}, errors=errors)
+    assert [e.pretty for e in errors.seen] == [
+        "int_attr: integer expected",
+        "str_attr: string expected",
+    ]
+    assert len(errors) == 2
+
+
+def test_duck_typed_error_processor():
+    class Errors:
+        def __init__(self):
+            self.exceptions = []
+
+        def error(self, error):
+            self.exceptions.append(error)
+
+        def warning(self, warning):
+            self.exceptions.append(warning)
+
+    errors = Errors()
+    Schema_01().validate(
+        {"int_attr": "a", "str_attr": 1, "unknown": 1}, errors=errors, warnings=errors
+    )
+    assert [e.pretty for e in errors.exceptions] == [
+        "int_attr: integer expected",
+        "str_attr: string expected",
+        ": unknown attribute 'unknown'",
+    ]
+
+
+def test_collect_exceptions_reset():
+    errors = CollectValidationExceptions()
+    Schema_01().validate({"int_attr": "a"}, errors=errors)
+    assert errors
+    errors.exceptions = []
+    assert len(errors) == 0
+    assert not errors
+
+
+def test_failure_record_raise():
+    with pytest.raises(ValidationError) as exc_info:
+        Schema_01().validate({"int_attr": "a"})
+    assert exc_info.value == ValidationError(
+        None, ["int_attr"], "a", "integer expected"
+    )
+
+
+@pytest.mark.parametrize(
+    "kwargs,num_errors",
+    [
+        ({}, 7),
+        ({"max_errors": 3}, 3),
+        ({"max_errors": 10}, 7),
+        ({"fail_fast": True}, 1),
+    ],
+)
+def test_validate_max_errors(kwargs, num_errors):
+    config = {"list_attr": [{"int_attr": "a"} for _ in range(5)], "int_attr": "b"}
+    success, errors, warnings = validate(Schema_01(), config, **kwargs)
+    assert not success
+    assert len(errors) == num_errors
+    assert errors[0].pretty == "list_attr.0.int_attr: integer expected"
+
+
+def test_validate_max_errors_processor():
+    config = {"list_attr": [{"int_attr": "a"} for _ in range(5)], "int_attr": "b"}
+
+    errors = CollectValidationExceptions(max_errors=2)
+    Schema_01().validate(config, errors=errors)
+    assert len(errors) == 2
+
+    errors = CollectValidationExceptions()
+    List("list_attr", item=Int()).validate(
+        ["a", "b", "c"], ["list_attr"], errors=errors, fail_fast=True
+    )
+    assert len(errors) == 1
+    # the limit only applies to the validation it was passed to
+    assert errors.max_errors is None
+
+    errors = CollectValidationExceptions(max_errors=5)
+    Schema_01().validate(config, errors=errors, max_errors=2)
+    assert len(errors) == 2
+    assert errors.max_errors == 5
+    Schema_01().validate(config, errors=errors, fail_fast=True)
+    assert errors.max_errors == 5
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_list_error_positions(codegen):
+    # error paths are positions in the input list, failed items do not
+    # shift the index of the items after them
+    class Ints(Schema):
+        ints = List(item=Int())
+
+    config = {"ints": ["a", 1, "b", 2, "c"]}
+    success, errors, warnings = validate(Ints(codegen=codegen), config)
+    assert [e.details["path"] for e in errors] == [
+        ["ints", 0],
+        ["ints", 2],
+        ["ints", 4],
+    ]
+    assert config["ints"] == [1, 2]
+
+    errors = CollectValidationExceptions()
+    List("ints", item=Int()).validate(["a", 1, "b"], ["ints"], errors=errors)
+    assert [e.pretty for e in errors] == [
+        "ints.0: integer expected",
+        "ints.2: integer expected",
+    ]
+
+
+def test_iter_errors():
+    config = {"list_attr": [{"int_attr": "a"} for _ in range(5)], "int_attr": "b"}
+    success, errors, warnings = validate(Schema_01(), dict(config))
+    expected = [e.pretty for e in errors] + [w.pretty for w in warnings]
+
+    iterated = [e.pretty for e in Schema_01().iter_errors(dict(config))]
+    assert sorted(iterated) == sorted(expected)
+    assert iterated[0] == "list_attr.0.int_attr: integer expected"
+
+    # validation stops along with the iteration
+    threads = threading.active_count()
+    iterator = Schema_01().iter_errors(dict(config), queue_size=1)
+    assert next(iterator).pretty == "list_attr.0.int_attr: integer expected"
+    iterator.close()
+    assert threading.active_count() == threads
+
+    assert len(list(Schema_01().iter_errors(dict(config), max_errors=2))) == 2
+    assert list(Schema_01().iter_errors({"int_attr": 1, "str_attr": "a"})) == []
+
+    # the config is not changed by the validation thread
+    config = {"int_attr": "1", "str_attr": 1, "list_attr": [{"int_attr": "2"}]}
+    iterator = Schema_01().iter_errors(config, queue_size=1)
+    next(iterator)
+    assert config == {"int_attr": "1", "str_attr": 1, "list_attr": [{"int_attr": "2"}]}
+    iterator.close()
+    assert config["list_attr"] == [{"int_attr": "2"}]
+
+
+def test_iter_errors_exception():
+    class Broken(confu.schema.core.Attribute):
+        def validate(self, value, path, **kwargs):
+            raise RuntimeError("broken")
+
+    class BrokenSchema(Schema):
+        int_attr = Broken()
+
+    with pytest.raises(RuntimeError):
+        list(BrokenSchema().iter_errors({"int_attr": 1}))
+
+
+class NumbersSchema(Schema):
+    ints = List(item=Int())
+    floats = List(item=Float())
+    ports = List(item=Int(choices=[22, 80, 443]))
+    optional = List(item=Int(default=None))
+
+
+@pytest.fixture(params=["python", "numpy"])
+def batch(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(confu.schema.core, "numpy", None)
+    return request.param
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_validate_many_list(batch, codegen):
+    config = {
+        "ints": [1, "2", 3.5, True],
+        "floats": [1, "2.5", 3.5, 2**70],
+        "ports": [22, "80", 443],
+        "optional": [1, None],
+    }
+    success, errors, warnings = validate(NumbersSchema(codegen=codegen), config)
+    assert success
+    assert config == {
+        "ints": [1, 2, 3, 1],
+        "floats": [1.0, 2.5, 3.5, float(2**70)],
+        "ports": [22, 80, 443],
+        "optional": [1, None],
+    }
+
+    config = {
+        "ints": [1, "x", 3, None],
+        "floats": [1, 2, "y"],
+        "ports": [22, 21],
+        "optional": [],
+    }
+    success, errors, warnings = validate(NumbersSchema(codegen=codegen), config)
+    assert [e.pretty for e in errors] == [
+        "ints.1: integer expected",
+        "ints.3: integer expected",
+        "floats.2: float expected",
+        "ports.1: invalid choice",
+    ]
+    assert config["ints"] == [1, 3]
+
+
+def test_validate_many(batch):
+    assert Int("ints").validate_many([1, "2", 3], ["ints"]) == [1, 2, 3]
+    assert Float("floats").validate_many([1, 2, 3], ["floats"]) == [1.0, 2.0, 3.0]
+    assert Int(default=None).validate_many([None], ["ints"]) == [None]
+
+    with pytest.raises(ValidationError) as exc_info:
+        Int("ints", choices=[1, 2]).validate_many([1, 2, 3], ["ints"])
+    assert exc_info.value.pretty == "ints.2: invalid choice"
+
+    # attributes overriding `validate` are validated value by value
+    class Even(Int):
+        def validate(self, value, path, **kwargs):
+            value = super().validate(value, path, **kwargs)
+            if value % 2:
+                raise ValidationError(self, path, value, "even number expected")
+            return value
+
+    with pytest.raises(ValidationError) as exc_info:
+        Even("ints").validate_many([2, 4, 5], ["ints"])
+    assert exc_info.value.pretty == "ints.2: even number expected"
+
+
+class StorageSchema(Schema):
+    ints = List(item=Int(), storage="array")
+    floats = List(item=Float(), storage="array")
+    tables = List(item=List(item=Int(), storage="array"))
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_list_storage(codegen):
+    config = {"ints": [1, "2", 3], "floats": "0.5,1.5", "tables": [[1, 2], [3]]}
+    success, errors, warnings = validate(StorageSchema(codegen=codegen), config)
+    assert success
+    assert config["ints"] == array.array("q", [1, 2, 3])
+    assert config["floats"] == array.array("d", [0.5, 1.5])
+    assert config["tables"] == [array.array("q", [1, 2]), array.array("q", [3])]
+
+    # validated data validates again
+    assert validate(StorageSchema(codegen=codegen), config)[0]
+    assert config["ints"] == array.array("q", [1, 2, 3])
+
+    config = {"ints": [1, "x", 2**64], "floats": [], "tables": []}
+    success, errors, warnings = validate(StorageSchema(codegen=codegen), config)
+    assert [e.pretty for e in errors] == [
+        "ints.1: integer expected",
+        "ints: cannot be stored as array",
+    ]
+
+    attribute = List("ints", item=Int(), storage="array")
+    assert attribute.validate(["1", 2], ["ints"]) == array.array("q", [1, 2])
+    with pytest.raises(ValidationError):
+        attribute.validate([2**64], ["ints"])
+
+
+def test_list_storage_numpy():
+    numpy = pytest.importorskip("numpy")
+
+    class Floats(Schema):
+        floats = List(item=Float(), storage="numpy")
+
+    for codegen in (False, True):
+        config = Floats(codegen=codegen).validate({"floats": [1, "2"]})
+        assert isinstance(config["floats"], numpy.ndarray)
+        assert config["floats"].tolist() == [1.0, 2.0]
+
+    attribute = List("floats", item=Float(), storage="numpy")
+    validated = attribute.validate([1, "2"], ["floats"])
+    assert isinstance(validated, numpy.ndarray)
+    assert validated.tolist() == [1.0, 2.0]
+
+
+def test_list_storage_invalid():
+    with pytest.raises(ValueError):
+        List(item=Int(), storage="tuple")
+    with pytest.raises(ValueError):
+        List(item=Str(), storage="array")
+
+
+@pytest.mark.parametrize(
+    "choices,value,expected",
+    [
+        (["a", "b"], "a", True),
+        (["a", "b"], "c", False),
+        (["a", "b"], ["a"], False),
+        ([1, 2], 1.0, True),
+        ([1, 2], True, True),
+        ([[1, 2], [3]], [3], True),
+        ([[1, 2], [3]], [4], False),
+        ([[1, 2], [3]], "x", False),
+        ([[1], {"a": 1}], {"a": 1}, True),
+        ([[1], {"a": 1}], [2], False),
+    ],
+)
+def test_choices_index(choices, value, expected):
+    index = confu.schema.core._ChoicesIndex(choices)
+    assert (value in index) is expected
+    assert (value in choices) is expected
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_choices_index_validation(codegen):
+    codes = [f"site{idx}" for idx in range(5000)]
+
+    class Sites(Schema):
+        sites = List(item=Str(choices=codes))
+        regions = List(item=Str(choices=lambda attribute: codes, cache="forever"))
+        pairs = List(item=List(item=Int()), choices=[[1, 2], [3, 4]])
+
+    config = {
+        "sites": codes + ["unknown"],
+        "regions": ["site1", "x"],
+        "pairs": [[1, 2], [5]],
+    }
+    success, errors, warnings = validate(Sites(codegen=codegen), config)
+    assert [e.pretty for e in errors] == [
+        "sites.5000: invalid choice",
+        "regions.1: invalid choice",
+        "pairs: invalid choice",
+    ]
+
+
+def test_config_path():
+    root = ConfigPath()
+    path = ConfigPath(ConfigPath(root, "a"), 0)
+    assert path.as_list() == ["a", 0]
+    assert list(path) == ["a", 0]
+    assert len(path) == 2
+    assert len(root) == 0
+    assert ConfigPath.from_list(["a", 0, "b"]).as_list() == ["a", 0, "b"]
+    assert ConfigPath.from_list(["a", 0, "b"]).parent.parent.key == "a"
+
+    # paths are flattened when an exception is created
+    error = ValidationError(None, path, 1, "test")
+    assert error.details["path"] == ["a", 0]
+    assert error.pretty == "a.0: test"
+
+    # other paths are passed through as they are
+    assert ValidationError(None, "a.b", 1, "test").details["path"] == "a.b"
+    assert ValidationError(None, None, 1, "test").details["path"] is None
+    path = ["a", 0]
+    assert ValidationError(None, path, 1, "test").details["path"] is path
+
+
+def test_config_path_failures():
+    errors = CollectValidationExceptions()
+    Schema_01().validate(
+        {"list_attr": [{"int_attr": "a"}, {"int_attr": "b"}]},
+        path=["root"],
+        errors=errors,
+    )
+    failures = errors._exceptions
+    assert isinstance(failures[0].path, ConfigPath)
+
+    # sibling values share the path of their container
+    assert failures[0].path.parent.parent is failures[1].path.parent.parent
+    assert [e.details["path"] for e in errors] == [
+        ["root", "list_attr", 0, "int_attr"],
+        ["root", "list_attr", 1, "int_attr"],
+        ["root", "int_attr"],
+        ["root", "str_attr"],
+    ]
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_validation_memo(codegen):
+    memo = ValidationMemo()
+    schema = Schema_01(codegen=codegen)
+
+    def config():
+        return {
+            "int_attr": "1",
+            "str_attr": "a",
+            "list_attr": [{"int_attr": "2"} for _ in range(5)],
+            "nested": {"int_attr": "2"},
+        }
+
+    expected = schema.validate(config())
+    validated = schema.validate(config(), memo=memo)
+    assert validated == expected
+    # list entries are identical subtrees, the nested schema is
+    # a different schema
+    assert memo.misses == 3
+    assert memo.hits == 4
+    assert len(memo) == 3
+
+    # results are copies
+    validated["list_attr"][1]["int_attr"] = 3
+    assert validated["list_attr"][0]["int_attr"] == 2
+
+    # whole config is reused
+    config_b = config()
+    assert schema.validate(config_b, memo=memo) == expected
+    assert config_b == expected
+    assert memo.hits == 5
+
+    memo.clear()
+    assert len(memo) == 0
+    assert memo.hits == memo.misses == 0
+
+
+def test_validation_memo_failures():
+    memo = ValidationMemo()
+    config = {
+        "int_attr": 1,
+        "str_attr": "a",
+        "list_attr": [
+            {"int_attr": "a"},
+            {"int_attr": 1},
+            {"int_attr": "a"},
+            {"int_attr": 1},
+        ],
+        "nested": {"int_attr": 1},
+    }
+
+    success, errors, warnings = validate(Schema_01(), config, memo=memo)
+    assert not success
+    assert [e.pretty for e in errors] == [
+        "list_attr.0.int_attr: integer expected",
+        "list_attr.2.int_attr: integer expected",
+    ]
+
+    # subtrees with failures are not cached
+    assert memo.hits == 1
+    assert len(memo) == 2
+
+    with pytest.raises(ValidationError):
+        Schema_01().validate(config, memo=memo)
+
+    errors = CollectValidationExceptions()
+    Schema_01().validate(config, errors=errors, fail_fast=True, memo=memo)
+    assert len(errors) == 1
+
+
+def test_validation_memo_maxsize():
+    memo = ValidationMemo(maxsize=2)
+    schema = Schema_01()
+    for value in range(4):
+        schema.validate(
+            {
+                "int_attr": 1,
+                "str_attr": "a",
+                "list_attr": [],
+                "nested": {"int_attr": value},
+            },
+            memo=memo,
+        )
+    assert len(memo) == 2
+    assert memo.hits == 0
+
+    # unhashable values are validated without the memo
+    with pytest.raises(ValidationWarning):
+        NestedSchema_01().validate({"int_attr": 1, "extra": {1}}, memo=memo)
+    assert len(memo) == 2